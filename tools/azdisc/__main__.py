@@ -1,23 +1,41 @@
 """CLI entry point for azdisc tool."""
 import argparse
+import dataclasses
 import json
 import os
 import sys
+from datetime import datetime, timezone
 
+from tools.azdisc import metrics
 from tools.azdisc.config import load_config
-from tools.azdisc.arg import AzureResourceGraph, AzDiscError
-from tools.azdisc.expand import expand, build_rbac_scopes
-from tools.azdisc.graph import build_graph
-from tools.azdisc.emit_puml import emit
-from tools.azdisc.render import render as render_puml
+from tools.azdisc.arg import AzDiscError, make_arg
+from tools.azdisc.batch import app_seed, discover_shared, expand_app, plan, shared_rbac
+from tools.azdisc.cache import RenderCache
+from tools.azdisc.expand import expand, query_seed
+from tools.azdisc.graph import build_compact_graph, build_compact_graph_parallel
+from tools.azdisc.emit_puml import emit_diagrams, list_diagrams
+from tools.azdisc.snapshot import TenantStore, expand_offline, seed_offline, store_path, take_snapshot
+from tools.azdisc.summarize import summarize
+from tools.azdisc.render import jar_stamp, render_many
+from tools.azdisc.manifest import Manifest
+from tools.azdisc.rbac import collect_rbac
+from tools.azdisc.inventory import (
+    inventory_filename,
+    inventory_path,
+    iter_inventory,
+    iter_inventory_records,
+    load_inventory,
+    write_inventory,
+)
+from tools.azdisc.delta import apply_changes, in_seed, snapshot_usable, utc_timestamp
 from tools.azdisc.docs import write_catalog, write_edges
-from tools.azdisc.util import sort_keys
+from tools.azdisc.util import dump_json
 
 
 def _write_json(path, data):
     os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
     with open(path, "w", encoding="utf-8") as fh:
-        json.dump(sort_keys(data), fh, indent=2, sort_keys=True)
+        dump_json(data, fh)
 
 
 def _read_json(path):
@@ -25,18 +43,62 @@ def _read_json(path):
         return json.load(fh)
 
 
-def cmd_discover(config, out_dir):
-    print("  [discover] running seed query...", file=sys.stderr)
-    arg = AzureResourceGraph(config.subscriptions)
-    seed = arg.query_seed(config.seedResourceGroups)
+def _snapshot_time(started, arg):
+    """
+    `started`, or the creation time of the oldest cached result `arg` served if that is
+    earlier, so `--since-last` also asks for changes made after that result was cached.
+    """
+    if arg.cache is None or arg.cache.oldest is None:
+        return started
+    return min(started, utc_timestamp(datetime.fromtimestamp(arg.cache.oldest, timezone.utc)))
+
+
+def cmd_snapshot(config, use_cache=True):
+    path = store_path(config)
+    print(
+        f"  [snapshot] sweeping {len(config.subscriptions)} subscriptions...", file=sys.stderr
+    )
+    started = utc_timestamp()
+    # The store is stamped with `started`, so the sweep must not come from cached results
+    with make_arg(config, use_cache=use_cache, refresh=True) as arg:
+        counts = take_snapshot(arg, path, started, include_rbac=config.includeRbac)
+    print(
+        f"  [snapshot] {counts['resources']} resources, {counts['references']} references, "
+        f"{counts['role_assignments']} role assignments written to {path}",
+        file=sys.stderr,
+    )
+    return counts
+
+
+def cmd_discover(config, out_dir, use_cache=True, refresh=False, offline=False):
+    if offline:
+        with TenantStore(store_path(config)) as store:
+            print(f"  [discover] reading seed from {store.path}...", file=sys.stderr)
+            # Delta discovery continues from the time of the sweep
+            started = store.timestamp
+            seed = seed_offline(config, store)
+    else:
+        kind = "multi-hop seed" if config.multiHopSeed else "seed"
+        print(f"  [discover] running {kind} query...", file=sys.stderr)
+        started = utc_timestamp()
+        with make_arg(config, use_cache=use_cache, refresh=refresh) as arg:
+            seed = query_seed(config, arg)
+            started = _snapshot_time(started, arg)
     _write_json(os.path.join(out_dir, "seed.json"), seed)
+    _write_json(os.path.join(out_dir, "snapshot.json"), {"timestamp": started})
     print(f"  [discover] {len(seed)} resources written to seed.json", file=sys.stderr)
     return seed
 
 
-def cmd_expand(config, out_dir, seed=None):
+def _collect_rbac(config, arg, inventory, stage):
+    if not config.includeRbac:
+        return []
+    print(f"  [{stage}] querying RBAC...", file=sys.stderr)
+    return collect_rbac(arg, [inventory])[0]
+
+
+def cmd_expand(config, out_dir, seed=None, use_cache=True, refresh=False, offline=False):
     print("  [expand] expanding inventory...", file=sys.stderr)
-    arg = AzureResourceGraph(config.subscriptions)
 
     # Use existing seed if available
     seed_path = os.path.join(out_dir, "seed.json")
@@ -44,16 +106,26 @@ def cmd_expand(config, out_dir, seed=None):
         print("  [expand] loading existing seed.json", file=sys.stderr)
         seed = _read_json(seed_path)
 
-    inventory, unresolved = expand(config, arg)
-
-    if config.includeRbac:
-        print("  [expand] querying RBAC...", file=sys.stderr)
-        scopes = build_rbac_scopes(inventory)
-        rbac = arg.query_rbac(scopes)
+    if offline:
+        with TenantStore(store_path(config)) as store:
+            print(f"  [expand] expanding from {store.path}", file=sys.stderr)
+            inventory, unresolved = expand_offline(config, store, seed=seed)
+            rbac = []
+            if config.includeRbac:
+                rbac = store.role_assignments(inventory)
     else:
-        rbac = []
-
-    _write_json(os.path.join(out_dir, "inventory.json"), inventory)
+        with make_arg(config, use_cache=use_cache, refresh=refresh) as arg:
+            inventory, unresolved = expand(config, arg, seed=seed)
+            rbac = _collect_rbac(config, arg, inventory, "expand")
+        # Cached expansion results may predate the last discover
+        snapshot_path = os.path.join(out_dir, "snapshot.json")
+        if os.path.exists(snapshot_path):
+            taken = _read_json(snapshot_path).get("timestamp")
+            earliest = _snapshot_time(taken, arg) if taken else taken
+            if earliest != taken:
+                _write_json(snapshot_path, {"timestamp": earliest})
+
+    write_inventory(out_dir, inventory, config.inventoryFormat)
     _write_json(os.path.join(out_dir, "unresolved.json"), unresolved)
     _write_json(os.path.join(out_dir, "rbac.json"), rbac)
     print(
@@ -63,40 +135,154 @@ def cmd_expand(config, out_dir, seed=None):
     return inventory, unresolved, rbac
 
 
-def cmd_graph(out_dir):
+def cmd_discover_delta(config, out_dir, use_cache=True, refresh=False):
+    """Patch the inventory from ARG change history since the last discover."""
+    inv_path = inventory_path(out_dir)
+    snapshot_path = os.path.join(out_dir, "snapshot.json")
+    snapshot = _read_json(snapshot_path) if os.path.exists(snapshot_path) else {}
+    if not os.path.exists(inv_path) or not snapshot_usable(snapshot.get("timestamp")):
+        print("  [discover] no recent snapshot, running a full sweep", file=sys.stderr)
+        seed = cmd_discover(config, out_dir, use_cache=use_cache, refresh=refresh)
+        return cmd_expand(config, out_dir, seed=seed, use_cache=use_cache, refresh=refresh)
+
+    since = snapshot["timestamp"]
+    print(f"  [discover] applying changes since {since}...", file=sys.stderr)
+    started = utc_timestamp()
+    # Change history and re-fetched resources must not come from cached results
+    unresolved_path = os.path.join(out_dir, "unresolved.json")
+    unresolved = _read_json(unresolved_path) if os.path.exists(unresolved_path) else []
+    with make_arg(config, use_cache=use_cache, refresh=True) as arg:
+        inventory, unresolved, changed = apply_changes(
+            config, arg, load_inventory(out_dir), unresolved, since
+        )
+        rbac = _collect_rbac(config, arg, inventory, "discover")
+
+    _write_json(os.path.join(out_dir, "seed.json"), [r for r in inventory if in_seed(r, config)])
+    write_inventory(out_dir, inventory, config.inventoryFormat)
+    _write_json(unresolved_path, unresolved)
+    _write_json(os.path.join(out_dir, "rbac.json"), rbac)
+    _write_json(snapshot_path, {"timestamp": started})
+    print(
+        f"  [discover] {changed} changed IDs, {len(inventory)} resources, "
+        f"{len(unresolved)} unresolved",
+        file=sys.stderr,
+    )
+    return inventory, unresolved, rbac
+
+
+def cmd_graph(out_dir, workers=1):
     print("  [graph] building graph...", file=sys.stderr)
-    inventory = _read_json(os.path.join(out_dir, "inventory.json"))
     rbac_path = os.path.join(out_dir, "rbac.json")
     rbac = _read_json(rbac_path) if os.path.exists(rbac_path) else []
-    graph = build_graph(inventory, rbac)
-    _write_json(os.path.join(out_dir, "graph.json"), graph)
+    if workers > 1:
+        print(f"  [graph] sharding across {workers} processes", file=sys.stderr)
+        graph = build_compact_graph_parallel(iter_inventory_records(out_dir), rbac, workers)
+    else:
+        graph = build_compact_graph(iter_inventory(out_dir), rbac)
+    edge_count = [0]
+
+    def counted(edges):
+        for edge in edges:
+            edge_count[0] += 1
+            yield edge
+
+    # Stream nodes and edges straight from the compact graph into graph.json
+    _write_json(
+        os.path.join(out_dir, "graph.json"),
+        {"nodes": graph.iter_node_dicts(), "edges": counted(graph.iter_edge_dicts())},
+    )
+    metrics.incr("nodes", graph.node_count())
+    metrics.incr("edges", edge_count[0])
     print(
-        f"  [graph] {len(graph['nodes'])} nodes, {len(graph['edges'])} edges",
+        f"  [graph] {graph.node_count()} nodes, {edge_count[0]} edges",
         file=sys.stderr,
     )
     return graph
 
 
-def cmd_puml(out_dir):
+def cmd_puml(out_dir, partition="none", summary=None):
+    """`summary` is None, or (leaf types, collapse threshold) for summarize()."""
     print("  [puml] generating PlantUML...", file=sys.stderr)
     graph = _read_json(os.path.join(out_dir, "graph.json"))
-    puml_path = os.path.join(out_dir, "diagram.puml")
-    emit(graph, puml_path)
-    print(f"  [puml] written to {puml_path}", file=sys.stderr)
-    return puml_path
-
-
-def cmd_render(out_dir, plantuml_jar=None):
+    if summary is not None:
+        before = len(graph["nodes"])
+        graph = summarize(graph, *summary)
+        print(
+            f"  [puml] summarized {before} nodes to {len(graph['nodes'])}",
+            file=sys.stderr,
+        )
+    paths = emit_diagrams(graph, out_dir, partition)
+    print(f"  [puml] written to {paths[0]}", file=sys.stderr)
+    if len(paths) > 1:
+        print(
+            f"  [puml] {len(paths) - 1} {partition} partitions written to "
+            f"{os.path.dirname(paths[1])}",
+            file=sys.stderr,
+        )
+    return paths
+
+
+def _summary_opts(config):
+    if not config.summarize:
+        return None
+    return [config.summaryLeafTypes, config.summaryCollapseMin]
+
+
+def cmd_render(
+    out_dir,
+    plantuml_jar=None,
+    backend="daemon",
+    workers=1,
+    heap=None,
+    timeout=600,
+    cache=None,
+    puml_paths=None,
+):
+    """Render `puml_paths`, by default every diagram in `out_dir`."""
     print("  [render] rendering SVG...", file=sys.stderr)
-    puml_path = os.path.join(out_dir, "diagram.puml")
-    svg_path = render_puml(puml_path, out_dir, plantuml_jar=plantuml_jar)
-    print(f"  [render] written to {svg_path}", file=sys.stderr)
-    return svg_path
+    if puml_paths is None:
+        puml_paths = list_diagrams(out_dir)
+    svg_paths, failed = render_many(
+        puml_paths,
+        plantuml_jar,
+        workers=workers,
+        heap=heap,
+        timeout=timeout,
+        backend=backend,
+        cache=cache,
+    )
+    for puml_path, error in failed:
+        print(f"  [render] FAILED {puml_path}: {error}", file=sys.stderr)
+    cached = f" ({cache.hits} from cache)" if cache is not None else ""
+    print(
+        f"  [render] {len(svg_paths)}/{len(puml_paths)} diagrams rendered{cached}",
+        file=sys.stderr,
+    )
+    if failed:
+        raise AzDiscError(f"plantuml render failed for {len(failed)} of {len(puml_paths)} diagrams")
+    return svg_paths
+
+
+def _render(config, out_dir, plantuml_jar, use_cache=True, puml_paths=None):
+    cache = None
+    if use_cache:
+        cache_dir = config.renderCacheDir or os.path.join(out_dir, ".cache", "render")
+        cache = RenderCache(cache_dir, config.renderCacheMaxBytes)
+    return cmd_render(
+        out_dir,
+        plantuml_jar=plantuml_jar,
+        backend=config.renderBackend,
+        workers=config.renderWorkers,
+        heap=config.renderHeap or None,
+        timeout=config.renderTimeout,
+        cache=cache,
+        puml_paths=puml_paths,
+    )
 
 
 def cmd_docs(out_dir):
     print("  [docs] generating docs...", file=sys.stderr)
-    inventory = _read_json(os.path.join(out_dir, "inventory.json"))
+    inventory = iter_inventory(out_dir)
     graph = _read_json(os.path.join(out_dir, "graph.json"))
     unresolved_path = os.path.join(out_dir, "unresolved.json")
     unresolved = _read_json(unresolved_path) if os.path.exists(unresolved_path) else []
@@ -105,6 +291,206 @@ def cmd_docs(out_dir):
     print("  [docs] catalog.md and edges.md written", file=sys.stderr)
 
 
+def cmd_run(
+    config, out_dir, plantuml_jar=None, force=False, use_cache=True, refresh=False, offline=False
+):
+    """
+    Run every stage, skipping those whose inputs match the fingerprint in manifest.json.
+
+    Inputs are the relevant config fields, upstream artifacts and the stage's own source
+    code. The state of Azure is not an input, so discover and expand always run unless
+    `offline`, where they read the tenant snapshot, which becomes their input. `force`
+    re-runs everything; `refresh` bypasses cached Resource Graph results.
+    """
+    manifest = Manifest(out_dir)
+    digest = manifest.file_digest
+
+    def path(name):
+        return os.path.join(out_dir, name)
+
+    def source():
+        if not offline:
+            return {}
+        return {
+            "snapshot": digest(store_path(config)),
+            "code": manifest.code_digest("snapshot", "expand", "rbac", "inventory", "util"),
+        }
+
+    scope = [config.subscriptions, config.seedResourceGroups]
+    # Listed only when not the default, so existing manifests stay valid
+    query_mode = [
+        name
+        for name, enabled in (
+            ("multiHopSeed", config.multiHopSeed),
+            ("projectProperties", config.projectProperties),
+        )
+        if enabled
+    ]
+    azure_opts = {"use_cache": use_cache, "refresh": refresh, "offline": offline}
+    inventory_name = inventory_filename(config.inventoryFormat)
+    stages = [
+        (
+            "discover",
+            lambda: {
+                "config": scope + query_mode,
+                "code": manifest.code_digest("arg", "projection"),
+                **source(),
+            },
+            ["seed.json"],
+            lambda: cmd_discover(config, out_dir, **azure_opts),
+        ),
+        (
+            "expand",
+            lambda: {
+                "config": scope + [config.includeRbac] + query_mode,
+                "seed": digest(path("seed.json")),
+                "code": manifest.code_digest(
+                    "arg", "projection", "expand", "rbac", "inventory", "util"
+                ),
+                **source(),
+            },
+            [inventory_name, "unresolved.json", "rbac.json"],
+            lambda: cmd_expand(config, out_dir, **azure_opts),
+        ),
+        (
+            "graph",
+            lambda: {
+                "inventory": digest(path(inventory_name)),
+                "rbac": digest(path("rbac.json")),
+                "code": manifest.code_digest("graph", "inventory", "util"),
+            },
+            ["graph.json"],
+            lambda: cmd_graph(out_dir, workers=config.graphWorkers),
+        ),
+        (
+            "puml",
+            lambda: {
+                "config": [config.diagramPartition, _summary_opts(config)],
+                "graph": digest(path("graph.json")),
+                "code": manifest.code_digest("emit_puml", "summarize", "util"),
+            },
+            lambda: list_diagrams(out_dir),
+            lambda: cmd_puml(
+                out_dir, partition=config.diagramPartition, summary=_summary_opts(config)
+            ),
+        ),
+        (
+            "render",
+            lambda: {
+                "puml": [digest(p) for p in list_diagrams(out_dir)],
+                "jar": jar_stamp(plantuml_jar),
+                "code": manifest.code_digest("render", "cache"),
+            },
+            lambda: [p[: -len(".puml")] + ".svg" for p in list_diagrams(out_dir)],
+            lambda: _render(config, out_dir, plantuml_jar, use_cache=use_cache),
+        ),
+        (
+            "docs",
+            lambda: {
+                "inventory": digest(path(inventory_name)),
+                "graph": digest(path("graph.json")),
+                "unresolved": digest(path("unresolved.json")),
+                "code": manifest.code_digest("docs", "inventory"),
+            },
+            ["catalog.md", "edges.md"],
+            lambda: cmd_docs(out_dir),
+        ),
+    ]
+
+    def output_paths(outputs):
+        # Diagram stages list their outputs, which depend on the partitions written
+        return outputs() if callable(outputs) else [path(name) for name in outputs]
+
+    for stage, inputs, outputs, run in stages:
+        fingerprint = manifest.fingerprint(inputs())
+        rerun = force or (not offline and stage in ("discover", "expand"))
+        if not rerun and manifest.is_fresh(stage, fingerprint, output_paths(outputs)):
+            print(f"  [{stage}] inputs unchanged, skipping", file=sys.stderr)
+            metrics.skip(stage)
+            continue
+        with metrics.stage(stage):
+            run()
+        manifest.record(stage, fingerprint, output_paths(outputs))
+
+
+def cmd_batch(configs, plantuml_jar=None, use_cache=True, refresh=False):
+    """
+    Run the full pipeline for several apps with one Resource Graph session.
+
+    The seed query covers the union of all seed resource groups and every resource is
+    fetched at most once into a shared pool; each app's inventory is then expanded from
+    the pool offline. Role assignments are queried once for all apps and all diagrams
+    are rendered together. The first config supplies the query backend, cache and
+    render settings.
+    """
+    subscriptions, seed_rgs = plan(configs)
+    shared = dataclasses.replace(
+        configs[0],
+        subscriptions=subscriptions,
+        queryWorkers=max(c.queryWorkers for c in configs),
+    )
+    print(
+        f"  [batch] {len(configs)} apps, {len(subscriptions)} subscriptions, "
+        f"{len(seed_rgs)} seed resource groups",
+        file=sys.stderr,
+    )
+
+    with make_arg(shared, use_cache=use_cache, refresh=refresh) as arg:
+        with metrics.stage("discover"):
+            print("  [discover] running shared seed query and expansion...", file=sys.stderr)
+            started = utc_timestamp()
+            pool = discover_shared(configs, arg)
+            started = _snapshot_time(started, arg)
+            print(f"  [discover] {len(pool.by_id)} unique resources fetched", file=sys.stderr)
+
+        with metrics.stage("expand"):
+            results = [expand_app(config, pool) for config in configs]
+            rbac_apps = [i for i, config in enumerate(configs) if config.includeRbac]
+            rbac = [[] for _ in configs]
+            if rbac_apps:
+                print("  [expand] querying RBAC...", file=sys.stderr)
+                for i, assignments in zip(
+                    rbac_apps, shared_rbac(arg, [results[i][0] for i in rbac_apps])
+                ):
+                    rbac[i] = assignments
+            for config, (inventory, unresolved), assignments in zip(configs, results, rbac):
+                out_dir = config.outputDir
+                _write_json(os.path.join(out_dir, "seed.json"), app_seed(config, pool))
+                _write_json(os.path.join(out_dir, "snapshot.json"), {"timestamp": started})
+                write_inventory(out_dir, inventory, config.inventoryFormat)
+                _write_json(os.path.join(out_dir, "unresolved.json"), unresolved)
+                _write_json(os.path.join(out_dir, "rbac.json"), assignments)
+                print(
+                    f"  [expand] {config.app}: {len(inventory)} resources, "
+                    f"{len(unresolved)} unresolved",
+                    file=sys.stderr,
+                )
+            total = sum(len(inventory) for inventory, _ in results)
+            print(
+                f"  [batch] {total} app resources served from {len(pool.by_id)} fetched",
+                file=sys.stderr,
+            )
+
+    with metrics.stage("graph"):
+        for config in configs:
+            cmd_graph(config.outputDir, workers=config.graphWorkers)
+    with metrics.stage("puml"):
+        for config in configs:
+            cmd_puml(
+                config.outputDir,
+                partition=config.diagramPartition,
+                summary=_summary_opts(config),
+            )
+    with metrics.stage("render"):
+        puml_paths = [p for config in configs for p in list_diagrams(config.outputDir)]
+        _render(
+            configs[0], configs[0].outputDir, plantuml_jar, use_cache=use_cache, puml_paths=puml_paths
+        )
+    with metrics.stage("docs"):
+        for config in configs:
+            cmd_docs(config.outputDir)
+
+
 def main():
     parser = argparse.ArgumentParser(
         prog="python3 -m tools.azdisc",
@@ -112,49 +498,186 @@ def main():
     )
     parser.add_argument(
         "command",
-        choices=["run", "discover", "expand", "graph", "puml", "render", "docs"],
+        choices=[
+            "run", "batch", "snapshot", "discover", "expand", "graph", "puml", "render", "docs"
+        ],
         help="Command to execute",
     )
-    parser.add_argument("config_path", help="Path to JSON config file")
+    parser.add_argument(
+        "config_path",
+        nargs="+",
+        help="Path to JSON config file (batch: one per app)",
+    )
     parser.add_argument("--plantuml-jar", default=None, help="Path to plantuml.jar")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=(
+            "Concurrent az graph query calls for discover/expand "
+            "(overrides queryWorkers in config)"
+        ),
+    )
+    parser.add_argument(
+        "--graph-workers",
+        type=int,
+        default=None,
+        help="Processes graph uses to extract nodes and edges (overrides graphWorkers in config)",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["cli", "rest"],
+        default=None,
+        help="Resource Graph backend (overrides backend in config)",
+    )
+    parser.add_argument(
+        "--render-backend",
+        choices=["daemon", "oneshot"],
+        default=None,
+        help=(
+            "daemon: one plantuml -pipe JVM for all diagrams; oneshot: one JVM per "
+            "diagram (overrides renderBackend in config)"
+        ),
+    )
+    parser.add_argument(
+        "--render-workers",
+        type=int,
+        default=None,
+        help="PlantUML JVMs rendering diagrams concurrently (overrides renderWorkers in config)",
+    )
+    parser.add_argument(
+        "--multi-hop",
+        action="store_true",
+        help=(
+            "Resolve well-known neighbours (NIC, subnet VNet, NSG, route table, private "
+            "endpoint target, disks) in the seed query (sets multiHopSeed)"
+        ),
+    )
+    parser.add_argument(
+        "--project-properties",
+        action="store_true",
+        help=(
+            "Fetch only the per-type property subtrees graph and expand read "
+            "(sets projectProperties)"
+        ),
+    )
+    parser.add_argument(
+        "--summarize",
+        action="store_true",
+        help=(
+            "Fold leaf resources and collapse identical siblings in the diagram "
+            "(graph.json keeps full detail)"
+        ),
+    )
+    parser.add_argument(
+        "--partition",
+        choices=["none", "resourceGroup", "subscription", "vnet"],
+        default=None,
+        help=(
+            "Split the diagram into an overview plus one diagram per partition "
+            "(overrides diagramPartition in config)"
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the Resource Graph query cache or the render cache",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached Resource Graph pages and re-query (results are re-cached)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="With run: execute every stage even if its inputs are unchanged",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help=(
+            "With run/discover/expand: read the tenant snapshot written by the snapshot "
+            "command instead of querying Azure"
+        ),
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="Write per-stage timings, resource usage and query counters to metrics.json",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Run each stage under cProfile and write profile/<stage>.pstats",
+    )
+    parser.add_argument(
+        "--since-last",
+        action="store_true",
+        help="With discover: patch the inventory from change history since the last run",
+    )
     args = parser.parse_args()
+    if args.command != "batch" and len(args.config_path) > 1:
+        parser.error(f"{args.command} takes one config file; use batch for several")
 
     try:
-        config = load_config(args.config_path)
+        configs = [load_config(path) for path in args.config_path]
+        out_dirs = [os.path.abspath(c.outputDir) for c in configs]
+        if len(set(out_dirs)) != len(out_dirs):
+            raise ValueError("batch configs must have distinct outputDir values")
     except (FileNotFoundError, ValueError) as exc:
         print(f"Config error: {exc}", file=sys.stderr)
         sys.exit(1)
 
+    for config in configs:
+        if args.workers is not None:
+            config.queryWorkers = args.workers
+        if args.graph_workers is not None:
+            config.graphWorkers = args.graph_workers
+        if args.backend is not None:
+            config.backend = args.backend
+        if args.partition is not None:
+            config.diagramPartition = args.partition
+        if args.render_backend is not None:
+            config.renderBackend = args.render_backend
+        if args.summarize:
+            config.summarize = True
+        if args.multi_hop:
+            config.multiHopSeed = True
+        if args.project_properties:
+            config.projectProperties = True
+        if args.render_workers is not None:
+            config.renderWorkers = args.render_workers
+
+    cache_opts = {"use_cache": not args.no_cache, "refresh": args.refresh}
+
+    # With batch, metrics and profiles go to the first app's output directory
+    config = configs[0]
     out_dir = config.outputDir
-    os.makedirs(out_dir, exist_ok=True)
-    print(f"Output directory: {out_dir}", file=sys.stderr)
-
-    try:
-        if args.command == "discover":
-            cmd_discover(config, out_dir)
-
-        elif args.command == "expand":
-            cmd_expand(config, out_dir)
-
-        elif args.command == "graph":
-            cmd_graph(out_dir)
-
-        elif args.command == "puml":
-            cmd_puml(out_dir)
-
-        elif args.command == "render":
-            cmd_render(out_dir, plantuml_jar=args.plantuml_jar)
+    for c in configs:
+        os.makedirs(c.outputDir, exist_ok=True)
+        print(f"Output directory: {c.outputDir}", file=sys.stderr)
 
-        elif args.command == "docs":
-            cmd_docs(out_dir)
+    collector = None
+    if args.metrics or args.profile:
+        profile_dir = os.path.join(out_dir, "profile") if args.profile else None
+        collector = metrics.Metrics(profile_dir=profile_dir).activate()
 
-        elif args.command == "run":
-            cmd_discover(config, out_dir)
-            cmd_expand(config, out_dir)
-            cmd_graph(out_dir)
-            cmd_puml(out_dir)
-            cmd_render(out_dir, plantuml_jar=args.plantuml_jar)
-            cmd_docs(out_dir)
+    try:
+        if args.command == "run":
+            cmd_run(
+                config,
+                out_dir,
+                plantuml_jar=args.plantuml_jar,
+                force=args.force,
+                offline=args.offline,
+                **cache_opts,
+            )
+        elif args.command == "batch":
+            cmd_batch(configs, plantuml_jar=args.plantuml_jar, **cache_opts)
+        else:
+            with metrics.stage(args.command):
+                _dispatch(args, config, out_dir, cache_opts)
 
     except AzDiscError as exc:
         print(f"Error: {exc}", file=sys.stderr)
@@ -164,6 +687,38 @@ def main():
             print(f"Stderr: {exc.stderr}", file=sys.stderr)
         sys.exit(1)
 
+    finally:
+        if collector is not None and args.metrics:
+            _write_json(os.path.join(out_dir, "metrics.json"), collector.to_dict())
+            print(f"  [metrics] written to {os.path.join(out_dir, 'metrics.json')}", file=sys.stderr)
+
+
+def _dispatch(args, config, out_dir, cache_opts):
+    """Run a single-stage command."""
+    if args.command == "discover" and args.since_last:
+        cmd_discover_delta(config, out_dir, **cache_opts)
+
+    elif args.command == "snapshot":
+        cmd_snapshot(config, use_cache=not args.no_cache)
+
+    elif args.command == "discover":
+        cmd_discover(config, out_dir, offline=args.offline, **cache_opts)
+
+    elif args.command == "expand":
+        cmd_expand(config, out_dir, offline=args.offline, **cache_opts)
+
+    elif args.command == "graph":
+        cmd_graph(out_dir, workers=config.graphWorkers)
+
+    elif args.command == "puml":
+        cmd_puml(out_dir, partition=config.diagramPartition, summary=_summary_opts(config))
+
+    elif args.command == "render":
+        _render(config, out_dir, args.plantuml_jar, use_cache=not args.no_cache)
+
+    elif args.command == "docs":
+        cmd_docs(out_dir)
+
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,71 @@
 """Azure Resource Graph query wrapper."""
+import http.client
 import json
+import os
 import subprocess
-from typing import List
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from urllib.parse import urlsplit
 
+from tools.azdisc import metrics
+from tools.azdisc.cache import QueryCache
+from tools.azdisc.projection import properties_kql
 from tools.azdisc.util import chunk
 
+ARM_ENDPOINT = "https://management.azure.com"
+ARG_API_VERSION = "2022-10-01"
+
+RESOURCE_COLUMNS = "id, name, type, location, subscriptionId, resourceGroup, properties"
+MG_SCOPE_PREFIX = "/providers/microsoft.management/managementgroups/"
+ROLE_ASSIGNMENTS = "authorizationresources | where type =~ 'microsoft.authorization/roleassignments' "
+PROPERTIES_PROJECTION = properties_kql()
+
+# Property subtrees holding the well-known neighbour references (VM -> NIC -> subnet ->
+# VNet -> NSG / route table / peered VNet, private endpoint -> target, VM -> disks)
+HOP_PROPERTIES = (
+    "networkProfile",
+    "ipConfigurations",
+    "networkSecurityGroup",
+    "routeTable",
+    "subnet",
+    "subnets",
+    "virtualNetworkPeerings",
+    "privateLinkServiceConnections",
+    "storageProfile",
+)
+
+
+def _split_scopes(scopes: List[str]):
+    """
+    Return ("subscriptions", ids) or ("managementGroups", names) for one query chunk.
+
+    A chunk holds subscription IDs or management group scopes (MG_SCOPE_PREFIX + name).
+    """
+    if scopes and scopes[0].lower().startswith(MG_SCOPE_PREFIX):
+        return "managementGroups", [s[len(MG_SCOPE_PREFIX):] for s in scopes]
+    return "subscriptions", scopes
+
+
+def _hop_kql(source: str) -> str:
+    """
+    KQL for the resources referenced from the HOP_PROPERTIES of `source` rows.
+
+    References to child resources (e.g. subnets) are cut back to their top-level
+    resource, which is what exists in the `resources` table. Uses one join.
+    """
+    paths = ", ".join(f"properties.{p}" for p in HOP_PROPERTIES)
+    return (
+        f"{source} "
+        f"| extend ref = extract_all(@'\"(/subscriptions/[^\"]+)\"', tostring(pack_array({paths}))) "
+        "| mv-expand ref to typeof(string) "
+        "| extend ref = strcat_array(array_slice(split(tolower(ref), '/'), 0, 8), '/') "
+        "| summarize by ref "
+        "| join kind=inner (resources | extend ref = tolower(id)) on ref"
+    )
+
 
 class AzDiscError(Exception):
     """Raised when an az CLI call fails."""
@@ -17,97 +78,461 @@ class AzDiscError(Exception):
 
 
 class AzureResourceGraph:
-    def __init__(self, subscriptions: List[str]):
+    """
+    Runs Resource Graph queries through `az graph query`.
+
+    With `project_properties`, resource queries return only the property subtrees that
+    graph edges and expansion need for the types in projection.py. The tenant sweep
+    (query_all) always returns full properties.
+    """
+
+    def __init__(
+        self,
+        subscriptions: List[str],
+        workers: int = 1,
+        cache: QueryCache = None,
+        project_properties: bool = False,
+    ):
         self.subscriptions = subscriptions
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.project_properties = project_properties
+        self._executor = None
+        self._executor_lock = threading.Lock()
 
-    def _run_query(self, kql: str, description: str) -> List[dict]:
-        """Execute az graph query with pagination and chunked subscriptions (max 20 per call)."""
+    def _pool(self) -> ThreadPoolExecutor:
+        """The client's worker pool, created on first use and kept until close()."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def close(self):
+        """Shut down the worker pool."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _project(self) -> str:
+        """The trailing `project` for resource rows, narrowing properties if enabled."""
+        narrow = PROPERTIES_PROJECTION if self.project_properties else ""
+        return f"{narrow}| project {RESOURCE_COLUMNS}"
+
+    def _fetch_page(self, kql: str, subs: List[str], skip_token, description: str) -> dict:
+        """Run one az graph query call for one page and return the parsed response."""
+        kind, names = _split_scopes(subs)
+        scope_flag = "--management-groups" if kind == "managementGroups" else "--subscriptions"
+        cmd = [
+            "az", "graph", "query",
+            "-q", kql,
+            scope_flag, *names,
+            "--first", "1000",
+        ]
+        if skip_token:
+            cmd += ["--skip-token", skip_token]
+
+        try:
+            proc = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        except FileNotFoundError as exc:
+            raise AzDiscError(
+                f"az CLI not found while running: {description}",
+                cmd=cmd,
+                stdout="",
+                stderr=str(exc),
+            ) from exc
+
+        metrics.incr("az_graph_query_calls")
+        metrics.incr("bytes_received", len(proc.stdout.encode("utf-8")))
+        if proc.returncode != 0:
+            raise AzDiscError(
+                f"az graph query failed: {description}",
+                cmd=cmd,
+                stdout=proc.stdout,
+                stderr=proc.stderr,
+            )
+
+        try:
+            return json.loads(proc.stdout)
+        except json.JSONDecodeError as exc:
+            raise AzDiscError(
+                f"Failed to parse az graph output: {description}",
+                cmd=cmd,
+                stdout=proc.stdout,
+                stderr=proc.stderr,
+            ) from exc
+
+    def _query_chunk(self, kql: str, subs: List[str], description: str) -> List[dict]:
+        """
+        Return all rows of one subscription chunk: from the query cache if fresh,
+        otherwise by following skip tokens live and caching the complete result.
+        """
+        if self.cache is not None:
+            cached = self.cache.get(kql, subs)
+            if cached is not None:
+                metrics.incr("cache_hits")
+                return cached
         results = []
-        sub_chunks = list(chunk(self.subscriptions, 20))
-
-        for subs in sub_chunks:
-            skip_token = None
-            while True:
-                cmd = [
-                    "az", "graph", "query",
-                    "-q", kql,
-                    "--subscriptions", *subs,
-                    "--first", "1000",
-                ]
-                if skip_token:
-                    cmd += ["--skip-token", skip_token]
-
-                try:
-                    proc = subprocess.run(
-                        cmd,
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                    )
-                except FileNotFoundError as exc:
-                    raise AzDiscError(
-                        f"az CLI not found while running: {description}",
-                        cmd=cmd,
-                        stdout="",
-                        stderr=str(exc),
-                    ) from exc
-
-                if proc.returncode != 0:
-                    raise AzDiscError(
-                        f"az graph query failed: {description}",
-                        cmd=cmd,
-                        stdout=proc.stdout,
-                        stderr=proc.stderr,
-                    )
-
-                try:
-                    data = json.loads(proc.stdout)
-                except json.JSONDecodeError as exc:
-                    raise AzDiscError(
-                        f"Failed to parse az graph output: {description}",
-                        cmd=cmd,
-                        stdout=proc.stdout,
-                        stderr=proc.stderr,
-                    ) from exc
-
-                page_results = data.get("data", [])
-                results.extend(page_results)
-
-                skip_token = data.get("skipToken") or data.get("skip_token")
-                if not skip_token:
-                    break
+        skip_token = None
+        while True:
+            metrics.incr("pages")
+            data = self._fetch_page(kql, subs, skip_token, description)
+            results.extend(data.get("data", []))
 
+            skip_token = data.get("skipToken") or data.get("skip_token")
+            if not skip_token:
+                break
+        if self.cache is not None:
+            self.cache.put(kql, subs, results)
         return results
 
+    def _run_queries(
+        self, kqls: List[str], description: str, scopes: List[str] = None
+    ) -> List[dict]:
+        """
+        Execute each query against every subscription chunk (max 20 per call), or
+        against chunks of management group `scopes` (see _split_scopes) if given.
+
+        Chunks are independent and run on the client's `workers` threads; pages within a chunk
+        stay sequential because each one needs the previous skip token. Results are
+        concatenated in (query, chunk) order regardless of completion order.
+        """
+        scopes = self.subscriptions if scopes is None else scopes
+        tasks = [(kql, subs) for kql in kqls for subs in chunk(scopes, 20)]
+
+        def run(task):
+            return self._query_chunk(task[0], task[1], description)
+
+        if self.workers == 1 or len(tasks) <= 1:
+            chunk_results = [run(task) for task in tasks]
+        else:
+            chunk_results = list(self._pool().map(run, tasks))
+
+        results = []
+        for page_results in chunk_results:
+            results.extend(page_results)
+        return results
+
+    def _run_query(self, kql: str, description: str) -> List[dict]:
+        """Execute az graph query with pagination and chunked subscriptions (max 20 per call)."""
+        return self._run_queries([kql], description)
+
     def query_seed(self, seed_rgs: List[str]) -> List[dict]:
         """Query all resources in seed resource groups."""
         rg_list = ", ".join(f"'{rg}'" for rg in seed_rgs)
         kql = (
-            f"resources | where resourceGroup in~ ({rg_list}) "
-            "| project id, name, type, location, subscriptionId, resourceGroup, properties"
+            f"resources | where resourceGroup in~ ({rg_list}) {self._project()}"
         )
         return self._run_query(kql, "seed query")
 
+    def query_seed_multihop(self, seed_rgs: List[str]) -> List[dict]:
+        """
+        Query the seed resource groups plus their neighbours up to two hops away.
+
+        One query unions the seed rows with the resources referenced from HOP_PROPERTIES
+        of the seed (hop 1) and of hop 1 (hop 2), resolved server-side with three joins,
+        the Resource Graph limit. Neighbours are only found within each subscription
+        chunk; the ID-following loop in expand() picks up anything else. Rows are
+        de-duplicated by ID, keeping the first.
+        """
+        rg_list = ", ".join(f"'{rg}'" for rg in seed_rgs)
+        seed = f"resources | where resourceGroup in~ ({rg_list})"
+        hop1 = _hop_kql(seed)
+        hop2 = _hop_kql(hop1)
+        project = self._project()
+        kql = f"{seed} {project} | union ({hop1} {project}), ({hop2} {project})"
+        seen = set()
+        results = []
+        for row in self._run_query(kql, "multi-hop seed query"):
+            rid = str(row.get("id", "")).lower()
+            if rid not in seen:
+                seen.add(rid)
+                results.append(row)
+        return results
+
     def query_by_ids(self, ids: List[str]) -> List[dict]:
         """Fetch resources by ARM IDs in chunks of 200."""
-        results = []
+        kqls = []
         for id_chunk in chunk(ids, 200):
             id_list = ", ".join(f"'{i}'" for i in id_chunk)
-            kql = (
-                f"resources | where id in~ ({id_list}) "
-                "| project id, name, type, location, subscriptionId, resourceGroup, properties"
+            kqls.append(
+                f"resources | where id in~ ({id_list}) {self._project()}"
             )
-            results.extend(self._run_query(kql, "query_by_ids"))
-        return results
+        return self._run_queries(kqls, "query_by_ids")
+
+    def query_changes(self, since: str, seed_rgs: List[str], ids: List[str]) -> List[dict]:
+        """
+        Query ARG change history for changes after `since` (ISO 8601 UTC timestamp).
+
+        Covers every resource in the seed resource groups plus the given ARM IDs (in
+        chunks of 200). Returns rows with targetResourceId, changeType and changeTime.
+        """
+        base = (
+            "resourcechanges "
+            "| extend changeTime = todatetime(properties.changeAttributes.timestamp), "
+            "targetResourceId = tolower(tostring(properties.targetResourceId)), "
+            "changeType = tostring(properties.changeType) "
+            f"| where changeTime > datetime({since}) "
+        )
+        project = "| project targetResourceId, changeType, changeTime"
+        rg_list = ", ".join(f"'{rg}'" for rg in seed_rgs)
+        kqls = [f"{base}| where resourceGroup in~ ({rg_list}) {project}"]
+        for id_chunk in chunk(ids, 200):
+            id_list = ", ".join(f"'{i}'" for i in id_chunk)
+            kqls.append(f"{base}| where targetResourceId in~ ({id_list}) {project}")
+        return self._run_queries(kqls, "change history query")
+
+    def query_all(self) -> List[dict]:
+        """Sweep every resource in the client's subscriptions, with full properties."""
+        kql = f"resources | project {RESOURCE_COLUMNS}"
+        return self._run_query(kql, "resources sweep")
 
-    def query_rbac(self, scopes: List[str]) -> List[dict]:
-        """Query role assignments for given scopes."""
-        scope_list = ", ".join(f"'{s}'" for s in scopes)
+    def query_rbac_all(self) -> List[dict]:
+        """Sweep the role assignments in the client's subscriptions, per subscription chunk."""
+        kql = f"{ROLE_ASSIGNMENTS}| project id, name, type, subscriptionId, resourceGroup, properties"
+        return self._run_query(kql, "rbac sweep")
+
+    def query_subscription_ancestry(self) -> Dict[str, List[str]]:
+        """Map each lowercase subscription ID to its management group names, nearest first."""
         kql = (
-            "authorizationresources "
-            "| where type =~ 'microsoft.authorization/roleassignments' "
+            "resourcecontainers | where type =~ 'microsoft.resources/subscriptions' "
+            "| project subscriptionId, chain = properties.managementGroupAncestorsChain"
+        )
+        ancestry = {}
+        for row in self._run_query(kql, "management group ancestry"):
+            ancestry[str(row.get("subscriptionId", "")).lower()] = [
+                str(mg.get("name", "")).lower() for mg in row.get("chain") or [] if mg.get("name")
+            ]
+        return ancestry
+
+    def query_rbac_management_groups(self, groups: List[str]) -> List[dict]:
+        """Role assignments scoped to management groups, queried under `groups`."""
+        kql = (
+            f"{ROLE_ASSIGNMENTS}"
             "| extend scope = tolower(tostring(properties.scope)) "
-            f"| where scope in~ ({scope_list}) "
+            f"| where scope startswith '{MG_SCOPE_PREFIX}' "
             "| project id, name, type, subscriptionId, resourceGroup, properties"
         )
-        return self._run_query(kql, "rbac query")
+        return self._run_queries(
+            [kql], "management group rbac query", [MG_SCOPE_PREFIX + g for g in groups]
+        )
+
+
+class AzureResourceGraphRest(AzureResourceGraph):
+    """
+    Resource Graph client that POSTs to the REST endpoint instead of forking `az`.
+
+    One keep-alive connection is kept per worker thread, reused across queries because
+    the worker pool lives as long as the client, and closed by close(). One bearer token
+    is shared across calls (acquired once through `az account get-access-token` unless
+    passed in).
+    If the token cannot be obtained or the endpoint is unreachable, the client prints a
+    warning and falls back to the az CLI for the rest of its lifetime.
+    """
+
+    MAX_RETRIES = 3
+
+    def __init__(
+        self,
+        subscriptions: List[str],
+        workers: int = 1,
+        endpoint: str = ARM_ENDPOINT,
+        token: str = None,
+        timeout: float = 60.0,
+        cache: QueryCache = None,
+        project_properties: bool = False,
+    ):
+        super().__init__(
+            subscriptions, workers=workers, cache=cache, project_properties=project_properties
+        )
+        parts = urlsplit(endpoint)
+        self._scheme = parts.scheme
+        self._host = parts.netloc
+        self._path = parts.path.rstrip("/") + (
+            f"/providers/Microsoft.ResourceGraph/resources?api-version={ARG_API_VERSION}"
+        )
+        self._timeout = timeout
+        self._token = token
+        self._token_expires = float("inf") if token else 0.0
+        self._token_lock = threading.Lock()
+        self._local = threading.local()
+        self._conns = set()
+        self._conns_lock = threading.Lock()
+        self._fallback = False
+
+    def _get_token(self) -> str:
+        """Return a cached ARM bearer token, refreshing it five minutes before expiry."""
+        with self._token_lock:
+            if self._token and time.time() < self._token_expires - 300:
+                return self._token
+            cmd = [
+                "az", "account", "get-access-token",
+                "--resource", ARM_ENDPOINT + "/",
+                "-o", "json",
+            ]
+            try:
+                proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
+            except FileNotFoundError as exc:
+                raise AzDiscError(
+                    "az CLI not found while acquiring access token",
+                    cmd=cmd,
+                    stdout="",
+                    stderr=str(exc),
+                ) from exc
+            if proc.returncode != 0:
+                raise AzDiscError(
+                    "az account get-access-token failed",
+                    cmd=cmd,
+                    stdout=proc.stdout,
+                    stderr=proc.stderr,
+                )
+            try:
+                data = json.loads(proc.stdout)
+            except json.JSONDecodeError as exc:
+                raise AzDiscError(
+                    "Failed to parse az account get-access-token output",
+                    cmd=cmd,
+                    stdout=proc.stdout,
+                    stderr=proc.stderr,
+                ) from exc
+            self._token = data["accessToken"]
+            # Older CLIs only report a local-time "expiresOn"; assume the usual hour.
+            self._token_expires = float(data.get("expires_on") or time.time() + 3600)
+            return self._token
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self._scheme == "https":
+                conn = http.client.HTTPSConnection(self._host, timeout=self._timeout)
+            else:
+                conn = http.client.HTTPConnection(self._host, timeout=self._timeout)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.add(conn)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+            with self._conns_lock:
+                self._conns.discard(conn)
+
+    def close(self):
+        """Shut down the worker pool, then close every kept-alive connection."""
+        super().close()
+        with self._conns_lock:
+            conns, self._conns = self._conns, set()
+        for conn in conns:
+            conn.close()
+
+    def _post(self, body: bytes):
+        """POST one query, reconnecting once if the pooled connection went stale."""
+        headers = {
+            "Authorization": f"Bearer {self._get_token()}",
+            "Content-Type": "application/json",
+        }
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", self._path, body=body, headers=headers)
+                resp = conn.getresponse()
+                return resp.status, resp.getheader("Retry-After"), resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self._drop_connection()
+                if attempt:
+                    raise
+            except OSError:
+                self._drop_connection()
+                raise
+
+    def _fetch_page(self, kql: str, subs: List[str], skip_token, description: str) -> dict:
+        if self._fallback:
+            return super()._fetch_page(kql, subs, skip_token, description)
+
+        options = {"$top": 1000, "resultFormat": "objectArray"}
+        if skip_token:
+            options["$skipToken"] = skip_token
+        kind, names = _split_scopes(subs)
+        body = json.dumps({kind: names, "query": kql, "options": options}).encode()
+        request = ["POST", f"{self._scheme}://{self._host}{self._path}"]
+
+        for attempt in range(self.MAX_RETRIES + 1):
+            try:
+                status, retry_after, payload = self._post(body)
+                metrics.incr("rest_requests")
+                metrics.incr("bytes_received", len(payload))
+            except (AzDiscError, OSError) as exc:
+                print(
+                    f"  [arg] REST backend unavailable ({exc}); falling back to az CLI",
+                    file=sys.stderr,
+                )
+                self._fallback = True
+                return super()._fetch_page(kql, subs, skip_token, description)
+
+            if status == 429 and attempt < self.MAX_RETRIES:
+                time.sleep(min(_retry_delay(retry_after, attempt), 30.0))
+                continue
+            break
+
+        text = payload.decode("utf-8", errors="replace")
+        if status != 200:
+            raise AzDiscError(
+                f"ARG REST query failed with HTTP {status}: {description}",
+                cmd=request,
+                stdout=text,
+                stderr="",
+            )
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as exc:
+            raise AzDiscError(
+                f"Failed to parse ARG REST response: {description}",
+                cmd=request,
+                stdout=text,
+                stderr="",
+            ) from exc
+        return {"data": data.get("data", []), "skipToken": data.get("$skipToken")}
+
+
+def _retry_delay(retry_after, attempt: int) -> float:
+    """Seconds from a Retry-After header, or exponential backoff if absent or an HTTP-date."""
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return float(2 ** attempt)
+
+
+def make_arg(config, use_cache: bool = True, refresh: bool = False) -> AzureResourceGraph:
+    """
+    Build the Resource Graph client selected by `config.backend` ("cli" or "rest").
+
+    Unless `use_cache` is False, query results are cached under `config.cacheDir`
+    (default `<outputDir>/.cache/arg`); `refresh` bypasses cached results but rewrites them.
+    `config.projectProperties` turns the per-type property projection on or off.
+    """
+    cache = None
+    if use_cache and config.cacheTtl > 0:
+        cache_dir = config.cacheDir or os.path.join(config.outputDir, ".cache", "arg")
+        cache = QueryCache(cache_dir, config.cacheTtl, config.cacheMaxBytes, refresh=refresh)
+    opts = {
+        "workers": config.queryWorkers,
+        "cache": cache,
+        "project_properties": config.projectProperties,
+    }
+    if config.backend == "rest":
+        return AzureResourceGraphRest(config.subscriptions, **opts)
+    return AzureResourceGraph(config.subscriptions, **opts)
@@ -0,0 +1,118 @@
+"""Multi-app discovery that fetches each resource once for a whole batch of configs."""
+from typing import Dict, Iterable, List, Set, Tuple
+
+from tools.azdisc.arg import AzureResourceGraph
+from tools.azdisc.config import AppConfig
+from tools.azdisc.expand import follow_references
+from tools.azdisc.rbac import collect_rbac
+from tools.azdisc.util import normalize_id
+
+
+def plan(configs: List[AppConfig]) -> Tuple[List[str], List[str]]:
+    """Return the union of subscriptions and of seed resource groups (case-insensitive)."""
+    subs = {}
+    rgs = {}
+    for config in configs:
+        for sub in config.subscriptions:
+            subs.setdefault(sub.lower(), sub)
+        for rg in config.seedResourceGroups:
+            rgs.setdefault(rg.lower(), rg)
+    return [subs[k] for k in sorted(subs)], [rgs[k] for k in sorted(rgs)]
+
+
+class ResourcePool:
+    """
+    Every resource fetched for the batch, keyed by normalized ID. Each ID is sent to
+    Resource Graph at most once; IDs it could not resolve are remembered too.
+    """
+
+    def __init__(self, arg: AzureResourceGraph):
+        self.arg = arg
+        self.by_id: Dict[str, dict] = {}
+        self.not_found: Set[str] = set()
+
+    def add(self, resources: Iterable[dict]):
+        for resource in resources:
+            self.by_id.setdefault(normalize_id(resource["id"]), resource)
+
+    def fetch(self, ids: List[str]) -> List[dict]:
+        """Query the IDs not seen before; return pooled resources for `ids`."""
+        wanted = [normalize_id(i) for i in ids]
+        unknown = sorted({i for i in wanted if i not in self.by_id and i not in self.not_found})
+        if unknown:
+            fetched = self.arg.query_by_ids(unknown)
+            self.add(fetched)
+            self.not_found.update(i for i in unknown if i not in self.by_id)
+        return self.lookup(wanted)
+
+    def lookup(self, ids: Iterable[str], subscriptions: Set[str] = None) -> List[dict]:
+        """Pooled resources for `ids`, optionally limited to lowercase `subscriptions`."""
+        found = []
+        for nid in sorted({normalize_id(i) for i in ids}):
+            resource = self.by_id.get(nid)
+            if resource is None:
+                continue
+            if subscriptions is not None and resource.get("subscriptionId", "").lower() not in subscriptions:
+                continue
+            found.append(resource)
+        return found
+
+
+def discover_shared(configs: List[AppConfig], arg: AzureResourceGraph) -> ResourcePool:
+    """
+    Run one seed query over the union of seed resource groups, then expand the apps'
+    seeds together so every resource any app can reach is in the pool.
+
+    `arg` must cover the union of the apps' subscriptions (see plan()).
+    """
+    _, seed_rgs = plan(configs)
+    pool = ResourcePool(arg)
+    pool.add(arg.query_seed(seed_rgs))
+    # The union query also matches seed group names in other apps' subscriptions;
+    # only resources some app actually seeds are followed
+    seeds = {}
+    for config in configs:
+        for resource in app_seed(config, pool):
+            seeds.setdefault(normalize_id(resource["id"]), resource)
+    frontier = list(seeds.values())
+    follow_references(list(frontier), frontier, pool.fetch, set(pool.by_id), set(), {})
+    return pool
+
+
+def app_seed(config: AppConfig, pool: ResourcePool) -> List[dict]:
+    """The resources the app's own seed query would return, in pool order."""
+    subs = {s.lower() for s in config.subscriptions}
+    rgs = {rg.lower() for rg in config.seedResourceGroups}
+    return [
+        r for r in pool.by_id.values()
+        if r.get("subscriptionId", "").lower() in subs and r.get("resourceGroup", "").lower() in rgs
+    ]
+
+
+def expand_app(config: AppConfig, pool: ResourcePool) -> Tuple[List[dict], List[str]]:
+    """
+    Compute one app's (inventory, unresolved) from the pool without querying Azure.
+
+    Lookups are limited to the app's subscriptions, as its own query_by_ids would be.
+    """
+    subs = {s.lower() for s in config.subscriptions}
+    inventory = app_seed(config, pool)
+    collected = {normalize_id(r["id"]) for r in inventory}
+    unresolved = set()
+    follow_references(
+        inventory,
+        list(inventory),
+        lambda ids: pool.lookup(ids, subs),
+        collected,
+        unresolved,
+        {},
+    )
+    return inventory, sorted(unresolved)
+
+
+def shared_rbac(arg: AzureResourceGraph, inventories: List[List[dict]]) -> List[List[dict]]:
+    """
+    Fetch role assignments once for the shared subscriptions and match them against
+    each inventory; returns one assignment list per inventory.
+    """
+    return collect_rbac(arg, inventories)
@@ -0,0 +1 @@
+"""Stand-alone performance benchmarks for azdisc (run as `python3 -m tools.azdisc.bench.<name>`)."""
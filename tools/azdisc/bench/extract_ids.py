@@ -0,0 +1,114 @@
+"""
+Benchmark the iterative ARM ID extractor against the recursive one it replaced.
+
+    python3 -m tools.azdisc.bench.extract_ids --resources 1000 --depth 5 --width 4
+
+Each generated resource has a deep, wide property tree with ARM IDs at the leaves, a
+large custom data blob (skipped by type), a long policy-like document and, for every
+fourth resource, a logic-app style workflow definition. Reported times are the best of `--repeat` runs.
+"""
+import argparse
+import random
+import time
+
+from tools.azdisc.util import extract_arm_ids, resource_arm_ids
+
+SUB = "00000000-0000-0000-0000-000000000001"
+
+
+def legacy_extract_arm_ids(obj):
+    """The previous recursive extractor, kept as the comparison baseline."""
+    found = set()
+    if isinstance(obj, str):
+        s = obj.lower().strip()
+        if s.startswith("/subscriptions/") and "/providers/" in s:
+            found.add(s)
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            found |= legacy_extract_arm_ids(v)
+    elif isinstance(obj, list):
+        for item in obj:
+            found |= legacy_extract_arm_ids(item)
+    return found
+
+
+def _tree(rng, depth, width, index):
+    if depth == 0:
+        roll = rng.random()
+        if roll < 0.2:
+            return (
+                f"/subscriptions/{SUB}/resourceGroups/rg-{index % 50}/providers/"
+                f"Microsoft.Network/networkInterfaces/nic-{rng.randrange(10000)}"
+            )
+        if roll < 0.6:
+            return f"value-{rng.randrange(1000)} " * rng.randint(1, 8)
+        return rng.randrange(1000)
+    return {
+        f"key{i}": (
+            [_tree(rng, depth - 1, width, index) for _ in range(2)]
+            if i % 3 == 0 else _tree(rng, depth - 1, width, index)
+        )
+        for i in range(width)
+    }
+
+
+def make_resources(n, depth, width, seed=0):
+    rng = random.Random(seed)
+    blob = "IyEvYmluL2Jhc2gKZWNobyBoZWxsbwo=" * 2000
+    resources = []
+    for i in range(n):
+        workflow = i % 4 == 0
+        rtype = "microsoft.logic/workflows" if workflow else "microsoft.compute/virtualmachines"
+        properties = {
+            "network": _tree(rng, depth // 2, width, i),
+            "osProfile": {"customData": blob},
+            "policy": {"if": {"allOf": [{"field": f"f{j}", "equals": f"v{j}"} for j in range(200)]}},
+        }
+        if workflow:
+            properties["definition"] = _tree(rng, depth, width, i)
+        resources.append({
+            "id": f"/subscriptions/{SUB}/resourceGroups/rg-{i % 50}/providers/{rtype}/r{i}",
+            "type": rtype,
+            "properties": properties,
+        })
+    return resources
+
+
+def _best(fn, resources, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for resource in resources:
+            fn(resource)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resources", type=int, default=1000)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--width", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    resources = make_resources(args.resources, args.depth, args.width)
+    assert all(legacy_extract_arm_ids(r) == extract_arm_ids(r) for r in resources)
+
+    variants = (
+        ("legacy", legacy_extract_arm_ids),
+        ("iterative", extract_arm_ids),
+        ("skip", resource_arm_ids),
+    )
+    print(f"{args.resources} resources, depth {args.depth}, width {args.width}")
+    print(f"{'variant':<10} {'seconds':>9} {'speedup':>9}")
+    baseline = None
+    for name, fn in variants:
+        seconds = _best(fn, resources, args.repeat)
+        baseline = baseline or seconds
+        print(f"{name:<10} {seconds:>9.3f} {baseline / seconds:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
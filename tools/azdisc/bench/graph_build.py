@@ -0,0 +1,177 @@
+"""
+Benchmark the interned CompactGraph against the dict/tuple graph build it replaced.
+
+    python3 -m tools.azdisc.bench.graph_build --resources 100000 --graph-workers 4
+
+Each variant builds the graph and writes graph.json in a fresh interpreter. Reported
+memory is the growth in peak RSS over the generated inventory (main process only).
+The "parallel" variant feeds NDJSON lines to build_compact_graph_parallel.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from tools.azdisc.bench.json_writer import make_inventory
+from tools.azdisc.graph import (
+    _COMPILED_RULES,
+    _iter_list,
+    _safe_get,
+    build_compact_graph,
+    build_compact_graph_parallel,
+)
+from tools.azdisc.util import dump_json, normalize_id
+
+
+def legacy_build_graph(inventory, rbac):
+    """The previous dict-of-dicts / tuple-list build, kept as the comparison baseline."""
+    node_map = {}
+    edges = []
+
+    def make_node(res, is_external=False):
+        return {
+            "id": normalize_id(res["id"]),
+            "name": res.get("name", ""),
+            "type": normalize_id(res.get("type", "")),
+            "location": res.get("location", ""),
+            "resourceGroup": res.get("resourceGroup", ""),
+            "subscriptionId": res.get("subscriptionId", ""),
+            "isExternal": is_external,
+        }
+
+    def ensure_external(arm_id):
+        nid = normalize_id(arm_id)
+        if nid and nid not in node_map:
+            node_map[nid] = {
+                "id": nid, "name": nid.split("/")[-1], "type": "", "location": "",
+                "resourceGroup": "", "subscriptionId": "", "isExternal": True,
+            }
+
+    targets = []
+    for res in inventory:
+        rid = normalize_id(res["id"])
+        node_map[rid] = make_node(res)
+        props = res.get("properties") or {}
+        for extract, kind, transform in _COMPILED_RULES.get(normalize_id(res.get("type", "")), ()):
+            extract(rid, props, targets)
+            for target in targets:
+                if transform is not None:
+                    target = transform(target)
+                    if not target:
+                        continue
+                ensure_external(target)
+                if rid != target:
+                    edges.append((rid, normalize_id(target), kind))
+            targets.clear()
+        for subnet in _iter_list(props, "subnets"):
+            if isinstance(subnet, dict) and subnet.get("id"):
+                edges.append((normalize_id(subnet["id"]), rid, "dependency"))
+
+    for ra in rbac:
+        ra_id = normalize_id(ra["id"])
+        node_map.setdefault(ra_id, make_node(ra))
+        scope = normalize_id(str(_safe_get(ra, "properties", "scope") or ""))
+        if scope:
+            ensure_external(scope)
+            edges.append((scope, ra_id, "rbac_assignment"))
+
+    nodes = sorted(node_map.values(), key=lambda n: n["id"])
+    sorted_edges = sorted(
+        [{"src": s, "dst": d, "kind": k} for s, d, k in set(edges)],
+        key=lambda e: (e["src"], e["dst"], e["kind"]),
+    )
+    return {"nodes": nodes, "edges": sorted_edges}
+
+
+def _legacy(inventory, path):
+    graph = legacy_build_graph(inventory, [])
+    built = time.perf_counter()
+    with open(path, "w", encoding="utf-8") as fh:
+        dump_json(graph, fh)
+    return built
+
+
+def _compact(inventory, path):
+    graph = build_compact_graph(inventory, [])
+    built = time.perf_counter()
+    with open(path, "w", encoding="utf-8") as fh:
+        dump_json({"nodes": graph.iter_node_dicts(), "edges": graph.iter_edge_dicts()}, fh)
+    return built
+
+
+def _parallel(inventory, path):
+    lines = [json.dumps(r) for r in inventory]
+    inventory.clear()
+    graph = build_compact_graph_parallel(lines, [], int(os.environ.get("AZDISC_GRAPH_WORKERS", "4")))
+    built = time.perf_counter()
+    with open(path, "w", encoding="utf-8") as fh:
+        dump_json({"nodes": graph.iter_node_dicts(), "edges": graph.iter_edge_dicts()}, fh)
+    return built
+
+
+VARIANTS = {"legacy": _legacy, "compact": _compact, "parallel": _parallel}
+
+
+def _maxrss_mib():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+def run_variant(name, n, path):
+    """Build and write graph.json with one variant; return timings and RSS growth."""
+    inventory = make_inventory(n)
+    before = _maxrss_mib()
+    start = time.perf_counter()
+    built = VARIANTS[name](inventory, path)
+    return {
+        "variant": name,
+        "build_seconds": built - start,
+        "total_seconds": time.perf_counter() - start,
+        "peak_rss_growth_mib": _maxrss_mib() - before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resources", type=int, default=100000)
+    parser.add_argument("--graph-workers", type=int, default=4)
+    parser.add_argument("--variant", choices=sorted(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.resources, args.output)))
+        return
+
+    print(f"{args.resources} resources")
+    print(f"{'variant':<10} {'build s':>9} {'total s':>9} {'RSS MiB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = []
+        env = dict(os.environ, AZDISC_GRAPH_WORKERS=str(args.graph_workers))
+        for name in ("legacy", "compact", "parallel"):
+            path = os.path.join(tmp, f"{name}.json")
+            outputs.append(path)
+            proc = subprocess.run(
+                [sys.executable, "-m", "tools.azdisc.bench.graph_build",
+                 "--resources", str(args.resources), "--variant", name, "--output", path],
+                capture_output=True, text=True, check=True, env=env,
+            )
+            r = json.loads(proc.stdout)
+            print(
+                f"{name:<10} {r['build_seconds']:>9.2f} {r['total_seconds']:>9.2f} "
+                f"{r['peak_rss_growth_mib']:>9.1f}"
+            )
+        contents = []
+        for path in outputs:
+            with open(path, "rb") as fh:
+                contents.append(fh.read())
+        print(f"byte-identical graph.json: {len(set(contents)) == 1}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark the streaming JSON writer against the sorted-copy path it replaced.
+
+    python3 -m tools.azdisc.bench.json_writer --resources 20000
+
+Reports wall time and tracemalloc peak for each writer and checks the outputs are
+byte-identical.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from tools.azdisc.util import dump_json, sort_keys
+
+
+def make_inventory(n):
+    """Build `n` VM-like resources with moderately deep property bags."""
+    sub = "00000000-0000-0000-0000-000000000001"
+    base = f"/subscriptions/{sub}/resourceGroups/rg-bench/providers"
+    inventory = []
+    for i in range(n):
+        inventory.append({
+            "id": f"{base}/Microsoft.Compute/virtualMachines/vm-{i}",
+            "name": f"vm-{i}",
+            "type": "microsoft.compute/virtualmachines",
+            "location": "eastus",
+            "subscriptionId": sub,
+            "resourceGroup": "rg-bench",
+            "properties": {
+                "networkProfile": {
+                    "networkInterfaces": [
+                        {"id": f"{base}/Microsoft.Network/networkInterfaces/nic-{i}-{j}"}
+                        for j in range(2)
+                    ]
+                },
+                "storageProfile": {
+                    "osDisk": {"managedDisk": {"id": f"{base}/Microsoft.Compute/disks/os-{i}"}},
+                    "dataDisks": [
+                        {"lun": j, "managedDisk": {"id": f"{base}/Microsoft.Compute/disks/d-{i}-{j}"}}
+                        for j in range(3)
+                    ],
+                },
+                "tags": {f"tag{j}": f"value-{j}" for j in range(8)},
+            },
+        })
+    return inventory
+
+
+def legacy_write(data, path):
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(sort_keys(data), fh, indent=2, sort_keys=True)
+
+
+def stream_write(data, path):
+    with open(path, "w", encoding="utf-8") as fh:
+        dump_json(data, fh)
+
+
+def measure(fn, data, path):
+    start = time.perf_counter()
+    fn(data, path)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn(data, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resources", type=int, default=20000)
+    args = parser.parse_args()
+
+    data = make_inventory(args.resources)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        print(f"{args.resources} resources")
+        print(f"{'writer':<10} {'seconds':>9} {'peak MiB':>9}")
+        for name, fn in (("legacy", legacy_write), ("stream", stream_write)):
+            paths[name] = os.path.join(tmp, f"{name}.json")
+            elapsed, peak = measure(fn, data, paths[name])
+            print(f"{name:<10} {elapsed:>9.2f} {peak / 2**20:>9.1f}")
+        with open(paths["legacy"], "rb") as a, open(paths["stream"], "rb") as b:
+            identical = a.read() == b.read()
+        print(f"byte-identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark local role assignment matching as the assignment count grows.
+
+    python3 -m tools.azdisc.bench.rbac_match --resources 5000 --assignments 20000
+
+Matches `--assignments`, then twice and four times as many, against the inventory of a
+synthetic tenant; assignments are spread over its resources, resource groups,
+subscriptions and some unrelated scopes. Per-assignment time should stay flat.
+"""
+import argparse
+import random
+import time
+
+from tools.azdisc.bench.synth import _sub, generate
+from tools.azdisc.rbac import match_assignments
+
+
+def make_assignments(resources, n, seed=0):
+    rng = random.Random(seed)
+    scopes = [r["id"] for r in resources]
+    scopes += sorted({f"/subscriptions/{r['subscriptionId']}/resourceGroups/{r['resourceGroup']}"
+                      for r in resources})
+    scopes += [f"/subscriptions/{_sub(i)}" for i in range(8)]
+    return [
+        {
+            "id": f"{scope}/providers/Microsoft.Authorization/roleAssignments/ra-{i}",
+            "properties": {"scope": scope},
+        }
+        for i, scope in enumerate(rng.choice(scopes) for _ in range(n))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resources", type=int, default=5000)
+    parser.add_argument("--assignments", type=int, default=20000)
+    args = parser.parse_args()
+
+    resources, _, _ = generate(args.resources)
+    inventory = resources[: len(resources) // 2]
+    print(f"{len(inventory)} inventory resources")
+    print(f"{'assignments':>12} {'matched':>9} {'seconds':>9} {'us/assignment':>14}")
+    for factor in (1, 2, 4):
+        assignments = make_assignments(resources, args.assignments * factor)
+        start = time.perf_counter()
+        matched = match_assignments(assignments, inventory)
+        seconds = time.perf_counter() - start
+        print(
+            f"{len(assignments):>12} {len(matched):>9} {seconds:>9.3f} "
+            f"{seconds / len(assignments) * 1e6:>14.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Time each pipeline stage on synthetic tenants and check against stored baselines.
+
+    python3 -m tools.azdisc.bench.stages --sizes 1000 10000 100000
+    python3 -m tools.azdisc.bench.stages --sizes 1000 10000 --check
+    python3 -m tools.azdisc.bench.stages --sizes 1000 10000 --save-baseline
+
+Every (size, stage) runs in a fresh interpreter. Input generation is not timed, and
+memory is the growth in peak RSS during the stage. `--check` exits non-zero when a stage
+is slower or larger than its baseline by more than `--threshold`.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from tools.azdisc.bench.synth import SyntheticARG, generate
+from tools.azdisc.config import AppConfig
+from tools.azdisc.docs import write_catalog, write_edges
+from tools.azdisc.emit_puml import emit_diagrams
+from tools.azdisc.expand import expand
+from tools.azdisc.graph import build_compact_graph
+from tools.azdisc.util import dump_json
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+STAGES = ("expand", "graph", "emit", "docs")
+
+# Baselines under this many seconds or MiB are too noisy to compare
+MIN_SECONDS = 0.05
+MIN_MIB = 5.0
+
+
+def _maxrss_mib():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+def _prepare(stage, n, out_dir):
+    """Build the stage's inputs outside the timed region; returns the stage callable."""
+    resources, rbac, seed_rgs = generate(n)
+    if stage == "expand":
+        config = AppConfig(app="bench", subscriptions=[], seedResourceGroups=seed_rgs, outputDir=out_dir)
+        arg = SyntheticARG(resources)
+        return lambda: expand(config, arg)
+    if stage == "graph":
+        def run():
+            graph = build_compact_graph(resources, rbac)
+            with open(os.path.join(out_dir, "graph.json"), "w", encoding="utf-8") as fh:
+                dump_json({"nodes": graph.iter_node_dicts(), "edges": graph.iter_edge_dicts()}, fh)
+        return run
+    graph = build_compact_graph(resources, rbac).to_dict()
+    if stage == "emit":
+        return lambda: emit_diagrams(graph, out_dir)
+    if stage == "docs":
+        def run():
+            write_catalog(resources, out_dir)
+            write_edges(graph, [], out_dir)
+        return run
+    raise ValueError(f"unknown stage: {stage}")
+
+
+def run_stage(stage, n):
+    """Run one stage in this process; returns its timing and RSS growth."""
+    with tempfile.TemporaryDirectory() as out_dir:
+        run = _prepare(stage, n, out_dir)
+        before = _maxrss_mib()
+        start = time.perf_counter()
+        run()
+        return {
+            "seconds": round(time.perf_counter() - start, 3),
+            "peak_rss_growth_mib": round(_maxrss_mib() - before, 1),
+        }
+
+
+def _run_isolated(stage, n):
+    proc = subprocess.run(
+        [sys.executable, "-m", "tools.azdisc.bench.stages", "--stage", stage, "--sizes", str(n)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout)
+
+
+def compare(results, baselines, threshold):
+    """Return a message for every measurement worse than baseline * threshold."""
+    regressions = []
+    for size, stages in sorted(results.items(), key=lambda kv: int(kv[0])):
+        for stage, r in sorted(stages.items()):
+            base = baselines.get(size, {}).get(stage)
+            if base is None:
+                continue
+            for key, floor in (("seconds", MIN_SECONDS), ("peak_rss_growth_mib", MIN_MIB)):
+                limit = max(base[key], floor) * threshold
+                if r[key] > limit:
+                    regressions.append(
+                        f"{stage} @ {size}: {key} {r[key]} > {limit:.2f} "
+                        f"(baseline {base[key]} x {threshold})"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--baselines", default=BASELINES, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store results as baselines")
+    parser.add_argument("--check", action="store_true", help="Fail on regressions against baselines")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Allowed ratio to baseline")
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        print(json.dumps(run_stage(args.stage, args.sizes[0])))
+        return
+
+    results = {}
+    print(f"{'size':>9} {'stage':<8} {'seconds':>9} {'RSS MiB':>9}")
+    for n in args.sizes:
+        for stage in args.stages:
+            r = _run_isolated(stage, n)
+            results.setdefault(str(n), {})[stage] = r
+            print(f"{n:>9} {stage:<8} {r['seconds']:>9.3f} {r['peak_rss_growth_mib']:>9.1f}")
+
+    if args.save_baseline:
+        baselines = {}
+        if os.path.exists(args.baselines):
+            with open(args.baselines, encoding="utf-8") as fh:
+                baselines = json.load(fh)
+        for size, stages in results.items():
+            baselines.setdefault(size, {}).update(stages)
+        with open(args.baselines, "w", encoding="utf-8") as fh:
+            dump_json(baselines, fh)
+            fh.write("\n")
+        print(f"baselines written to {args.baselines}")
+
+    if args.check:
+        with open(args.baselines, encoding="utf-8") as fh:
+            baselines = json.load(fh)
+        regressions = compare(results, baselines, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions (threshold x{args.threshold})")
+
+
+if __name__ == "__main__":
+    main()
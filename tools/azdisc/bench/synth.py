@@ -0,0 +1,247 @@
+"""
+Generate a synthetic Azure tenant for benchmarks.
+
+    python3 -m tools.azdisc.bench.synth --resources 10000 --output /tmp/synth
+
+Writes seed.json, inventory.json and rbac.json for a deterministic tenant of roughly
+`--resources` resources: app resource groups with VNets, subnets, VMs, NICs, disks,
+NSGs, private endpoints to storage accounts and key vaults, VNets peered to a hub in a
+shared network resource group, and role assignments at resource, resource group,
+subscription and management group scope. The seed resource groups are the
+app groups, so `expand` has hub VNets to discover.
+"""
+import argparse
+import os
+import random
+from typing import Dict, List, Tuple
+
+from tools.azdisc.arg import HOP_PROPERTIES, MG_SCOPE_PREFIX
+from tools.azdisc.util import dump_json, extract_arm_ids, normalize_id
+
+SUBSCRIPTION_COUNT = 4
+VMS_PER_APP = 8
+MANAGEMENT_GROUP = "mg-platform"
+ROLE_DEFINITION = "/providers/Microsoft.Authorization/roleDefinitions/acdd72a7-3385-48ef-bd42-f606fba81ae7"
+
+
+def _sub(i: int) -> str:
+    return f"00000000-0000-0000-0000-{i:012d}"
+
+
+class _Tenant:
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.resources = []
+        self.rbac = []
+
+    def add(self, sub, rg, provider, rtype, name, properties, location="eastus"):
+        rid = f"/subscriptions/{sub}/resourceGroups/{rg}/providers/{provider}/{rtype}/{name}"
+        self.resources.append({
+            "id": rid,
+            "name": name,
+            "type": f"{provider}/{rtype}".lower(),
+            "location": location,
+            "subscriptionId": sub,
+            "resourceGroup": rg,
+            "tags": {"env": self.rng.choice(["prod", "test", "dev"]), "app": rg},
+            "properties": properties,
+        })
+        return rid
+
+    def assign(self, scope, principal):
+        name = f"00000000-0000-0000-0001-{len(self.rbac):012d}"
+        self.rbac.append({
+            "id": f"{scope}/providers/Microsoft.Authorization/roleAssignments/{name}",
+            "name": name,
+            "type": "microsoft.authorization/roleassignments",
+            "properties": {
+                "scope": scope,
+                "principalId": principal,
+                "roleDefinitionId": ROLE_DEFINITION,
+            },
+        })
+
+    def hub(self, sub):
+        rg = "rg-network-hub"
+        return self.add(sub, rg, "Microsoft.Network", "virtualNetworks", "vnet-hub", {
+            "addressSpace": {"addressPrefixes": ["10.0.0.0/16"]},
+            "subnets": [
+                {"id": f"/subscriptions/{sub}/resourceGroups/{rg}/providers/Microsoft.Network"
+                       f"/virtualNetworks/vnet-hub/subnets/{name}",
+                 "name": name, "properties": {"addressPrefix": f"10.0.{i}.0/24"}}
+                for i, name in enumerate(("GatewaySubnet", "AzureFirewallSubnet"))
+            ],
+        })
+
+    def app(self, sub, index, hub_id):
+        """Add one app resource group; returns its name."""
+        rg = f"rg-app-{index:05d}"
+        net = "Microsoft.Network"
+        nsg = self.add(sub, rg, net, "networkSecurityGroups", "nsg", {
+            "securityRules": [
+                {"name": f"rule-{i}", "properties": {"priority": 100 + i, "access": "Allow"}}
+                for i in range(4)
+            ],
+        })
+        vnet_name = f"vnet-{index:05d}"
+        vnet_prefix = f"/subscriptions/{sub}/resourceGroups/{rg}/providers/{net}/virtualNetworks/{vnet_name}"
+        subnets = [f"{vnet_prefix}/subnets/{name}" for name in ("app", "data", "endpoints")]
+        self.add(sub, rg, net, "virtualNetworks", vnet_name, {
+            "addressSpace": {"addressPrefixes": [f"10.{index % 250}.0.0/16"]},
+            "subnets": [
+                {"id": sid, "name": sid.rsplit("/", 1)[-1],
+                 "properties": {"networkSecurityGroup": {"id": nsg}}}
+                for sid in subnets
+            ],
+            "virtualNetworkPeerings": [
+                {"name": "to-hub", "properties": {"remoteVirtualNetwork": {"id": hub_id}}}
+            ],
+        })
+
+        for v in range(self.rng.randint(VMS_PER_APP // 2, VMS_PER_APP)):
+            name = f"vm-{index:05d}-{v}"
+            nic = self.add(sub, rg, net, "networkInterfaces", f"{name}-nic", {
+                "ipConfigurations": [{
+                    "name": "ipconfig1",
+                    "properties": {
+                        "privateIPAddress": f"10.{index % 250}.0.{v + 4}",
+                        "subnet": {"id": subnets[v % 2]},
+                    },
+                }],
+            })
+            os_disk = self.add(sub, rg, "Microsoft.Compute", "disks", f"{name}-os", {
+                "diskSizeGB": 128, "osType": "Linux",
+            })
+            data_disks = [
+                self.add(sub, rg, "Microsoft.Compute", "disks", f"{name}-data{d}", {"diskSizeGB": 256})
+                for d in range(self.rng.randint(0, 2))
+            ]
+            vm = self.add(sub, rg, "Microsoft.Compute", "virtualMachines", name, {
+                "hardwareProfile": {"vmSize": "Standard_D4s_v5"},
+                "networkProfile": {"networkInterfaces": [{"id": nic}]},
+                "storageProfile": {
+                    "osDisk": {"name": f"{name}-os", "managedDisk": {"id": os_disk}},
+                    "dataDisks": [
+                        {"lun": d, "managedDisk": {"id": disk}} for d, disk in enumerate(data_disks)
+                    ],
+                },
+            })
+            if self.rng.random() < 0.3:
+                self.assign(vm, f"principal-{index}-{v}")
+
+        targets = [
+            self.add(sub, rg, "Microsoft.Storage", "storageAccounts", f"st{index:05d}", {
+                "supportsHttpsTrafficOnly": True,
+            }),
+            self.add(sub, rg, "Microsoft.KeyVault", "vaults", f"kv-{index:05d}", {
+                "enableSoftDelete": True,
+            }),
+        ]
+        for i, target in enumerate(targets):
+            self.add(sub, rg, net, "privateEndpoints", f"pe-{index:05d}-{i}", {
+                "subnet": {"id": subnets[2]},
+                "privateLinkServiceConnections": [
+                    {"name": "plsc", "properties": {"privateLinkServiceId": target}}
+                ],
+            })
+        self.assign(f"/subscriptions/{sub}/resourceGroups/{rg}", f"principal-{index}")
+        return rg
+
+
+def generate(n: int, seed: int = 0) -> Tuple[List[dict], List[dict], List[str]]:
+    """
+    Build a tenant of about `n` resources (never fewer).
+
+    Returns (resources, role assignments, seed resource group names). Output depends
+    only on `n` and `seed`.
+    """
+    tenant = _Tenant(seed)
+    hubs = [tenant.hub(_sub(s)) for s in range(SUBSCRIPTION_COUNT)]
+    seed_rgs = []
+    index = 0
+    while len(tenant.resources) < n:
+        s = index % SUBSCRIPTION_COUNT
+        seed_rgs.append(tenant.app(_sub(s), index, hubs[s]))
+        index += 1
+    for s in range(SUBSCRIPTION_COUNT):
+        tenant.assign(f"/subscriptions/{_sub(s)}", f"principal-sub-{s}")
+    tenant.assign(
+        f"/providers/Microsoft.Management/managementGroups/{MANAGEMENT_GROUP}", "principal-platform"
+    )
+    return tenant.resources, tenant.rbac, seed_rgs
+
+
+class SyntheticARG:
+    """
+    In-memory AzureResourceGraph stand-in serving a generated tenant. Every
+    subscription sits under MANAGEMENT_GROUP.
+    """
+
+    def __init__(self, resources: List[dict], rbac: List[dict] = ()):
+        self.by_id: Dict[str, dict] = {normalize_id(r["id"]): r for r in resources}
+        self.rbac = list(rbac)
+
+    def query_seed(self, seed_rgs: List[str]) -> List[dict]:
+        rgs = {rg.lower() for rg in seed_rgs}
+        return [r for r in self.by_id.values() if r["resourceGroup"].lower() in rgs]
+
+    def query_seed_multihop(self, seed_rgs: List[str]) -> List[dict]:
+        """Python rendering of AzureResourceGraph.query_seed_multihop's two hops."""
+        found = {normalize_id(r["id"]): r for r in self.query_seed(seed_rgs)}
+        frontier = list(found.values())
+        for _ in range(2):
+            refs = extract_arm_ids(
+                [(r.get("properties") or {}).get(p) for r in frontier for p in HOP_PROPERTIES]
+            )
+            top = {"/".join(ref.split("/")[:9]) for ref in refs}
+            frontier = [self.by_id[i] for i in sorted(top) if i in self.by_id]
+            for r in frontier:
+                found.setdefault(normalize_id(r["id"]), r)
+        return list(found.values())
+
+    def query_by_ids(self, ids: List[str]) -> List[dict]:
+        return [self.by_id[i] for i in (normalize_id(i) for i in ids) if i in self.by_id]
+
+    def query_rbac_all(self) -> List[dict]:
+        return [ra for ra in self.rbac if not _in_groups(ra, None)]
+
+    def query_subscription_ancestry(self) -> Dict[str, List[str]]:
+        return {r["subscriptionId"].lower(): [MANAGEMENT_GROUP] for r in self.by_id.values()}
+
+    def query_rbac_management_groups(self, groups: List[str]) -> List[dict]:
+        return [ra for ra in self.rbac if _in_groups(ra, groups)]
+
+
+def _in_groups(ra: dict, groups) -> bool:
+    """Whether `ra` is scoped to one of `groups` (any management group if None)."""
+    scope = normalize_id(ra["properties"]["scope"])
+    if not scope.startswith(MG_SCOPE_PREFIX):
+        return False
+    return groups is None or scope[len(MG_SCOPE_PREFIX):] in groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resources", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="Directory for the JSON files")
+    args = parser.parse_args()
+
+    resources, rbac, seed_rgs = generate(args.resources, args.seed)
+    os.makedirs(args.output, exist_ok=True)
+    arg = SyntheticARG(resources)
+    for name, data in (
+        ("seed.json", arg.query_seed(seed_rgs)),
+        ("inventory.json", resources),
+        ("rbac.json", rbac),
+    ):
+        with open(os.path.join(args.output, name), "w", encoding="utf-8") as fh:
+            dump_json(data, fh)
+    print(
+        f"{len(resources)} resources, {len(rbac)} role assignments, "
+        f"{len(seed_rgs)} seed resource groups -> {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Size-bounded on-disk caches for Resource Graph results and rendered diagrams."""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+
+def content_key(*parts) -> str:
+    """Return a sha256 hex digest over the JSON encoding of `parts`."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    Content-addressed blob store under `directory` with LRU eviction by total size.
+
+    Entries are files named by key; a hit refreshes the file's mtime so eviction
+    removes the least recently used entries first once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = ""):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _entries(self):
+        """Yield (mtime, path, size) for every cache entry."""
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix) or name.startswith("."):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield st.st_mtime, path, st.st_size
+
+    def path_for(self, key: str) -> Optional[str]:
+        """Return the entry's file path and mark it recently used, or None on a miss."""
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self.path_for(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        with self._lock:
+            try:
+                old_size = os.path.getsize(path)
+            except FileNotFoundError:
+                old_size = 0
+            os.replace(tmp, path)
+            self._size += len(data) - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self._size -= size
+
+
+class QueryCache:
+    """
+    Resource Graph result cache keyed by (normalized KQL, subscription chunk).
+
+    Each entry holds every row of one chunk, from all of its pages, so a result is
+    either served whole or re-queried whole; skip tokens are never replayed. Entries
+    older than `ttl` seconds are treated as misses. With `refresh=True` every lookup
+    misses but fetched results are still written back. `oldest` is the creation time
+    of the oldest entry served so far, or None.
+    """
+
+    def __init__(self, directory: str, ttl: int, max_bytes: int, refresh: bool = False):
+        self.store = DiskCache(directory, max_bytes, suffix=".json")
+        self.ttl = ttl
+        self.refresh = refresh
+        self.oldest = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(kql: str, subs: List[str]) -> str:
+        return content_key(" ".join(kql.split()), sorted(subs))
+
+    def get(self, kql: str, subs: List[str]) -> Optional[List[dict]]:
+        """All rows of the chunk if a fresh entry exists, otherwise None."""
+        if self.refresh:
+            return None
+        raw = self.store.get(self.key(kql, subs))
+        if raw is None:
+            return None
+        try:
+            entry = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+        created = entry.get("created", 0)
+        if time.time() - created > self.ttl:
+            return None
+        with self._lock:
+            if self.oldest is None or created < self.oldest:
+                self.oldest = created
+        return entry.get("rows")
+
+    def put(self, kql: str, subs: List[str], rows: List[dict]):
+        entry = {"created": time.time(), "rows": rows}
+        self.store.put(self.key(kql, subs), json.dumps(entry).encode("utf-8"))
+
+
+class RenderCache:
+    """
+    Rendered SVG cache keyed by the .puml source, the files it includes and the
+    PlantUML jar. `hits` counts lookups served from the cache.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.store = DiskCache(directory, max_bytes, suffix=".svg")
+        self.hits = 0
+        self._dir_digests = {}
+        self._lock = threading.Lock()
+
+    def _dir_digest(self, directory: str) -> str:
+        """Digest of every file directly under `directory`, memoized per cache."""
+        with self._lock:
+            cached = self._dir_digests.get(directory)
+        if cached is not None:
+            return cached
+        h = hashlib.sha256()
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if os.path.isfile(path):
+                h.update(name.encode("utf-8") + b"\0")
+                with open(path, "rb") as fh:
+                    h.update(hashlib.sha256(fh.read()).digest())
+        digest = h.hexdigest()
+        with self._lock:
+            self._dir_digests[directory] = digest
+        return digest
+
+    def include_dirs(self, source: str, base_dir: str) -> List[str]:
+        """
+        Directories of the files pulled in by `!include`, after `!define` substitution.
+        Relative paths resolve against the working directory, then `base_dir`.
+        """
+        defines = {}
+        dirs = set()
+        for line in source.splitlines():
+            parts = line.strip().split(None, 2)
+            if len(parts) == 3 and parts[0] == "!define":
+                defines[parts[1]] = parts[2]
+            elif len(parts) >= 2 and parts[0] == "!include":
+                target = parts[1]
+                head, sep, rest = target.partition("/")
+                if head in defines:
+                    target = defines[head] + sep + rest
+                for candidate in (target, os.path.join(base_dir, target)):
+                    if os.path.isfile(candidate):
+                        dirs.add(os.path.dirname(os.path.abspath(candidate)))
+                        break
+        return sorted(dirs)
+
+    def key(self, puml_path: str, jar_stamp) -> str:
+        with open(puml_path, "rb") as fh:
+            source = fh.read()
+        text = source.decode("utf-8", "replace")
+        includes = [
+            [d, self._dir_digest(d)]
+            for d in self.include_dirs(text, os.path.dirname(os.path.abspath(puml_path)))
+        ]
+        return content_key(hashlib.sha256(source).hexdigest(), includes, jar_stamp)
+
+    def fetch(self, key: str, svg_path: str) -> bool:
+        """Copy a cached SVG to `svg_path`; return False on a miss."""
+        data = self.store.get(key)
+        if data is None:
+            return False
+        with open(svg_path, "wb") as fh:
+            fh.write(data)
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def put(self, key: str, svg_path: str):
+        with open(svg_path, "rb") as fh:
+            self.store.put(key, fh.read())
@@ -3,6 +3,8 @@ import json
 from dataclasses import dataclass, field
 from typing import List
 
+from tools.azdisc.summarize import DEFAULT_LEAF_TYPES
+
 
 @dataclass
 class AppConfig:
@@ -11,6 +13,26 @@ class AppConfig:
     seedResourceGroups: List[str]
     outputDir: str
     includeRbac: bool = False
+    multiHopSeed: bool = False
+    projectProperties: bool = False
+    queryWorkers: int = 1
+    graphWorkers: int = 1
+    backend: str = "cli"
+    cacheDir: str = ""
+    cacheTtl: int = 3600
+    cacheMaxBytes: int = 512 * 1024 * 1024
+    snapshotStore: str = ""
+    inventoryFormat: str = "json"
+    diagramPartition: str = "none"
+    renderBackend: str = "daemon"
+    renderWorkers: int = 1
+    renderHeap: str = ""
+    renderTimeout: int = 600
+    renderCacheDir: str = ""
+    renderCacheMaxBytes: int = 256 * 1024 * 1024
+    summarize: bool = False
+    summaryLeafTypes: List[str] = field(default_factory=lambda: list(DEFAULT_LEAF_TYPES))
+    summaryCollapseMin: int = 3
 
 
 def load_config(path: str) -> AppConfig:
@@ -23,10 +45,79 @@ def load_config(path: str) -> AppConfig:
         if key not in data:
             raise ValueError(f"Missing required config field: {key}")
 
+    for key in ("queryWorkers", "graphWorkers", "renderWorkers"):
+        value = data.get(key, 1)
+        if not isinstance(value, int) or value < 1:
+            raise ValueError(f"{key} must be a positive integer, got: {value!r}")
+
+    for key, default in (
+        ("cacheTtl", 3600),
+        ("cacheMaxBytes", 512 * 1024 * 1024),
+        ("renderCacheMaxBytes", 256 * 1024 * 1024),
+    ):
+        value = data.get(key, default)
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"{key} must be a non-negative integer, got: {value!r}")
+
+    backend = data.get("backend", "cli")
+    if backend not in ("cli", "rest"):
+        raise ValueError(f"backend must be 'cli' or 'rest', got: {backend!r}")
+
+    inventory_format = data.get("inventoryFormat", "json")
+    if inventory_format not in ("json", "ndjson"):
+        raise ValueError(
+            f"inventoryFormat must be 'json' or 'ndjson', got: {inventory_format!r}"
+        )
+
+    partition = data.get("diagramPartition", "none")
+    if partition not in ("none", "resourceGroup", "subscription", "vnet"):
+        raise ValueError(
+            "diagramPartition must be 'none', 'resourceGroup', 'subscription' or 'vnet', "
+            f"got: {partition!r}"
+        )
+
+    render_backend = data.get("renderBackend", "daemon")
+    if render_backend not in ("daemon", "oneshot"):
+        raise ValueError(
+            f"renderBackend must be 'daemon' or 'oneshot', got: {render_backend!r}"
+        )
+
+    render_timeout = data.get("renderTimeout", 600)
+    if not isinstance(render_timeout, (int, float)) or render_timeout <= 0:
+        raise ValueError(f"renderTimeout must be a positive number, got: {render_timeout!r}")
+
+    collapse_min = data.get("summaryCollapseMin", 3)
+    if not isinstance(collapse_min, int) or collapse_min < 0:
+        raise ValueError(
+            f"summaryCollapseMin must be a non-negative integer, got: {collapse_min!r}"
+        )
+
     return AppConfig(
         app=data["app"],
         subscriptions=data["subscriptions"],
         seedResourceGroups=data["seedResourceGroups"],
         outputDir=data["outputDir"],
         includeRbac=data.get("includeRbac", False),
+        multiHopSeed=data.get("multiHopSeed", False),
+        projectProperties=data.get("projectProperties", False),
+        queryWorkers=data.get("queryWorkers", 1),
+        graphWorkers=data.get("graphWorkers", 1),
+        backend=backend,
+        cacheDir=data.get("cacheDir", ""),
+        cacheTtl=data.get("cacheTtl", 3600),
+        cacheMaxBytes=data.get("cacheMaxBytes", 512 * 1024 * 1024),
+        snapshotStore=data.get("snapshotStore", ""),
+        inventoryFormat=inventory_format,
+        diagramPartition=partition,
+        renderBackend=render_backend,
+        renderWorkers=data.get("renderWorkers", 1),
+        renderHeap=data.get("renderHeap", ""),
+        renderTimeout=render_timeout,
+        renderCacheDir=data.get("renderCacheDir", ""),
+        renderCacheMaxBytes=data.get("renderCacheMaxBytes", 256 * 1024 * 1024),
+        summarize=data.get("summarize", False),
+        summaryLeafTypes=[
+            t.lower() for t in data.get("summaryLeafTypes", DEFAULT_LEAF_TYPES)
+        ],
+        summaryCollapseMin=collapse_min,
     )
@@ -0,0 +1,121 @@
+"""Patch an existing inventory from ARG change history instead of a full sweep."""
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set, Tuple
+
+from tools.azdisc.arg import AzureResourceGraph
+from tools.azdisc.config import AppConfig
+from tools.azdisc.expand import follow_references, index_references
+from tools.azdisc.util import normalize_id
+
+# ARG keeps 14 days of resource change history; stay clear of the edge.
+MAX_SNAPSHOT_AGE = timedelta(days=13)
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def utc_timestamp(now: Optional[datetime] = None) -> str:
+    """Return `now` (default: current time) as an ISO 8601 UTC string."""
+    return (now or datetime.now(timezone.utc)).strftime(TIMESTAMP_FORMAT)
+
+
+def snapshot_usable(timestamp: Optional[str], now: Optional[datetime] = None) -> bool:
+    """True if a snapshot taken at `timestamp` is recent enough for change history."""
+    if not timestamp:
+        return False
+    try:
+        taken = datetime.strptime(timestamp, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return False
+    return (now or datetime.now(timezone.utc)) - taken < MAX_SNAPSHOT_AGE
+
+
+def in_seed(resource: dict, config: AppConfig) -> bool:
+    """True if the resource lives in one of the config's seed resource groups."""
+    rgs = {rg.lower() for rg in config.seedResourceGroups}
+    return (resource.get("resourceGroup") or "").lower() in rgs
+
+
+def apply_changes(
+    config: AppConfig,
+    arg: AzureResourceGraph,
+    inventory: List[dict],
+    unresolved: List[str],
+    since: str,
+) -> Tuple[List[dict], List[str], int]:
+    """
+    Bring `inventory`/`unresolved` up to date with changes recorded after `since`.
+
+    Created and updated resources are re-fetched and replaced in place (new ones are
+    appended), deleted ones are dropped, and references from fetched resources are
+    followed as in expand(). Resources no longer reachable from the seed resource groups
+    are pruned so the result matches what a full sweep would collect.
+
+    Returns (inventory, unresolved, number_of_changed_ids).
+    """
+    known = {normalize_id(r["id"]) for r in inventory}
+    watched = sorted(known | set(unresolved))
+    changes = arg.query_changes(since, config.seedResourceGroups, watched)
+
+    # Last change per resource wins
+    latest = {}
+    for row in sorted(changes, key=lambda c: str(c.get("changeTime", ""))):
+        rid = normalize_id(row.get("targetResourceId") or "")
+        if rid:
+            latest[rid] = row.get("changeType", "")
+    if not latest:
+        return inventory, unresolved, 0
+
+    deleted = {rid for rid, kind in latest.items() if kind.lower() == "delete"}
+    changed = sorted(set(latest) - deleted)
+    fetched = arg.query_by_ids(changed) if changed else []
+    fetched_by_id = {normalize_id(r["id"]): r for r in fetched}
+    gone = deleted | (set(changed) - set(fetched_by_id))
+
+    patched = []
+    for resource in inventory:
+        rid = normalize_id(resource["id"])
+        if rid in gone:
+            continue
+        patched.append(fetched_by_id.pop(rid, resource))
+    new = [r for r in fetched if normalize_id(r["id"]) in fetched_by_id]
+    patched.extend(new)
+
+    collected_ids = {normalize_id(r["id"]) for r in patched}
+    # Unresolved IDs that were created since are part of `fetched`; the rest, and
+    # anything deleted, cannot resolve now and must not be queried again.
+    known_missing = (set(unresolved) | gone) - collected_ids
+    ref_index = {}
+    follow_references(
+        patched,
+        list(fetched),
+        arg.query_by_ids,
+        collected_ids,
+        known_missing,
+        ref_index,
+    )
+
+    return _prune(config, patched, ref_index) + (len(latest),)
+
+
+def _prune(config: AppConfig, inventory: List[dict], ref_index) -> Tuple[List[dict], List[str]]:
+    """Keep resources reachable from the seed; unresolved = reachable references not held."""
+    by_id = {normalize_id(r["id"]): r for r in inventory}
+    missing_refs = [r for r in inventory if normalize_id(r["id"]) not in ref_index]
+    index_references(missing_refs, ref_index)
+
+    reachable: Set[str] = set()
+    stack = [normalize_id(r["id"]) for r in inventory if in_seed(r, config)]
+    unresolved = set()
+    while stack:
+        rid = stack.pop()
+        if rid in reachable:
+            continue
+        reachable.add(rid)
+        for ref in ref_index.get(rid, ()):
+            if ref in by_id:
+                if ref not in reachable:
+                    stack.append(ref)
+            else:
+                unresolved.add(ref)
+
+    kept = [r for r in inventory if normalize_id(r["id"]) in reachable]
+    return kept, sorted(unresolved)
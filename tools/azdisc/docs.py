@@ -4,22 +4,31 @@ from collections import Counter
 from typing import List
 
 
-def write_catalog(inventory_data: dict, output_dir: str):
-    """Write catalog.md with resource counts by type, region, RG, and subscription."""
-    resources = inventory_data if isinstance(inventory_data, list) else inventory_data.get("resources", [])
+def write_catalog(inventory_data, output_dir: str):
+    """
+    Write catalog.md with resource counts by type, region, RG, and subscription.
+
+    `inventory_data` is a list or any iterable of resources (consumed once), or a dict
+    with a "resources" list.
+    """
+    if isinstance(inventory_data, dict):
+        resources = inventory_data.get("resources", [])
+    else:
+        resources = inventory_data
 
     by_type = Counter()
     by_region = Counter()
     by_rg = Counter()
     by_sub = Counter()
 
+    total = 0
     for r in resources:
+        total += 1
         by_type[r.get("type", "(unknown)")] += 1
         by_region[r.get("location", "(unknown)")] += 1
         by_rg[r.get("resourceGroup", "(unknown)")] += 1
         by_sub[r.get("subscriptionId", "(unknown)")] += 1
 
-    total = len(resources)
     lines = ["# Resource Catalog", ""]
 
     def _table(counter, label):
@@ -1,6 +1,8 @@
 """Emit PlantUML diagram from graph model."""
+import hashlib
 import os
-from collections import defaultdict
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List
 
 from tools.azdisc.util import slug
 
@@ -44,11 +46,43 @@ def _type_short(node_type: str) -> str:
     return node_type.split("/")[-1]
 
 
-def emit(graph: dict, output_path: str):
-    """Write a PlantUML .puml file from a graph dict."""
-    nodes = graph.get("nodes", [])
-    edges = graph.get("edges", [])
+def _safe(text: str) -> str:
+    return text.replace('"', "'")
+
 
+def build_aliases(node_ids: Iterable[str]) -> Dict[str, str]:
+    """
+    Map each node id to a unique PlantUML alias, computed once per node. The alias is
+    the slug of the id's last two segments (type and name); ids sharing that slug get
+    a short hash of the full id appended.
+    """
+    base = {}
+    for nid in node_ids:
+        alias = slug("/".join(nid.split("/")[-2:]))
+        if not alias or alias[0].isdigit():
+            alias = "n_" + alias
+        base[nid] = alias
+    counts = Counter(base.values())
+    taken = {alias for alias, n in counts.items() if n == 1}
+    aliases = {}
+    for nid in sorted(base):
+        alias = base[nid]
+        if counts[alias] > 1:
+            digest = hashlib.sha1(nid.encode("utf-8")).hexdigest()
+            size = 8
+            while True:
+                candidate = f"{alias[:51]}_{digest[:size]}"
+                if candidate not in taken:
+                    break
+                size += 1
+            alias = candidate
+            taken.add(alias)
+        aliases[nid] = alias
+    return aliases
+
+
+def _cluster_lines(nodes: Iterable[dict], aliases: Dict[str, str]) -> Iterator[str]:
+    """Render nodes as REGION > RG > TYPE package clusters."""
     # Group nodes by (location, resourceGroup, typeShort)
     groups = defaultdict(list)
     for node in nodes:
@@ -57,41 +91,275 @@ def emit(graph: dict, output_path: str):
         ts = _type_short(node.get("type", ""))
         groups[(location, rg, ts)].append(node)
 
-    lines = [HEADER]
-
-    # Render clusters
     for (location, rg, ts), group_nodes in sorted(groups.items()):
-        loc_safe = location.replace('"', "'")
-        rg_safe = rg.replace('"', "'")
-        ts_safe = ts.replace('"', "'")
-        lines.append(f'package "{loc_safe}" {{')
-        lines.append(f'  package "{rg_safe}" {{')
-        lines.append(f'    package "{ts_safe}" {{')
+        ts_safe = _safe(ts)
+        yield f'package "{_safe(location)}" {{'
+        yield f'  package "{_safe(rg)}" {{'
+        yield f'    package "{ts_safe}" {{'
         for node in group_nodes:
-            alias = slug(node["id"])
-            name = node.get("name") or node["id"].split("/")[-1]
-            name_safe = name.replace('"', "'")
-            ntype = node.get("type", "")
-            macro = TYPE_MAP.get(ntype)
+            alias = aliases[node["id"]]
+            name_safe = _safe(node.get("name") or node["id"].split("/")[-1])
+            if node.get("summary"):
+                # Set by summarize.summarize() on nodes that absorbed leaves or siblings
+                name_safe += "\\n" + _safe(node["summary"])
+            macro = TYPE_MAP.get(node.get("type", ""))
             if macro:
-                lines.append(f'      {macro}({alias}, "{name_safe}")')
+                yield f'      {macro}({alias}, "{name_safe}")'
             else:
-                lines.append(f'      rectangle "{name_safe}\\n({ts_safe})" as {alias}')
-        lines.append("    }")
-        lines.append("  }")
-        lines.append("}")
-        lines.append("")
+                yield f'      rectangle "{name_safe}\\n({ts_safe})" as {alias}'
+        yield "    }"
+        yield "  }"
+        yield "}"
+        yield ""
+
+
+def _write_lines(lines: Iterable[str], output_path: str):
+    """Stream newline-separated lines to `output_path` without building the document."""
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as fh:
+        write = fh.write
+        sep = ""
+        for line in lines:
+            write(sep)
+            write(line)
+            sep = "\n"
+
+
+def _emit_lines(nodes, edges, aliases) -> Iterator[str]:
+    yield HEADER
+    yield from _cluster_lines(nodes, aliases)
 
     # Render edges
-    lines.append("' ---- edges ----")
+    yield "' ---- edges ----"
     for edge in edges:
-        src_alias = slug(edge["src"])
-        dst_alias = slug(edge["dst"])
-        lines.append(f"{src_alias} --> {dst_alias}")
+        src, dst = aliases.get(edge["src"]), aliases.get(edge["dst"])
+        # Edges to ids that are not nodes (e.g. a blank reference) are not drawn
+        if src and dst:
+            yield f"{src} --> {dst}"
 
-    lines.append("")
-    lines.append(FOOTER)
+    yield ""
+    yield FOOTER
 
-    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as fh:
-        fh.write("\n".join(lines))
+
+def emit(graph: dict, output_path: str, aliases: Dict[str, str] = None):
+    """Write a PlantUML .puml file from a graph dict."""
+    nodes = graph.get("nodes", [])
+    edges = graph.get("edges", [])
+    if aliases is None:
+        aliases = build_aliases(n["id"] for n in nodes)
+    _write_lines(_emit_lines(nodes, edges, aliases), output_path)
+
+
+# ---------------------------------------------------------------------------
+# Partitioned emission
+# ---------------------------------------------------------------------------
+
+PARTITION_MODES = ("none", "resourceGroup", "subscription", "vnet")
+
+PARTITIONS_DIR = "diagrams"
+
+VNET_TYPE = "microsoft.network/virtualnetworks"
+
+UNATTACHED = "(unattached)"
+
+
+def _scope(node: dict):
+    """Return (subscriptionId, resourceGroup) of a node, falling back to its ARM id."""
+    sub = (node.get("subscriptionId") or "").lower()
+    rg = (node.get("resourceGroup") or "").lower()
+    parts = node["id"].split("/")
+    for i in range(1, len(parts) - 1):
+        if parts[i] == "subscriptions" and not sub:
+            sub = parts[i + 1]
+        elif parts[i] == "resourcegroups" and not rg:
+            rg = parts[i + 1]
+    return sub, rg
+
+
+def _vnet_components(nodes: List[dict], edges: List[dict]) -> Dict[str, str]:
+    """
+    Label every node with its VNet connectivity component: the connected component
+    (over non-RBAC edges, ignoring VNet-to-VNet peering) named after its VNets.
+    """
+    parent = {n["id"]: n["id"] for n in nodes}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    types = {n["id"]: n.get("type", "") for n in nodes}
+    for edge in edges:
+        src, dst = edge["src"], edge["dst"]
+        if edge.get("kind", "dependency") != "dependency":
+            continue
+        if src not in parent or dst not in parent:
+            continue
+        if types.get(src) == VNET_TYPE and types.get(dst) == VNET_TYPE:
+            continue
+        a, b = find(src), find(dst)
+        if a != b:
+            # Smaller root wins so the result does not depend on edge order
+            parent[max(a, b)] = min(a, b)
+
+    vnets = defaultdict(list)
+    for node in nodes:
+        if node.get("type") == VNET_TYPE:
+            vnets[find(node["id"])].append(node)
+
+    labels = {}
+    for root, members in vnets.items():
+        members.sort(key=lambda n: n["id"])
+        label = members[0].get("name") or members[0]["id"].split("/")[-1]
+        if len(members) > 1:
+            label += f" +{len(members) - 1}"
+        labels[root] = label
+    return {n["id"]: labels.get(find(n["id"]), UNATTACHED) for n in nodes}
+
+
+def partition_nodes(graph: dict, mode: str) -> Dict[str, str]:
+    """Map every node id to its partition label for `mode`."""
+    nodes = graph.get("nodes", [])
+    if mode == "vnet":
+        return _vnet_components(nodes, graph.get("edges", []))
+    result = {}
+    for node in nodes:
+        sub, rg = _scope(node)
+        if mode == "subscription":
+            result[node["id"]] = sub or "external"
+        elif mode == "resourceGroup":
+            result[node["id"]] = f"{rg} ({sub[:8]})" if rg else "external"
+        else:
+            raise ValueError(f"unknown partition mode: {mode!r}")
+    return result
+
+
+def partition_file(label: str) -> str:
+    """Deterministic, collision-free file stem for a partition label."""
+    digest = hashlib.sha1(label.encode("utf-8")).hexdigest()[:8]
+    return f"{slug(label)[:48] or 'partition'}_{digest}"
+
+
+def _partition_lines(label, members, edges, node_by_id, part_of, aliases) -> Iterator[str]:
+    yield HEADER
+    yield f'title "{_safe(label)}"'
+    yield ""
+    yield from _cluster_lines(members, aliases)
+
+    # Endpoints in other partitions are drawn as stubs grouped by their partition
+    member_ids = {n["id"] for n in members}
+    stubs = defaultdict(set)
+    for edge in edges:
+        for end in (edge["src"], edge["dst"]):
+            if end not in member_ids:
+                stubs[part_of[end]].add(end)
+    for other in sorted(stubs):
+        yield f'package "-> {_safe(other)}" <<stub>> {{'
+        for nid in sorted(stubs[other]):
+            node = node_by_id[nid]
+            name_safe = _safe(node.get("name") or nid.split("/")[-1])
+            yield f'  rectangle "{name_safe}" as {aliases[nid]} #line.dashed'
+        yield "}"
+        yield ""
+
+    yield "' ---- edges ----"
+    for edge in edges:
+        cross = edge["src"] not in member_ids or edge["dst"] not in member_ids
+        arrow = "..>" if cross else "-->"
+        yield f"{aliases[edge['src']]} {arrow} {aliases[edge['dst']]}"
+
+    yield ""
+    yield FOOTER
+
+
+def _overview_lines(mode, members, crossing) -> Iterator[str]:
+    yield HEADER
+    yield f'title "{mode} overview"'
+    yield ""
+    for label in sorted(members):
+        alias = "p_" + partition_file(label)
+        count = len(members[label])
+        yield f'rectangle "{_safe(label)}\\n{count} resources" as {alias}'
+    yield ""
+    yield "' ---- edges ----"
+    for (src, dst), count in sorted(crossing.items()):
+        yield f"p_{partition_file(src)} --> p_{partition_file(dst)} : {count}"
+    yield ""
+    yield FOOTER
+
+
+def _prune_partitions(parts_dir: str, keep: List[str]):
+    """Drop diagrams left over from partitions that no longer exist."""
+    if not os.path.isdir(parts_dir):
+        return
+    keep = set(keep)
+    for name in sorted(os.listdir(parts_dir)):
+        path = os.path.join(parts_dir, name)
+        if name.endswith((".puml", ".svg")) and path not in keep:
+            if name.endswith(".svg") and path[:-4] + ".puml" in keep:
+                continue
+            os.remove(path)
+
+
+def list_diagrams(out_dir: str) -> List[str]:
+    """Return diagram.puml followed by any partition diagrams, in render order."""
+    paths = [os.path.join(out_dir, "diagram.puml")]
+    parts_dir = os.path.join(out_dir, PARTITIONS_DIR)
+    if os.path.isdir(parts_dir):
+        paths.extend(
+            os.path.join(parts_dir, name)
+            for name in sorted(os.listdir(parts_dir))
+            if name.endswith(".puml")
+        )
+    return paths
+
+
+def emit_diagrams(graph: dict, out_dir: str, mode: str = "none") -> List[str]:
+    """
+    Write <out_dir>/diagram.puml, or with a partition `mode` an overview diagram there
+    plus one diagram per partition under <out_dir>/diagrams/. Edges that cross
+    partitions appear in both partitions' diagrams against a stub of the remote node,
+    and as a counted edge in the overview.
+
+    Returns the paths written, diagram.puml first.
+    """
+    parts_dir = os.path.join(out_dir, PARTITIONS_DIR)
+    written = [os.path.join(out_dir, "diagram.puml")]
+    if mode == "none":
+        emit(graph, written[0])
+        _prune_partitions(parts_dir, written)
+        return written
+
+    nodes = graph.get("nodes", [])
+    node_by_id = {n["id"]: n for n in nodes}
+    # As in emit(), edges to ids that are not nodes are not drawn
+    edges = [
+        e for e in graph.get("edges", []) if e["src"] in node_by_id and e["dst"] in node_by_id
+    ]
+    aliases = build_aliases(n["id"] for n in nodes)
+    part_of = partition_nodes(graph, mode)
+
+    members = defaultdict(list)
+    for node in nodes:
+        members[part_of[node["id"]]].append(node)
+    part_edges = defaultdict(list)
+    crossing = defaultdict(int)
+    for edge in edges:
+        src, dst = part_of[edge["src"]], part_of[edge["dst"]]
+        part_edges[src].append(edge)
+        if dst != src:
+            part_edges[dst].append(edge)
+            crossing[(src, dst)] += 1
+
+    for label in sorted(members):
+        path = os.path.join(parts_dir, partition_file(label) + ".puml")
+        lines = _partition_lines(
+            label, members[label], part_edges[label], node_by_id, part_of, aliases
+        )
+        _write_lines(lines, path)
+        written.append(path)
+    _prune_partitions(parts_dir, written)
+
+    _write_lines(_overview_lines(mode, members, crossing), written[0])
+    return written
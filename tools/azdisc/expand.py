@@ -1,36 +1,64 @@
 """Expand resource inventory by following ARM ID references."""
-from typing import List, Tuple
+from typing import Callable, Dict, List, Optional, Set, Tuple
 
+from tools.azdisc import metrics
 from tools.azdisc.config import AppConfig
 from tools.azdisc.arg import AzureResourceGraph
-from tools.azdisc.util import extract_arm_ids, normalize_id, chunk
+from tools.azdisc.util import chunk, normalize_id, resource_arm_ids
 
 MAX_ITERATIONS = 50
 
 
-def expand(config: AppConfig, arg: AzureResourceGraph) -> Tuple[List[dict], List[str]]:
+def index_references(
+    resources: List[dict], ref_index: Dict[str, Set[str]], counter=None
+) -> Set[str]:
     """
-    Starting from seed resource groups, expand inventory by following ARM ID references.
+    Record the ARM IDs referenced by each resource in `ref_index` (resource id -> ids).
 
-    Returns (inventory, unresolved) where unresolved is a list of ARM IDs that were
-    referenced but could not be fetched.
+    Returns the union of IDs referenced by `resources`. `counter` is passed through to
+    resource_arm_ids to count visited property nodes.
     """
-    # Seed query
-    inventory = arg.query_seed(config.seedResourceGroups)
-    collected_ids = {normalize_id(r["id"]) for r in inventory}
-    unresolved = set()
+    referenced = set()
+    for resource in resources:
+        refs = resource_arm_ids(resource, counter)
+        rid = normalize_id(resource["id"])
+        if rid in ref_index:
+            ref_index[rid] |= refs
+        else:
+            ref_index[rid] = refs
+        referenced |= refs
+    return referenced
+
 
+def follow_references(
+    inventory: List[dict],
+    frontier: List[dict],
+    fetch: Callable[[List[str]], List[dict]],
+    collected_ids: Set[str],
+    unresolved: Set[str],
+    ref_index: Dict[str, Set[str]],
+    nodes_visited: Optional[List[int]] = None,
+):
+    """
+    Fetch everything transitively referenced from `frontier` that is not yet collected.
+
+    `inventory`, `collected_ids`, `unresolved` and `ref_index` are updated in place. Only
+    resources fetched in the previous round are scanned for references.
+    """
     for _ in range(MAX_ITERATIONS):
-        # Extract all ARM IDs referenced in current inventory
-        all_referenced = set()
-        for resource in inventory:
-            all_referenced |= extract_arm_ids(resource)
+        # Extract ARM IDs referenced by resources fetched in the previous round
+        counter = [0]
+        referenced = index_references(frontier, ref_index, counter)
+        if nodes_visited is not None:
+            nodes_visited.append(counter[0])
 
-        missing = all_referenced - collected_ids - unresolved
+        missing = referenced - collected_ids - unresolved
         if not missing:
             break
+        metrics.incr("expand_iterations")
+        metrics.observe("frontier_sizes", len(missing))
 
-        fetched = arg.query_by_ids(list(missing))
+        fetched = fetch(sorted(missing))
         fetched_ids = {normalize_id(r["id"]) for r in fetched}
 
         # IDs that couldn't be resolved
@@ -38,7 +66,58 @@ def expand(config: AppConfig, arg: AzureResourceGraph) -> Tuple[List[dict], List
 
         inventory.extend(fetched)
         collected_ids |= fetched_ids
+        frontier = fetched
+
+
+def query_seed(config: AppConfig, arg: AzureResourceGraph) -> List[dict]:
+    """Run the seed query, resolving well-known neighbours too if multiHopSeed is set."""
+    if config.multiHopSeed:
+        return arg.query_seed_multihop(config.seedResourceGroups)
+    return arg.query_seed(config.seedResourceGroups)
+
+
+def expand(
+    config: AppConfig,
+    arg: AzureResourceGraph,
+    seed: Optional[List[dict]] = None,
+    ref_index: Optional[Dict[str, Set[str]]] = None,
+    stats: Optional[dict] = None,
+) -> Tuple[List[dict], List[str]]:
+    """
+    Starting from seed resource groups, expand inventory by following ARM ID references.
+
+    If `seed` is given (e.g. loaded from seed.json) it is used instead of re-running the
+    seed query (see query_seed()). Resources are scanned for references once, when first
+    fetched, and the results are kept in `ref_index` (resource id -> referenced ids). If
+    `stats` is given, `stats["nodes_visited"]` receives the number of property nodes
+    walked per iteration.
+
+    Returns (inventory, unresolved) where unresolved is a list of ARM IDs that were
+    referenced but could not be fetched.
+    """
+    if ref_index is None:
+        ref_index = {}
+    nodes_visited = []
+    if stats is not None:
+        stats["nodes_visited"] = nodes_visited
+
+    # Seed query
+    if seed is None:
+        inventory = query_seed(config, arg)
+    else:
+        inventory = list(seed)
+    collected_ids = {normalize_id(r["id"]) for r in inventory}
+    unresolved = set()
 
+    follow_references(
+        inventory,
+        list(inventory),
+        arg.query_by_ids,
+        collected_ids,
+        unresolved,
+        ref_index,
+        nodes_visited,
+    )
     return inventory, sorted(unresolved)
 
 
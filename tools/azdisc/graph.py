@@ -1,7 +1,13 @@
 """Build a graph model from an Azure resource inventory."""
-from typing import List
+import json
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, List
 
-from tools.azdisc.util import normalize_id, slug, parent_id
+from tools.azdisc.util import normalize_id, parent_id
 
 
 def _safe_get(obj, *keys):
@@ -30,128 +36,348 @@ def _iter_list(obj, *keys):
         yield from val
 
 
-def _make_node(resource, is_external=False):
-    return {
-        "id": normalize_id(resource["id"]),
-        "name": resource.get("name", ""),
-        "type": normalize_id(resource.get("type", "")),
-        "location": resource.get("location", ""),
-        "resourceGroup": resource.get("resourceGroup", ""),
-        "subscriptionId": resource.get("subscriptionId", ""),
-        "isExternal": is_external,
-    }
+def _strip_last_two(arm_id):
+    """'.../networkInterfaces/nic/ipConfigurations/cfg' -> '.../networkInterfaces/nic'."""
+    parts = arm_id.rstrip("/").split("/")
+    if len(parts) >= 3:
+        return "/".join(parts[:-2])
+    return None
 
 
-def build_graph(inventory: List[dict], rbac: List[dict]) -> dict:
-    """Build graph {nodes, edges} from resource inventory and RBAC list."""
-    node_map = {}  # normalized id -> node dict
-    edges = []  # list of (src, dst, kind)
+def _subnet_parent(arm_id):
+    return parent_id(arm_id, "subnets")
 
-    # Index all inventory resources
-    for resource in inventory:
-        nid = normalize_id(resource["id"])
-        node_map[nid] = _make_node(resource)
 
-    def ensure_external(arm_id):
-        """Add a placeholder external node if the id is not already in node_map."""
+TRANSFORMS = {
+    "strip_last_two": _strip_last_two,
+    "parent_of_subnet": _subnet_parent,
+}
+
+# Resource type -> edge rules (path, edge kind, ID transform name or None).
+# A path is a dotted walk through `properties`; a "[]" suffix iterates a list and "$id"
+# stands for the resource's own ID. Every non-empty string found becomes an edge target.
+EDGE_RULES = {
+    "microsoft.compute/virtualmachines": [
+        ("networkProfile.networkInterfaces[].id", "dependency", None),
+        ("storageProfile.osDisk.managedDisk.id", "dependency", None),
+        ("storageProfile.dataDisks[].managedDisk.id", "dependency", None),
+    ],
+    "microsoft.network/networkinterfaces": [
+        ("ipConfigurations[].properties.subnet.id", "dependency", None),
+        ("networkSecurityGroup.id", "dependency", None),
+    ],
+    "microsoft.network/virtualnetworks/subnets": [
+        ("$id", "dependency", "parent_of_subnet"),
+        ("networkSecurityGroup.id", "dependency", None),
+        ("routeTable.id", "dependency", None),
+    ],
+    "microsoft.network/virtualnetworks": [
+        ("virtualNetworkPeerings[].properties.remoteVirtualNetwork.id", "dependency", None),
+    ],
+    "microsoft.network/privateendpoints": [
+        ("subnet.id", "dependency", None),
+        ("privateLinkServiceConnections[].properties.privateLinkServiceId", "dependency", None),
+    ],
+    "microsoft.network/publicipaddresses": [
+        ("ipConfiguration.id", "dependency", "strip_last_two"),
+    ],
+    "microsoft.network/loadbalancers": [
+        (
+            "backendAddressPools[].properties.backendIPConfigurations[].id",
+            "dependency",
+            "strip_last_two",
+        ),
+    ],
+    "microsoft.network/applicationgateways": [
+        ("gatewayIPConfigurations[].properties.subnet.id", "dependency", None),
+        ("frontendIPConfigurations[].properties.subnet.id", "dependency", None),
+        ("frontendIPConfigurations[].properties.publicIPAddress.id", "dependency", None),
+        (
+            "backendAddressPools[].properties.backendIPConfigurations[].id",
+            "dependency",
+            "strip_last_two",
+        ),
+        ("firewallPolicy.id", "dependency", None),
+    ],
+    "microsoft.containerservice/managedclusters": [
+        ("agentPoolProfiles[].vnetSubnetID", "dependency", None),
+        ("agentPoolProfiles[].podSubnetID", "dependency", None),
+        ("networkProfile.loadBalancerProfile.effectiveOutboundIPs[].id", "dependency", None),
+        ("identityProfile.kubeletidentity.resourceId", "dependency", None),
+    ],
+    "microsoft.web/sites": [
+        ("serverFarmId", "dependency", None),
+        ("virtualNetworkSubnetId", "dependency", None),
+    ],
+}
+
+
+def _compile_path(path):
+    """Compile a rule path into f(rid, props, out) that appends every match to `out`."""
+    if path == "$id":
+        return lambda rid, props, out: out.append(rid)
+
+    def leaf(cur, out):
+        if cur and isinstance(cur, str):
+            out.append(cur)
+
+    step = leaf
+    for part in reversed(path.split(".")):
+        if part.endswith("[]"):
+            step = _compile_step(part[:-2], True, step)
+        else:
+            step = _compile_step(part, False, step)
+    first = step
+    return lambda rid, props, out: first(props, out)
+
+
+def _compile_step(key, many, nxt):
+    if many:
+        def step(cur, out):
+            if isinstance(cur, dict):
+                val = cur.get(key)
+                if isinstance(val, list):
+                    for item in val:
+                        nxt(item, out)
+    else:
+        def step(cur, out):
+            if isinstance(cur, dict):
+                nxt(cur.get(key), out)
+    return step
+
+
+def compile_rules(rules):
+    """Compile an EDGE_RULES-style table into type -> [(extract, kind, transform)]."""
+    compiled = {}
+    for rtype, type_rules in rules.items():
+        compiled[rtype] = [
+            (_compile_path(path), kind, TRANSFORMS[transform] if transform else None)
+            for path, kind, transform in type_rules
+        ]
+    return compiled
+
+
+_COMPILED_RULES = compile_rules(EDGE_RULES)
+
+
+class Node:
+    """Node attributes; the ID lives in CompactGraph.ids. Repeated strings are interned."""
+
+    __slots__ = ("name", "type", "location", "resourceGroup", "subscriptionId", "isExternal")
+
+    def __init__(self, name, type, location, resourceGroup, subscriptionId, isExternal):
+        self.name = name
+        self.type = sys.intern(type)
+        self.location = sys.intern(location)
+        self.resourceGroup = sys.intern(resourceGroup)
+        self.subscriptionId = sys.intern(subscriptionId)
+        self.isExternal = isExternal
+
+    @classmethod
+    def from_resource(cls, resource, is_external=False):
+        return cls(
+            resource.get("name", ""),
+            normalize_id(resource.get("type", "")),
+            resource.get("location", ""),
+            resource.get("resourceGroup", ""),
+            resource.get("subscriptionId", ""),
+            is_external,
+        )
+
+    @classmethod
+    def placeholder(cls, nid):
+        return cls(nid.split("/")[-1], "", "", "", "", True)
+
+    def to_dict(self, nid):
+        return {
+            "id": nid,
+            "name": self.name,
+            "type": self.type,
+            "location": self.location,
+            "resourceGroup": self.resourceGroup,
+            "subscriptionId": self.subscriptionId,
+            "isExternal": self.isExternal,
+        }
+
+
+class CompactGraph:
+    """
+    Graph with interned IDs: each normalized ARM ID maps to an integer index, node
+    records are `Node` objects (None for IDs that only appear as edge endpoints), and
+    edges are three parallel arrays of source index, destination index and kind code.
+    Duplicate edges are kept until serialization.
+    """
+
+    def __init__(self):
+        self.ids = []  # index -> normalized id
+        self.index = {}  # normalized id -> index
+        self.nodes = []  # index -> Node or None
+        self.kinds = []  # kind code -> kind name
+        self._kind_codes = {}
+        self.src = array("I")
+        self.dst = array("I")
+        self.kind = array("B")
+        self._sorted = None
+
+    def intern(self, nid: str) -> int:
+        idx = self.index.get(nid)
+        if idx is None:
+            idx = len(self.ids)
+            self.index[nid] = idx
+            self.ids.append(nid)
+            self.nodes.append(None)
+        return idx
+
+    def kind_code(self, kind: str) -> int:
+        code = self._kind_codes.get(kind)
+        if code is None:
+            code = len(self.kinds)
+            self._kind_codes[kind] = code
+            self.kinds.append(kind)
+        return code
+
+    def has_node(self, nid: str) -> bool:
+        idx = self.index.get(nid)
+        return idx is not None and self.nodes[idx] is not None
+
+    def set_node(self, nid: str, node: Node) -> int:
+        idx = self.intern(nid)
+        self.nodes[idx] = node
+        return idx
+
+    def add_edge(self, src: int, dst: int, code: int):
+        self.src.append(src)
+        self.dst.append(dst)
+        self.kind.append(code)
+
+    def ensure_external(self, arm_id: str) -> str:
+        """Add a placeholder external node if the id has no node yet."""
         nid = normalize_id(arm_id)
-        if nid and nid not in node_map:
-            node_map[nid] = {
-                "id": nid,
-                "name": nid.split("/")[-1],
-                "type": "",
-                "location": "",
-                "resourceGroup": "",
-                "subscriptionId": "",
-                "isExternal": True,
-            }
+        if nid:
+            idx = self.intern(nid)
+            if self.nodes[idx] is None:
+                self.nodes[idx] = Node.placeholder(nid)
         return nid
 
-    def add_edge(src_id, dst_id, kind="dependency"):
+    def add_id_edge(self, src_id: str, dst_id: str, kind: str = "dependency"):
+        src_id, dst_id = normalize_id(src_id or ""), normalize_id(dst_id or "")
         if src_id and dst_id and src_id != dst_id:
-            edges.append((normalize_id(src_id), normalize_id(dst_id), kind))
+            self.add_edge(self.intern(src_id), self.intern(dst_id), self.kind_code(kind))
+
+    def _order(self):
+        """Return (node indices sorted by ID, rank of each index in that order)."""
+        if self._sorted is None or len(self._sorted[0]) != len(self.ids):
+            ids = self.ids
+            order = sorted(range(len(ids)), key=ids.__getitem__)
+            rank = array("I", [0]) * len(ids)
+            for r, idx in enumerate(order):
+                rank[idx] = r
+            self._sorted = (order, rank)
+        return self._sorted
 
+    def node_count(self) -> int:
+        return sum(1 for node in self.nodes if node is not None)
+
+    def iter_node_dicts(self):
+        """Yield node dicts sorted by ID."""
+        order, _ = self._order()
+        ids, nodes = self.ids, self.nodes
+        for idx in order:
+            if nodes[idx] is not None:
+                yield nodes[idx].to_dict(ids[idx])
+
+    def _edge_keys(self):
+        """Return (sorted distinct packed edge keys, node order, kind names by rank)."""
+        order, rank = self._order()
+        n = len(self.ids) or 1
+        kind_names = sorted(self.kinds)
+        k = len(kind_names) or 1
+        kind_rank = [kind_names.index(name) for name in self.kinds]
+        keys = sorted(
+            {
+                (rank[s] * n + rank[d]) * k + kind_rank[c]
+                for s, d, c in zip(self.src, self.dst, self.kind)
+            }
+        )
+        return keys, order, kind_names
+
+    def iter_edge_dicts(self):
+        """Yield distinct edge dicts sorted by (src, dst, kind)."""
+        keys, order, kind_names = self._edge_keys()
+        ids = self.ids
+        n = len(ids) or 1
+        k = len(kind_names) or 1
+        for key in keys:
+            pair, kr = divmod(key, k)
+            s, d = divmod(pair, n)
+            yield {"src": ids[order[s]], "dst": ids[order[d]], "kind": kind_names[kr]}
+
+    def to_dict(self) -> dict:
+        """Serialize to {"nodes", "edges"} sorted by ID, with duplicate edges removed."""
+        return {"nodes": list(self.iter_node_dicts()), "edges": list(self.iter_edge_dicts())}
+
+
+def _add_resources(graph: CompactGraph, inventory: Iterable[dict], real=None):
+    """
+    Add inventory nodes and their rule edges to `graph` in a single pass.
+
+    Inventory nodes always replace placeholder or embedded-subnet nodes created for the
+    same ID. If `real` is a set, the index of every inventory node is added to it.
+    """
+    rules = _COMPILED_RULES
+    intern = graph.intern
+    nodes = graph.nodes
+    src_col, dst_col, kind_col = graph.src, graph.dst, graph.kind
+    ensure_external = graph.ensure_external
+    add_edge = graph.add_id_edge
+
+    targets = []
     for resource in inventory:
         rid = normalize_id(resource["id"])
+        ri = graph.set_node(rid, Node.from_resource(resource))
+        if real is not None:
+            real.add(ri)
         rtype = normalize_id(resource.get("type", ""))
         props = resource.get("properties") or {}
 
-        # VM -> NIC
-        if rtype == "microsoft.compute/virtualmachines":
-            for nic_ref in _iter_list(props, "networkProfile", "networkInterfaces"):
-                nic_id = nic_ref.get("id") if isinstance(nic_ref, dict) else None
-                if nic_id:
-                    ensure_external(nic_id)
-                    add_edge(rid, nic_id)
-
-            # VM -> OS managed disk
-            os_disk_id = _safe_get(props, "storageProfile", "osDisk", "managedDisk", "id")
-            if os_disk_id:
-                ensure_external(os_disk_id)
-                add_edge(rid, os_disk_id)
-
-            # VM -> data managed disks
-            for data_disk in _iter_list(props, "storageProfile", "dataDisks"):
-                dd_id = _safe_get(data_disk, "managedDisk", "id")
-                if dd_id:
-                    ensure_external(dd_id)
-                    add_edge(rid, dd_id)
-
-        # NIC -> Subnet, NSG
-        elif rtype == "microsoft.network/networkinterfaces":
-            for ip_cfg in _iter_list(props, "ipConfigurations"):
-                subnet_id = _safe_get(ip_cfg, "properties", "subnet", "id")
-                if subnet_id:
-                    ensure_external(subnet_id)
-                    add_edge(rid, subnet_id)
-
-            nsg_id = _safe_get(props, "networkSecurityGroup", "id")
-            if nsg_id:
-                ensure_external(nsg_id)
-                add_edge(rid, nsg_id)
-
-        # Subnet -> VNet, NSG, UDR
-        elif rtype == "microsoft.network/virtualnetworks/subnets":
-            vnet_id = parent_id(rid, "subnets")
-            if vnet_id:
-                ensure_external(vnet_id)
-                add_edge(rid, vnet_id)
-
-            nsg_id = _safe_get(props, "networkSecurityGroup", "id")
-            if nsg_id:
-                ensure_external(nsg_id)
-                add_edge(rid, nsg_id)
-
-            udr_id = _safe_get(props, "routeTable", "id")
-            if udr_id:
-                ensure_external(udr_id)
-                add_edge(rid, udr_id)
-
-        # VNet -> peered VNets
-        elif rtype == "microsoft.network/virtualnetworks":
-            for peering in _iter_list(props, "virtualNetworkPeerings"):
-                peer_id = _safe_get(peering, "properties", "remoteVirtualNetwork", "id")
-                if peer_id:
-                    ensure_external(peer_id)
-                    add_edge(rid, peer_id)
-
-            # Also handle subnets embedded in VNet properties
+        for extract, kind, transform in rules.get(rtype, ()):
+            code = graph.kind_code(kind)
+            extract(rid, props, targets)
+            for target in targets:
+                if transform is not None:
+                    target = transform(target)
+                    if not target:
+                        continue
+                # Inlined ensure_external() + add_edge() for the hot path
+                nid = target.lower().strip()
+                if not nid:
+                    continue
+                ni = intern(nid)
+                if nodes[ni] is None:
+                    nodes[ni] = Node.placeholder(nid)
+                if rid != nid:
+                    src_col.append(ri)
+                    dst_col.append(ni)
+                    kind_col.append(code)
+            targets.clear()
+
+        # Subnets embedded in VNet properties become nodes of their own
+        if rtype == "microsoft.network/virtualnetworks":
             for subnet in _iter_list(props, "subnets"):
                 subnet_id = subnet.get("id") if isinstance(subnet, dict) else None
                 if not subnet_id:
                     continue
                 snid = normalize_id(subnet_id)
                 # Ensure subnet node exists with its properties
-                if snid not in node_map:
-                    node_map[snid] = {
-                        "id": snid,
-                        "name": subnet.get("name", snid.split("/")[-1]),
-                        "type": "microsoft.network/virtualnetworks/subnets",
-                        "location": resource.get("location", ""),
-                        "resourceGroup": resource.get("resourceGroup", ""),
-                        "subscriptionId": resource.get("subscriptionId", ""),
-                        "isExternal": False,
-                    }
+                if not graph.has_node(snid):
+                    graph.set_node(snid, Node(
+                        subnet.get("name", snid.split("/")[-1]),
+                        "microsoft.network/virtualnetworks/subnets",
+                        resource.get("location", ""),
+                        resource.get("resourceGroup", ""),
+                        resource.get("subscriptionId", ""),
+                        False,
+                    ))
                 sub_props = subnet.get("properties") or {}
                 # Subnet -> VNet
                 add_edge(snid, rid)
@@ -166,64 +392,116 @@ def build_graph(inventory: List[dict], rbac: List[dict]) -> dict:
                     ensure_external(sub_udr_id)
                     add_edge(snid, sub_udr_id)
 
-        # Private Endpoint -> subnet, target
-        elif rtype == "microsoft.network/privateendpoints":
-            pe_subnet_id = _safe_get(props, "subnet", "id")
-            if pe_subnet_id:
-                ensure_external(pe_subnet_id)
-                add_edge(rid, pe_subnet_id)
-
-            for conn in _iter_list(props, "privateLinkServiceConnections"):
-                target_id = _safe_get(conn, "properties", "privateLinkServiceId")
-                if target_id:
-                    ensure_external(target_id)
-                    add_edge(rid, target_id)
-
-        # Public IP -> attachment
-        elif rtype == "microsoft.network/publicipaddresses":
-            ip_cfg_id = _safe_get(props, "ipConfiguration", "id")
-            if ip_cfg_id:
-                # Strip last two path segments to get parent resource
-                parts = ip_cfg_id.rstrip("/").split("/")
-                if len(parts) >= 3:
-                    parent = "/".join(parts[:-2])
-                    ensure_external(parent)
-                    add_edge(rid, parent)
-
-        # Load Balancer -> NIC backends
-        elif rtype == "microsoft.network/loadbalancers":
-            for pool in _iter_list(props, "backendAddressPools"):
-                for ip_cfg_ref in _iter_list(
-                    pool.get("properties") or {}, "backendIPConfigurations"
-                ):
-                    ip_cfg_id = ip_cfg_ref.get("id") if isinstance(ip_cfg_ref, dict) else None
-                    if ip_cfg_id:
-                        # Strip last two segments -> NIC id
-                        parts = ip_cfg_id.rstrip("/").split("/")
-                        if len(parts) >= 3:
-                            nic_parent = "/".join(parts[:-2])
-                            ensure_external(nic_parent)
-                            add_edge(rid, nic_parent)
-
-    # RBAC edges
+
+def _add_rbac(graph: CompactGraph, rbac: List[dict]):
+    """
+    Add role assignment nodes and scope -> assignment edges; assignments that
+    rbac.match_assignments() marked inherited get kind "rbac_assignment_inherited".
+    """
+    ensure_external = graph.ensure_external
+    add_edge = graph.add_id_edge
+
     for ra in rbac:
         ra_id = normalize_id(ra["id"])
-        if ra_id not in node_map:
-            node_map[ra_id] = _make_node(ra)
+        if not graph.has_node(ra_id):
+            graph.set_node(ra_id, Node.from_resource(ra))
         scope = normalize_id(
             str(_safe_get(ra, "properties", "scope") or "")
         )
         if scope:
             ensure_external(scope)
-            add_edge(scope, ra_id, kind="rbac_assignment")
+            kind = "rbac_assignment_inherited" if ra.get("inherited") else "rbac_assignment"
+            add_edge(scope, ra_id, kind=kind)
+
+
+def build_compact_graph(inventory: Iterable[dict], rbac: List[dict]) -> CompactGraph:
+    """
+    Build a CompactGraph from resource inventory and RBAC list.
+
+    `inventory` is consumed in a single pass, so it may be a generator. Edges come from
+    EDGE_RULES, dispatched on resource type.
+    """
+    graph = CompactGraph()
+    _add_resources(graph, inventory)
+    _add_rbac(graph, rbac)
+    return graph
+
 
-    # Deduplicate edges
-    edge_set = set(edges)
+def _build_shard(records: list):
+    """
+    Process-pool worker: build a partial graph for one contiguous slice of the inventory.
 
-    nodes = sorted(node_map.values(), key=lambda n: n["id"])
-    sorted_edges = sorted(
-        [{"src": s, "dst": d, "kind": k} for s, d, k in edge_set],
-        key=lambda e: (e["src"], e["dst"], e["kind"]),
-    )
+    Records may be resource dicts or NDJSON lines (parsed here, off the main process).
+    Returns plain picklable parts for _merge_shard.
+    """
+    resources = [json.loads(r) if isinstance(r, str) else r for r in records]
+    graph = CompactGraph()
+    real = set()
+    _add_resources(graph, resources, real)
+    nodes = [
+        None if n is None
+        else (n.name, n.type, n.location, n.resourceGroup, n.subscriptionId, n.isExternal)
+        for n in graph.nodes
+    ]
+    return graph.ids, nodes, sorted(real), graph.kinds, graph.src, graph.dst, graph.kind
 
-    return {"nodes": nodes, "edges": sorted_edges}
+
+def _merge_shard(graph: CompactGraph, shard):
+    """
+    Fold a shard into `graph`. Shards must be merged in inventory order: inventory nodes
+    replace whatever is there, while placeholder and embedded-subnet nodes are only
+    kept if no node exists yet, exactly as in the serial single pass.
+    """
+    ids, nodes, real, kinds, src, dst, kind = shard
+    real = set(real)
+    index, all_ids, all_nodes = graph.index, graph.ids, graph.nodes
+    remap = []
+    # Inlined graph.intern(): this loop runs once per node of every shard
+    for i, nid in enumerate(ids):
+        record = nodes[i]
+        gi = index.get(nid)
+        if gi is None:
+            gi = len(all_ids)
+            index[nid] = gi
+            all_ids.append(nid)
+            all_nodes.append(None if record is None else Node(*record))
+        elif record is not None and (i in real or all_nodes[gi] is None):
+            all_nodes[gi] = Node(*record)
+        remap.append(gi)
+    codes = [graph.kind_code(k) for k in kinds]
+    graph.src.extend([remap[i] for i in src])
+    graph.dst.extend([remap[i] for i in dst])
+    graph.kind.extend([codes[k] for k in kind])
+
+
+def build_compact_graph_parallel(
+    inventory: Iterable, rbac: List[dict], workers: int, shard_size: int = 2000
+) -> CompactGraph:
+    """
+    Build a CompactGraph with edge extraction sharded across `workers` processes.
+
+    The inventory is cut into contiguous shards of `shard_size` records (resource dicts
+    or raw NDJSON lines). Shards are merged in order, so the result serializes
+    byte-identically to build_compact_graph().
+    """
+    graph = CompactGraph()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        it = iter(inventory)
+        while True:
+            shard = list(islice(it, shard_size))
+            if not shard:
+                break
+            pending.append(pool.submit(_build_shard, shard))
+            # Bound the number of shards held in memory
+            if len(pending) >= 2 * workers:
+                _merge_shard(graph, pending.popleft().result())
+        while pending:
+            _merge_shard(graph, pending.popleft().result())
+    _add_rbac(graph, rbac)
+    return graph
+
+
+def build_graph(inventory: Iterable[dict], rbac: List[dict]) -> dict:
+    """Build graph {nodes, edges} from resource inventory and RBAC list."""
+    return build_compact_graph(inventory, rbac).to_dict()
@@ -0,0 +1,119 @@
+"""Inventory artifact I/O: JSON array or newline-delimited JSON, read lazily."""
+import json
+import os
+from typing import Iterator, List
+
+from tools.azdisc.util import dump_json
+
+INVENTORY_JSON = "inventory.json"
+INVENTORY_NDJSON = "inventory.ndjson"
+FORMATS = {"json": INVENTORY_JSON, "ndjson": INVENTORY_NDJSON}
+
+_READ_SIZE = 1 << 20
+_decoder = json.JSONDecoder()
+
+
+def inventory_filename(fmt: str) -> str:
+    """Return the artifact name for an inventory format ("json" or "ndjson")."""
+    return FORMATS[fmt]
+
+
+def inventory_path(out_dir: str) -> str:
+    """Return the path of the inventory artifact present in `out_dir` (NDJSON preferred)."""
+    ndjson = os.path.join(out_dir, INVENTORY_NDJSON)
+    if os.path.exists(ndjson):
+        return ndjson
+    return os.path.join(out_dir, INVENTORY_JSON)
+
+
+def write_inventory(out_dir: str, inventory: List[dict], fmt: str = "json") -> str:
+    """
+    Write the inventory in `fmt` and remove the other format so readers never see a
+    stale copy. NDJSON holds one key-sorted resource per line.
+    """
+    path = os.path.join(out_dir, inventory_filename(fmt))
+    os.makedirs(out_dir, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        if fmt == "ndjson":
+            for resource in inventory:
+                fh.write(json.dumps(resource, sort_keys=True, separators=(",", ":")))
+                fh.write("\n")
+        else:
+            dump_json(inventory, fh)
+    for other in FORMATS.values():
+        other_path = os.path.join(out_dir, other)
+        if other_path != path and os.path.exists(other_path):
+            os.remove(other_path)
+    return path
+
+
+def iter_json_array(fh) -> Iterator:
+    """Yield the elements of a top-level JSON array from `fh` without loading it whole."""
+    buf = fh.read(_READ_SIZE)
+    idx = 0
+    eof = not buf
+    started = False
+    while True:
+        # Skip whitespace and separators
+        while idx < len(buf) and buf[idx] in " \t\r\n,":
+            idx += 1
+        if idx < len(buf) and not started:
+            if buf[idx] != "[":
+                raise ValueError("inventory JSON is not an array")
+            started = True
+            idx += 1
+            continue
+        if idx < len(buf) and buf[idx] == "]":
+            return
+        if idx < len(buf):
+            try:
+                value, end = _decoder.raw_decode(buf, idx)
+            except json.JSONDecodeError:
+                value, end = None, None
+            # A bare scalar may have been cut at the buffer edge; only trust a decode
+            # that is followed by more input.
+            if end is not None and (end < len(buf) or eof):
+                yield value
+                idx = end
+                continue
+            if eof:
+                raise ValueError("truncated or invalid inventory JSON")
+        elif eof:
+            if started:
+                raise ValueError("truncated inventory JSON")
+            return
+        more = fh.read(_READ_SIZE)
+        eof = not more
+        buf = buf[idx:] + more
+        idx = 0
+
+
+def iter_inventory(out_dir: str) -> Iterator[dict]:
+    """Yield inventory resources one at a time from whichever format is on disk."""
+    path = inventory_path(out_dir)
+    with open(path, "r", encoding="utf-8") as fh:
+        if path.endswith(".ndjson"):
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(fh)
+
+
+def iter_inventory_records(out_dir: str) -> Iterator:
+    """
+    Like iter_inventory(), but NDJSON lines are yielded unparsed so that a consumer
+    (e.g. the graph worker pool) can decode them elsewhere.
+    """
+    path = inventory_path(out_dir)
+    if not path.endswith(".ndjson"):
+        yield from iter_inventory(out_dir)
+        return
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield line
+
+
+def load_inventory(out_dir: str) -> List[dict]:
+    return list(iter_inventory(out_dir))
@@ -0,0 +1,83 @@
+"""Per-stage input fingerprints so `run` can skip stages whose inputs are unchanged."""
+import hashlib
+import json
+import os
+from typing import Dict, List
+
+from tools.azdisc.cache import content_key
+
+MANIFEST_NAME = "manifest.json"
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Manifest:
+    """
+    Records, per stage, a fingerprint of its inputs and the digests of its outputs.
+
+    A stage is fresh when its input fingerprint matches the recorded one and every
+    output, both those expected now and those recorded last time, still exists with the
+    recorded digest, so a hand-edited or deleted artifact forces the stage to run again.
+    Outputs are recorded by their path relative to `out_dir`.
+    """
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self.path = os.path.join(out_dir, MANIFEST_NAME)
+        self._digests = {}  # path -> ((mtime_ns, size), digest)
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                self.stages = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.stages = {}
+
+    def file_digest(self, path: str) -> str:
+        """Return the sha256 of a file's bytes, or "" if it does not exist."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return ""
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._digests.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        h = hashlib.sha256()
+        with open(path, "rb") as fh:
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self._digests[path] = (stamp, digest)
+        return digest
+
+    def code_digest(self, *modules: str) -> str:
+        """Fingerprint the source of the named tools.azdisc modules (e.g. "graph")."""
+        return content_key(
+            *(self.file_digest(os.path.join(PACKAGE_DIR, m + ".py")) for m in modules)
+        )
+
+    @staticmethod
+    def fingerprint(inputs: Dict[str, object]) -> str:
+        return content_key(inputs)
+
+    def is_fresh(self, stage: str, fingerprint: str, outputs: List[str]) -> bool:
+        entry = self.stages.get(stage)
+        if not entry or entry.get("inputs") != fingerprint:
+            return False
+        recorded = entry.get("outputs", {})
+        if any(self._name(path) not in recorded for path in outputs):
+            return False
+        for name, digest in recorded.items():
+            current = self.file_digest(os.path.join(self.out_dir, name))
+            if not current or current != digest:
+                return False
+        return True
+
+    def _name(self, path: str) -> str:
+        return os.path.relpath(path, self.out_dir).replace(os.sep, "/")
+
+    def record(self, stage: str, fingerprint: str, outputs: List[str]):
+        self.stages[stage] = {
+            "inputs": fingerprint,
+            "outputs": {self._name(p): self.file_digest(p) for p in outputs},
+        }
+        with open(self.path, "w", encoding="utf-8") as fh:
+            json.dump(self.stages, fh, indent=2, sort_keys=True)
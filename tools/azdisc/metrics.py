@@ -0,0 +1,117 @@
+"""
+Per-stage timing, resource usage and counters for --metrics / --profile.
+
+Collection is off unless a Metrics object is activated; until then incr() and
+observe() return immediately, so instrumented code pays almost nothing.
+"""
+import cProfile
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+_active = None  # type: Optional[Metrics]
+
+
+def _rss_mib(who) -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(who).ru_maxrss * scale / 2**20, 1)
+
+
+def _child_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Metrics:
+    """
+    Collects one record per stage: wall and CPU seconds (own and child processes such
+    as az and java), peak RSS, and any counters incremented while the stage ran.
+
+    With `profile_dir`, each stage also runs under cProfile and its stats are dumped to
+    <profile_dir>/<stage>.pstats.
+    """
+
+    def __init__(self, profile_dir: str = None):
+        self.profile_dir = profile_dir
+        self.stages = []
+        self._counters = None
+        self._lock = threading.Lock()
+
+    def activate(self):
+        global _active
+        _active = self
+        return self
+
+    @contextmanager
+    def stage(self, name: str):
+        record = {"stage": name}
+        self.stages.append(record)
+        self._counters = {}
+        profiler = cProfile.Profile() if self.profile_dir else None
+        wall, cpu, child_cpu = time.perf_counter(), time.process_time(), _child_cpu()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.pstats"))
+            record.update({
+                "wall_seconds": round(time.perf_counter() - wall, 3),
+                "cpu_seconds": round(time.process_time() - cpu, 3),
+                "child_cpu_seconds": round(_child_cpu() - child_cpu, 3),
+                "peak_rss_mib": _rss_mib(resource.RUSAGE_SELF),
+                "child_peak_rss_mib": _rss_mib(resource.RUSAGE_CHILDREN),
+                "counters": self._counters,
+            })
+            self._counters = None
+
+    def skip(self, name: str):
+        self.stages.append({"stage": name, "skipped": True})
+
+    def _incr(self, name: str, n):
+        with self._lock:
+            if self._counters is not None:
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def _observe(self, name: str, value):
+        with self._lock:
+            if self._counters is not None:
+                self._counters.setdefault(name, []).append(value)
+
+    def to_dict(self) -> dict:
+        return {"stages": self.stages}
+
+
+def incr(name: str, n=1):
+    """Add `n` to counter `name` of the running stage, if metrics are active."""
+    if _active is not None:
+        _active._incr(name, n)
+
+
+def observe(name: str, value):
+    """Append `value` to list `name` of the running stage, if metrics are active."""
+    if _active is not None:
+        _active._observe(name, value)
+
+
+@contextmanager
+def stage(name: str):
+    """Record stage `name` on the active Metrics; a no-op when metrics are off."""
+    if _active is None:
+        yield None
+    else:
+        with _active.stage(name) as record:
+            yield record
+
+
+def skip(name: str):
+    if _active is not None:
+        _active.skip(name)
@@ -0,0 +1,171 @@
+"""
+Per-type property projection: keep only the property subtrees the graph and expansion
+read, so Resource Graph returns (and we parse) a fraction of each property bag.
+
+For every type in graph.EDGE_RULES the kept subtrees are the objects holding each rule's
+leaf (or the first list on its path), plus DISCOVERY_PATHS and COMMON_PATHS: subtrees
+known to hold other references that expand follows. Other types keep their full
+properties. A reference outside these subtrees is not followed, which is why the
+projection is opt-in (projectProperties).
+"""
+from typing import Dict, List, Optional
+
+from tools.azdisc.graph import EDGE_RULES
+
+# Reference-holding subtrees kept for every projected type
+COMMON_PATHS = ["privateEndpointConnections"]
+
+# Reference-holding subtrees that no edge rule reads
+DISCOVERY_PATHS = {
+    "microsoft.compute/virtualmachines": [
+        "storageProfile",
+        "networkProfile",
+        "osProfile.secrets",
+        "applicationProfile",
+        "availabilitySet",
+        "proximityPlacementGroup",
+        "virtualMachineScaleSet",
+        "host",
+        "hostGroup",
+        "capacityReservation",
+    ],
+    "microsoft.network/networkinterfaces": [
+        "virtualMachine",
+        "privateEndpoint",
+        "privateLinkService",
+        "dscpConfiguration",
+    ],
+    "microsoft.network/loadbalancers": [
+        "frontendIPConfigurations",
+        "loadBalancingRules",
+        "inboundNatRules",
+        "inboundNatPools",
+        "outboundRules",
+        "probes",
+    ],
+    "microsoft.network/applicationgateways": [
+        "backendHttpSettingsCollection",
+        "httpListeners",
+        "requestRoutingRules",
+        "urlPathMaps",
+        "redirectConfigurations",
+        "rewriteRuleSets",
+        "probes",
+        "sslProfiles",
+        "privateLinkConfigurations",
+        "webApplicationFirewallConfiguration",
+    ],
+    "microsoft.network/privateendpoints": [
+        "networkInterfaces",
+        "manualPrivateLinkServiceConnections",
+        "applicationSecurityGroups",
+        "ipConfigurations",
+    ],
+    "microsoft.network/publicipaddresses": [
+        "publicIPPrefix",
+        "natGateway",
+        "linkedPublicIPAddress",
+        "servicePublicIPAddress",
+        "ddosSettings",
+    ],
+    "microsoft.containerservice/managedclusters": [
+        "diskEncryptionSetID",
+        "addonProfiles",
+        "networkProfile",
+        "identityProfile",
+        "podIdentityProfile",
+        "securityProfile",
+        "azureMonitorProfile",
+    ],
+    "microsoft.network/virtualnetworks": [
+        "subnets",
+        "ddosProtectionPlan",
+    ],
+    "microsoft.web/sites": [
+        "hostingEnvironmentProfile",
+        "keyVaultReferenceIdentity",
+        "siteConfig",
+    ],
+}
+
+
+def _rule_prefix(path: str) -> Optional[List[str]]:
+    """
+    Keys of the subtree kept for a rule path: up to its first list ("a.b[].c" -> a.b),
+    otherwise the object holding the leaf ("a.b.id" -> a.b), so sibling references such
+    as managedDisk.diskEncryptionSet stay visible to expand.
+    """
+    if path == "$id":
+        return None
+    keys = []
+    for part in path.split("."):
+        if part.endswith("[]"):
+            keys.append(part[:-2])
+            return keys
+        keys.append(part)
+    return keys[:-1] if len(keys) > 1 else keys
+
+
+def projection_tree(resource_type: str) -> Optional[Dict[str, object]]:
+    """
+    Nested dict of the subtrees kept for `resource_type` (None marks a whole subtree),
+    or None if the type keeps its full properties.
+    """
+    rules = EDGE_RULES.get(resource_type)
+    if rules is None:
+        return None
+    paths = [_rule_prefix(path) for path, _, _ in rules]
+    paths += [p.split(".") for p in DISCOVERY_PATHS.get(resource_type, []) + COMMON_PATHS]
+    tree = {}
+    # Shorter paths first, so a whole subtree absorbs the longer paths inside it
+    for keys in sorted((p for p in paths if p), key=len):
+        node = tree
+        for key in keys[:-1]:
+            child = node.setdefault(key, {})
+            if child is None:
+                break
+            node = child
+        else:
+            node[keys[-1]] = None
+    return tree
+
+
+# Top-level Resource Graph types only; child types such as subnets are never rows
+PROJECTED_TYPES = sorted(t for t in EDGE_RULES if t.count("/") == 1)
+_TREES = {t: projection_tree(t) for t in PROJECTED_TYPES}
+
+
+def _pack_kql(tree: Dict[str, object], base: str) -> str:
+    parts = []
+    for key in sorted(tree):
+        path = f"{base}.{key}"
+        value = path if tree[key] is None else _pack_kql(tree[key], path)
+        parts.append(f"'{key}', {value}")
+    return f"pack({', '.join(parts)})"
+
+
+def properties_kql() -> str:
+    """KQL `extend` that narrows `properties` for every projected type."""
+    cases = [
+        f"type =~ '{t}', {_pack_kql(_TREES[t], 'properties')}" for t in PROJECTED_TYPES
+    ]
+    return f"| extend properties = case({', '.join(cases)}, properties) "
+
+
+def _project(value, tree):
+    if tree is None:
+        return value
+    # Like pack(), a missing parent still yields its keys with null values
+    if not isinstance(value, dict):
+        value = {}
+    return {key: _project(value.get(key), sub) for key, sub in tree.items()}
+
+
+def project_properties(resource: dict) -> dict:
+    """Python equivalent of properties_kql() for one resource; returns a new dict."""
+    tree = _TREES.get(str(resource.get("type", "")).lower())
+    if tree is None:
+        return resource
+    projected = dict(resource)
+    projected["properties"] = _project(resource.get("properties"), tree)
+    return projected
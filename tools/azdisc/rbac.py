@@ -0,0 +1,132 @@
+"""
+Role assignment discovery: fetch assignments per subscription and management group, then
+match them to the inventory locally with a prefix trie over normalized scopes.
+
+An assignment whose scope is a discovered resource or one of their resource groups is
+direct. One whose scope only contains discovered resources (a parent resource, the
+subscription, an ancestor management group or the tenant root "/") is inherited and is
+marked with "inherited": true.
+"""
+from typing import Dict, Iterable, List, Tuple
+
+from tools.azdisc.arg import MG_SCOPE_PREFIX, AzureResourceGraph
+from tools.azdisc.expand import build_rbac_scopes
+from tools.azdisc.util import normalize_id
+
+# Marks a trie node that is itself an inventory scope
+_EXACT = ""
+
+
+class ScopeTrie:
+    """
+    Prefix trie over the "/"-separated segments of normalized scopes.
+
+    Lookups walk one node per segment, so matching N assignments costs O(N x depth)
+    however many scopes the inventory has.
+    """
+
+    def __init__(self, scopes: Iterable[str] = ()):
+        self.root = {}
+        for scope in scopes:
+            self.add(scope)
+
+    @staticmethod
+    def _segments(scope: str) -> List[str]:
+        return [s for s in normalize_id(scope).split("/") if s]
+
+    def add(self, scope: str):
+        node = self.root
+        for segment in self._segments(scope):
+            node = node.setdefault(segment, {})
+        node[_EXACT] = True
+
+    def match(self, scope: str) -> str:
+        """
+        "direct" if `scope` was added, "inherited" if it is a proper prefix of an added
+        scope, otherwise "" (also for an empty scope).
+        """
+        segments = self._segments(scope)
+        if not segments:
+            return ""
+        node = self.root
+        for segment in segments:
+            node = node.get(segment)
+            if node is None:
+                return ""
+        if _EXACT in node:
+            return "direct"
+        return "inherited" if node else ""
+
+
+def candidate_scopes(
+    inventory: List[dict], ancestry: Dict[str, List[str]] = None
+) -> List[str]:
+    """
+    Every normalized scope whose assignments can apply to `inventory`: the inventory
+    scopes and all their prefixes, the ancestor management groups and the root "/".
+    """
+    scopes = {"/"}
+    for scope in build_rbac_scopes(inventory):
+        segments = ScopeTrie._segments(scope)
+        for end in range(1, len(segments) + 1):
+            scopes.add("/" + "/".join(segments[:end]))
+    for sub in {str(r.get("subscriptionId", "")).lower() for r in inventory}:
+        scopes.update(MG_SCOPE_PREFIX + mg for mg in (ancestry or {}).get(sub, ()))
+    return sorted(scopes)
+
+
+def fetch_assignments(arg: AzureResourceGraph) -> Tuple[List[dict], Dict[str, List[str]]]:
+    """
+    Fetch every role assignment relevant to `arg`'s subscriptions.
+
+    Returns (assignments, ancestry): assignments at or below the subscriptions, in
+    20-subscription chunks, plus those at their ancestor management groups; ancestry
+    maps each lowercase subscription ID to its management group names.
+    """
+    assignments = arg.query_rbac_all()
+    ancestry = arg.query_subscription_ancestry()
+    groups = sorted({mg for chain in ancestry.values() for mg in chain})
+    if groups:
+        assignments = assignments + arg.query_rbac_management_groups(groups)
+    return assignments, ancestry
+
+
+def match_assignments(
+    assignments: Iterable[dict],
+    inventory: List[dict],
+    ancestry: Dict[str, List[str]] = None,
+) -> List[dict]:
+    """
+    Return the assignments that apply to `inventory`, sorted by ID and de-duplicated.
+
+    Inherited assignments are shallow copies with "inherited": true. Management group
+    scopes match when the group is in the `ancestry` of a subscription in the inventory.
+    """
+    trie = ScopeTrie(build_rbac_scopes(inventory))
+    groups = set()
+    for sub in {str(r.get("subscriptionId", "")).lower() for r in inventory}:
+        groups.update((ancestry or {}).get(sub, ()))
+
+    matched = {}
+    for ra in assignments:
+        rid = normalize_id(ra["id"])
+        if rid in matched:
+            continue
+        scope = normalize_id(str((ra.get("properties") or {}).get("scope", "")))
+        if scope.startswith(MG_SCOPE_PREFIX):
+            kind = "inherited" if scope[len(MG_SCOPE_PREFIX):] in groups else ""
+        elif scope == "/":
+            kind = "inherited" if inventory else ""
+        else:
+            kind = trie.match(scope)
+        if kind == "direct":
+            matched[rid] = ra
+        elif kind == "inherited":
+            matched[rid] = dict(ra, inherited=True)
+    return [matched[rid] for rid in sorted(matched)]
+
+
+def collect_rbac(arg: AzureResourceGraph, inventories: List[List[dict]]) -> List[List[dict]]:
+    """Fetch assignments once and match them against each inventory in turn."""
+    assignments, ancestry = fetch_assignments(arg)
+    return [match_assignments(assignments, inv, ancestry) for inv in inventories]
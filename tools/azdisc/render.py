@@ -1,23 +1,70 @@
 """Render a PlantUML diagram to SVG using the plantuml jar."""
 import os
+import queue
 import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
 
+from tools.azdisc import metrics
 from tools.azdisc.arg import AzDiscError
+from tools.azdisc.cache import RenderCache
 
+JAVA = "java"
 
-def render(puml_path: str, output_dir: str, plantuml_jar: str = None) -> str:
+# Printed by plantuml -pipe after each rendered diagram
+PIPE_DELIMITER = "___AZDISC_PLANTUML_END___"
+
+_STOPPED = object()
+
+
+def resolve_jar(plantuml_jar: str = None) -> str:
+    """Return the plantuml jar path from the argument, $PLANTUML_JAR, or the default."""
+    return plantuml_jar or os.environ.get("PLANTUML_JAR") or "plantuml.jar"
+
+
+def jar_stamp(plantuml_jar: str = None) -> list:
+    """Identify the plantuml jar by path, size and mtime (cheaper than asking the JVM)."""
+    jar = resolve_jar(plantuml_jar)
+    try:
+        st = os.stat(jar)
+    except OSError:
+        return [jar]
+    return [os.path.abspath(jar), st.st_size, st.st_mtime_ns]
+
+
+def _svg_path(puml_path: str, output_dir: str) -> str:
+    base = os.path.splitext(os.path.basename(puml_path))[0]
+    return os.path.join(output_dir, base + ".svg")
+
+
+def _java(heap: str = None) -> List[str]:
+    return [JAVA, f"-Xmx{heap}"] if heap else [JAVA]
+
+
+def render(
+    puml_path: str, output_dir: str, plantuml_jar: str = None, heap: str = None, timeout: float = None
+) -> str:
     """
     Render a .puml file to SVG using the plantuml jar.
 
+    `heap` is passed to the JVM as -Xmx; `timeout` bounds the render in seconds.
     Returns the path to the generated SVG file.
     Raises AzDiscError on failure.
     """
-    jar = plantuml_jar or os.environ.get("PLANTUML_JAR") or "plantuml.jar"
+    jar = resolve_jar(plantuml_jar)
     os.makedirs(output_dir, exist_ok=True)
 
-    cmd = ["java", "-jar", jar, "-tsvg", "-o", os.path.abspath(output_dir), puml_path]
+    cmd = _java(heap) + ["-jar", jar, "-tsvg", "-o", os.path.abspath(output_dir), puml_path]
 
-    proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
+    try:
+        proc = subprocess.run(cmd, capture_output=True, text=True, check=False, timeout=timeout)
+    except subprocess.TimeoutExpired as exc:
+        raise AzDiscError(
+            f"plantuml render timed out after {timeout}s for {puml_path}", cmd=cmd
+        ) from exc
     if proc.returncode != 0:
         raise AzDiscError(
             f"plantuml render failed for {puml_path}",
@@ -26,6 +73,208 @@ def render(puml_path: str, output_dir: str, plantuml_jar: str = None) -> str:
             stderr=proc.stderr,
         )
 
-    base = os.path.splitext(os.path.basename(puml_path))[0]
-    svg_path = os.path.join(output_dir, base + ".svg")
-    return svg_path
+    return _svg_path(puml_path, output_dir)
+
+
+class PlantUmlDaemon:
+    """
+    One long-lived `plantuml -pipe` JVM that renders many diagrams, so JVM startup and
+    Azure-PlantUML include parsing are paid once per run instead of once per diagram.
+
+    If the JVM cannot be started or dies, render() falls back to the one-shot render()
+    for that and every later diagram. Use as a context manager.
+    """
+
+    def __init__(self, plantuml_jar: str = None, timeout: float = 600, heap: str = None):
+        self.jar = resolve_jar(plantuml_jar)
+        self.timeout = timeout
+        self.heap = heap
+        self.cmd = _java(heap) + [
+            "-Djava.awt.headless=true", "-jar", self.jar,
+            "-tsvg", "-charset", "UTF-8", "-pipe", "-pipedelimitor", PIPE_DELIMITER,
+        ]
+        self._proc = None
+        self._outputs = None
+        self._stderr = None
+        self._failed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self) -> bool:
+        if self._proc is not None:
+            return True
+        if self._failed:
+            return False
+        try:
+            # stderr goes to a file: plantuml reports errors there before writing the
+            # diagram, so the report is complete once the delimiter arrives on stdout
+            self._stderr = tempfile.TemporaryFile()
+            self._proc = subprocess.Popen(
+                self.cmd,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=self._stderr,
+            )
+        except OSError as exc:
+            print(f"  [render] plantuml daemon unavailable ({exc}), using one-shot", file=sys.stderr)
+            self._failed = True
+            self._proc = None
+            return False
+        self._outputs = queue.Queue()
+        threading.Thread(target=self._read_outputs, args=(self._proc, self._outputs), daemon=True).start()
+        return True
+
+    @staticmethod
+    def _read_outputs(proc, outputs):
+        """Split the daemon's stdout into one bytes object per rendered diagram."""
+        delimiter = PIPE_DELIMITER.encode() + b"\n"
+        buf = []
+        for line in proc.stdout:
+            if line.replace(b"\r\n", b"\n") == delimiter:
+                outputs.put(b"".join(buf))
+                buf = []
+            else:
+                buf.append(line)
+        outputs.put(_STOPPED)
+
+    def _stop(self, failed: bool):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        self._failed = self._failed or failed
+        try:
+            proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        self._stderr.close()
+
+    def close(self):
+        self._stop(failed=False)
+
+    def _render_one_shot(self, puml_path: str, output_dir: str) -> str:
+        return render(puml_path, output_dir, self.jar, heap=self.heap, timeout=self.timeout)
+
+    def render(self, puml_path: str, output_dir: str) -> str:
+        """Render one .puml file to <output_dir>/<name>.svg; raises AzDiscError on failure."""
+        if not self._start():
+            return self._render_one_shot(puml_path, output_dir)
+
+        with open(puml_path, "rb") as fh:
+            source = fh.read()
+        err_offset = self._stderr.seek(0, os.SEEK_END)
+        try:
+            self._proc.stdin.write(source.rstrip(b"\n") + b"\n")
+            self._proc.stdin.flush()
+            svg = self._outputs.get(timeout=self.timeout)
+        except OSError:
+            svg = _STOPPED
+        except queue.Empty:
+            self._proc.kill()
+            self._stop(failed=False)
+            raise AzDiscError(
+                f"plantuml render timed out after {self.timeout}s for {puml_path}",
+                cmd=self.cmd,
+            )
+
+        if svg is _STOPPED:
+            print("  [render] plantuml daemon exited, using one-shot", file=sys.stderr)
+            self._stop(failed=True)
+            return self._render_one_shot(puml_path, output_dir)
+
+        self._stderr.seek(err_offset)
+        errors = self._stderr.read().decode("utf-8", "replace")
+        if any(line.strip() == "ERROR" for line in errors.splitlines()):
+            raise AzDiscError(
+                f"plantuml render failed for {puml_path}",
+                cmd=self.cmd,
+                stdout="",
+                stderr=errors,
+            )
+
+        os.makedirs(output_dir, exist_ok=True)
+        svg_path = _svg_path(puml_path, output_dir)
+        with open(svg_path, "wb") as fh:
+            fh.write(svg)
+        return svg_path
+
+
+def render_many(
+    puml_paths: List[str],
+    plantuml_jar: str = None,
+    workers: int = 1,
+    heap: str = None,
+    timeout: float = 600,
+    backend: str = "daemon",
+    cache: RenderCache = None,
+) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """
+    Render many .puml files, each to an SVG next to it, on `workers` JVMs at once.
+
+    With the daemon backend every worker thread owns one PlantUmlDaemon; with oneshot
+    each file gets its own JVM. `heap` and `timeout` apply per JVM and per file. The
+    largest files are started first so one big diagram does not finish last.
+
+    With a `cache`, files whose source, includes and jar are unchanged get the cached
+    SVG instead of a render. A failed file does not stop the others. Returns (svg paths of the files that
+    rendered, [(puml path, error message)] of those that did not), both in input order.
+    """
+    local = threading.local()
+    daemons = []
+    lock = threading.Lock()
+
+    stamp = jar_stamp(plantuml_jar) if cache is not None else None
+
+    def render_one(puml_path):
+        output_dir = os.path.dirname(puml_path)
+        if cache is not None:
+            key = cache.key(puml_path, stamp)
+            svg_path = _svg_path(puml_path, output_dir)
+            if cache.fetch(key, svg_path):
+                metrics.incr("render_cache_hits")
+                return svg_path
+        metrics.incr("jvm_renders")
+        if backend != "daemon":
+            svg_path = render(puml_path, output_dir, plantuml_jar, heap=heap, timeout=timeout)
+        else:
+            daemon = getattr(local, "daemon", None)
+            if daemon is None:
+                daemon = local.daemon = PlantUmlDaemon(plantuml_jar, timeout=timeout, heap=heap)
+                with lock:
+                    daemons.append(daemon)
+            svg_path = daemon.render(puml_path, output_dir)
+        if cache is not None:
+            cache.put(key, svg_path)
+        return svg_path
+
+    def size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    order = sorted(range(len(puml_paths)), key=lambda i: -size(puml_paths[i]))
+    results = [None] * len(puml_paths)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = {pool.submit(render_one, puml_paths[i]): i for i in order}
+            for future, i in futures.items():
+                try:
+                    results[i] = (future.result(), None)
+                except (AzDiscError, OSError) as exc:
+                    results[i] = (None, str(exc))
+    finally:
+        for daemon in daemons:
+            daemon.close()
+
+    rendered = [svg for svg, _ in results if svg is not None]
+    failed = [(puml_paths[i], err) for i, (_, err) in enumerate(results) if err is not None]
+    return rendered, failed
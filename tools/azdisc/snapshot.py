@@ -0,0 +1,247 @@
+"""
+Tenant snapshot: one bulk Resource Graph sweep into an indexed SQLite store, and
+offline expansion from it.
+
+The store keeps every resource by normalized ID, an index by (subscription, resource
+group), the ARM IDs each resource references together with a reverse index, and
+optionally every role assignment (with each subscription's management group ancestry)
+by scope. Apps are then expanded from the store
+without further Resource Graph calls.
+"""
+import json
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from tools.azdisc.arg import AzDiscError, AzureResourceGraph
+from tools.azdisc.config import AppConfig
+from tools.azdisc.expand import MAX_ITERATIONS
+from tools.azdisc.rbac import candidate_scopes, fetch_assignments, match_assignments
+from tools.azdisc.util import chunk, normalize_id, resource_arm_ids
+
+STORE_NAME = "tenant.db"
+
+# Stay well below SQLite's bound-parameter limit
+_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE resources (
+    id TEXT PRIMARY KEY,
+    subscription TEXT NOT NULL,
+    resource_group TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX resources_rg ON resources (subscription, resource_group);
+CREATE TABLE refs (src TEXT NOT NULL, dst TEXT NOT NULL, PRIMARY KEY (src, dst)) WITHOUT ROWID;
+CREATE INDEX refs_dst ON refs (dst, src);
+CREATE TABLE role_assignments (id TEXT PRIMARY KEY, scope TEXT NOT NULL, body TEXT NOT NULL);
+CREATE INDEX role_assignments_scope ON role_assignments (scope);
+"""
+
+
+def store_path(config: AppConfig) -> str:
+    """The config's snapshotStore, or <outputDir>/tenant.db."""
+    return config.snapshotStore or os.path.join(config.outputDir, STORE_NAME)
+
+
+class TenantStore:
+    """Read access to a snapshot written by write_store()."""
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise AzDiscError(f"no tenant snapshot at {path}; run the snapshot command first")
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.meta = {k: json.loads(v) for k, v in self.conn.execute("SELECT key, value FROM meta")}
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def timestamp(self) -> str:
+        return self.meta["timestamp"]
+
+    def check_covers(self, config: AppConfig):
+        """Raise AzDiscError unless the snapshot swept all of the config's subscriptions."""
+        swept = {s.lower() for s in self.meta["subscriptions"]}
+        missing = sorted(s for s in config.subscriptions if s.lower() not in swept)
+        if missing:
+            raise AzDiscError(
+                f"tenant snapshot {self.path} does not cover subscriptions: {', '.join(missing)}"
+            )
+
+    def _select(self, sql: str, keys: Iterable[str], params: tuple = ()) -> list:
+        """Run `sql` once per batch of `keys`, bound to its "{marks}" placeholder."""
+        rows = []
+        for key_chunk in chunk(sorted(set(keys)), _BATCH):
+            marks = ", ".join("?" * len(key_chunk))
+            rows.extend(self.conn.execute(sql.format(marks=marks), (*params, *key_chunk)))
+        return rows
+
+    def get(self, ids: Iterable[str], subscriptions: Optional[Set[str]] = None) -> List[dict]:
+        """Resources for `ids`, sorted by ID, optionally limited to lowercase `subscriptions`."""
+        rows = self._select(
+            "SELECT id, subscription, body FROM resources WHERE id IN ({marks})",
+            (normalize_id(i) for i in ids),
+        )
+        rows.sort()
+        return [
+            json.loads(body) for _, sub, body in rows
+            if subscriptions is None or sub in subscriptions
+        ]
+
+    def in_resource_groups(self, subscriptions: List[str], resource_groups: List[str]) -> List[dict]:
+        """Resources in any of `resource_groups` within `subscriptions`, sorted by ID."""
+        rows = []
+        for sub in sorted({s.lower() for s in subscriptions}):
+            rows.extend(self._select(
+                "SELECT id, body FROM resources WHERE subscription = ? "
+                "AND resource_group IN ({marks})",
+                (rg.lower() for rg in resource_groups),
+                (sub,),
+            ))
+        rows.sort()
+        return [json.loads(body) for _, body in rows]
+
+    def references(self, ids: Iterable[str]) -> Set[str]:
+        """ARM IDs referenced by any of `ids`."""
+        return {dst for (dst,) in self._select("SELECT dst FROM refs WHERE src IN ({marks})", ids)}
+
+    def referrers(self, ids: Iterable[str]) -> Set[str]:
+        """IDs of stored resources that reference any of `ids`."""
+        return {
+            src for (src,) in self._select(
+                "SELECT src FROM refs WHERE dst IN ({marks})", (normalize_id(i) for i in ids)
+            )
+        }
+
+    def role_assignments(self, inventory: List[dict]) -> List[dict]:
+        """Role assignments that apply to `inventory`, as rbac.match_assignments() returns them."""
+        if not self.meta.get("rbac"):
+            raise AzDiscError(
+                f"tenant snapshot {self.path} has no role assignments; "
+                "re-run snapshot with includeRbac set"
+            )
+        ancestry = self.meta.get("ancestry")
+        # Only scopes that can match are read, through the scope index
+        rows = self._select(
+            "SELECT body FROM role_assignments WHERE scope IN ({marks})",
+            candidate_scopes(inventory, ancestry),
+        )
+        return match_assignments((json.loads(body) for (body,) in rows), inventory, ancestry)
+
+
+def write_store(
+    path: str,
+    resources: List[dict],
+    subscriptions: List[str],
+    timestamp: str,
+    rbac: Optional[List[dict]] = None,
+    ancestry: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, int]:
+    """
+    Write a new store at `path`, replacing any existing one only once it is complete.
+
+    `rbac` is None when role assignments were not swept; `ancestry` maps subscriptions
+    to their management groups. Returns row counts.
+    """
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(tmp)
+    refs = 0
+    try:
+        conn.executescript(SCHEMA)
+        meta = {
+            "timestamp": timestamp,
+            "subscriptions": sorted(subscriptions),
+            "rbac": rbac is not None,
+            "ancestry": ancestry or {},
+        }
+        conn.executemany(
+            "INSERT INTO meta VALUES (?, ?)", ((k, json.dumps(v)) for k, v in meta.items())
+        )
+        for resource in resources:
+            rid = normalize_id(resource["id"])
+            conn.execute(
+                "INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?)",
+                (
+                    rid,
+                    (resource.get("subscriptionId") or "").lower(),
+                    (resource.get("resourceGroup") or "").lower(),
+                    json.dumps(resource, sort_keys=True, separators=(",", ":")),
+                ),
+            )
+            targets = resource_arm_ids(resource) - {rid}
+            conn.executemany(
+                "INSERT OR IGNORE INTO refs VALUES (?, ?)", ((rid, dst) for dst in targets)
+            )
+            refs += len(targets)
+        conn.executemany(
+            "INSERT OR REPLACE INTO role_assignments VALUES (?, ?, ?)",
+            (
+                (
+                    normalize_id(ra["id"]),
+                    normalize_id(str((ra.get("properties") or {}).get("scope", ""))),
+                    json.dumps(ra, sort_keys=True, separators=(",", ":")),
+                )
+                for ra in rbac or []
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+    return {"resources": len(resources), "references": refs, "role_assignments": len(rbac or [])}
+
+
+def take_snapshot(
+    arg: AzureResourceGraph, path: str, timestamp: str, include_rbac: bool = False
+) -> Dict[str, int]:
+    """Sweep all resources (and role assignments) in `arg`'s subscriptions into `path`."""
+    resources = arg.query_all()
+    rbac, ancestry = fetch_assignments(arg) if include_rbac else (None, None)
+    return write_store(path, resources, arg.subscriptions, timestamp, rbac, ancestry)
+
+
+def seed_offline(config: AppConfig, store: TenantStore) -> List[dict]:
+    """The app's seed resources, as the seed query would return them."""
+    store.check_covers(config)
+    return store.in_resource_groups(config.subscriptions, config.seedResourceGroups)
+
+
+def expand_offline(
+    config: AppConfig, store: TenantStore, seed: Optional[List[dict]] = None
+) -> Tuple[List[dict], List[str]]:
+    """
+    expand() against the store: follow references from the seed resource groups using
+    the stored reference index, without any Resource Graph calls.
+
+    As with query_by_ids, only resources in the app's subscriptions are collected; other
+    referenced IDs are reported as unresolved. Returns (inventory, unresolved).
+    """
+    store.check_covers(config)
+    subs = {s.lower() for s in config.subscriptions}
+    inventory = list(seed_offline(config, store) if seed is None else seed)
+    collected = {normalize_id(r["id"]) for r in inventory}
+    unresolved = set()
+    frontier = collected
+    for _ in range(MAX_ITERATIONS):
+        missing = store.references(frontier) - collected - unresolved
+        if not missing:
+            break
+        fetched = store.get(missing, subs)
+        fetched_ids = {normalize_id(r["id"]) for r in fetched}
+        unresolved |= missing - fetched_ids
+        inventory.extend(fetched)
+        collected |= fetched_ids
+        frontier = fetched_ids
+    return inventory, sorted(unresolved)
@@ -0,0 +1,124 @@
+"""Reduce a graph for diagram emission: fold leaf resources and collapse siblings."""
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+DEFAULT_LEAF_TYPES = [
+    "microsoft.compute/disks",
+    "microsoft.network/networkinterfaces",
+    "microsoft.authorization/roleassignments",
+]
+
+
+def _type_short(node_type: str) -> str:
+    return node_type.split("/")[-1] if node_type else "unknown"
+
+
+def format_summary(counts: Dict[str, int]) -> str:
+    """Render {"disks": 3, "networkinterfaces": 2} as "3 disks, 2 networkinterfaces"."""
+    return ", ".join(f"{n} {ts}" for ts, n in sorted(counts.items()))
+
+
+def summarize(graph: dict, leaf_types: List[str] = None, collapse_min: int = 3) -> dict:
+    """
+    Return a reduced copy of `graph` for drawing; `graph` itself is not modified.
+
+    1. Nodes of `leaf_types` with exactly one resource depending on them (one distinct
+       incoming edge source) are folded into that parent. Their other edges move to
+       the parent, and the parent gets a "summary" such as "3 disks, 2 networkinterfaces".
+    2. Then `collapse_min` or more nodes of the same type, subscription and resource
+       group with identical, non-empty incoming and outgoing neighbours become one
+       node, named "<first> +N" with a "count" field (0 disables). Their leaf
+       summaries are added up.
+
+    Edges are remapped, self-loops dropped and the result re-sorted, so the output is
+    deterministic.
+    """
+    leaf_types = set(DEFAULT_LEAF_TYPES if leaf_types is None else leaf_types)
+    nodes = {n["id"]: n for n in graph.get("nodes", [])}
+    edges = graph.get("edges", [])
+
+    sources = defaultdict(set)
+    for edge in edges:
+        if edge["src"] != edge["dst"]:
+            sources[edge["dst"]].add(edge["src"])
+
+    # Fold leaves; a leaf whose parent is itself folded ends up in the final parent
+    parent = {}
+    for nid, node in nodes.items():
+        if node.get("type") in leaf_types and len(sources[nid]) == 1:
+            parent[nid] = next(iter(sources[nid]))
+
+    def resolve(nid):
+        seen = set()
+        while nid in parent and nid not in seen:
+            seen.add(nid)
+            nid = parent[nid]
+        return nid
+
+    target = {nid: resolve(nid) for nid in parent}
+    # A cycle of leaves folds into itself; keep those nodes
+    target = {nid: t for nid, t in target.items() if t not in parent}
+    counts = defaultdict(Counter)
+    for nid, t in target.items():
+        counts[t][_type_short(nodes[nid].get("type", ""))] += 1
+
+    mapping = {nid: target.get(nid, nid) for nid in nodes}
+    reduced = _remap(((e["src"], e["dst"], e.get("kind", "dependency")) for e in edges), mapping)
+
+    # Collapse same-type siblings with identical neighbourhoods
+    collapsed = {}
+    if collapse_min > 0:
+        ins, outs = defaultdict(set), defaultdict(set)
+        for src, dst, kind in reduced:
+            outs[src].add((dst, kind))
+            ins[dst].add((src, kind))
+        groups = defaultdict(list)
+        for nid in sorted(nodes):
+            # Unconnected nodes have nothing in common but their type
+            if mapping[nid] != nid or not (ins[nid] or outs[nid]):
+                continue
+            node = nodes[nid]
+            key = (
+                node.get("type", ""),
+                (node.get("subscriptionId") or "").lower(),
+                (node.get("resourceGroup") or "").lower(),
+                frozenset(ins[nid]),
+                frozenset(outs[nid]),
+            )
+            groups[key].append(nid)
+        for members in groups.values():
+            if len(members) < collapse_min:
+                continue
+            rep = members[0]
+            collapsed[rep] = len(members)
+            for nid in members[1:]:
+                counts[rep].update(counts.pop(nid, {}))
+                mapping[nid] = rep
+        for nid in nodes:
+            mapping[nid] = mapping[mapping[nid]]
+        reduced = _remap(reduced, mapping)
+
+    out_nodes = []
+    for nid in sorted(nodes):
+        if mapping[nid] != nid:
+            continue
+        node = dict(nodes[nid])
+        if nid in collapsed:
+            node["name"] = f"{node.get('name') or nid.split('/')[-1]} +{collapsed[nid] - 1}"
+            node["count"] = collapsed[nid]
+        if counts.get(nid):
+            node["summary"] = format_summary(counts[nid])
+        out_nodes.append(node)
+    out_edges = [{"src": s, "dst": d, "kind": k} for s, d, k in sorted(reduced)]
+    return {"nodes": out_nodes, "edges": out_edges}
+
+
+def _remap(edges, mapping) -> set:
+    """Rewrite (src, dst, kind) endpoints through `mapping`; drop self-loops and duplicates."""
+    result = set()
+    for src, dst, kind in edges:
+        src = mapping.get(src, src)
+        dst = mapping.get(dst, dst)
+        if src != dst:
+            result.add((src, dst, kind))
+    return result
@@ -0,0 +1,99 @@
+"""Tests for tools.azdisc.arg."""
+import json
+import random
+import subprocess
+import time
+
+import pytest
+
+from tools.azdisc.arg import AzDiscError, AzureResourceGraph
+
+SUBS = [f"00000000-0000-0000-0000-{i:012d}" for i in range(45)]
+
+
+def _fake_run(pages_per_chunk=2):
+    """Return a subprocess.run stand-in serving `pages_per_chunk` pages per sub chunk."""
+    calls = []
+
+    def run(cmd, capture_output, text, check):
+        calls.append(cmd)
+        kql = cmd[cmd.index("-q") + 1]
+        subs = cmd[cmd.index("--subscriptions") + 1 : cmd.index("--first")]
+        page = int(cmd[cmd.index("--skip-token") + 1]) if "--skip-token" in cmd else 0
+        time.sleep(random.random() / 200)
+        data = {"data": [{"kql": kql, "first": subs[0], "page": page}]}
+        if page + 1 < pages_per_chunk:
+            data["skipToken"] = str(page + 1)
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(data), stderr="")
+
+    run.calls = calls
+    return run
+
+
+def test_run_query_chunks_and_pages(monkeypatch):
+    fake = _fake_run()
+    monkeypatch.setattr(subprocess, "run", fake)
+    results = AzureResourceGraph(SUBS).query_seed(["rg-test"])
+    assert [(r["first"], r["page"]) for r in results] == [
+        (SUBS[0], 0), (SUBS[0], 1),
+        (SUBS[20], 0), (SUBS[20], 1),
+        (SUBS[40], 0), (SUBS[40], 1),
+    ]
+    assert len(fake.calls) == 6
+
+
+def test_parallel_results_match_serial(monkeypatch):
+    ids = [f"/subscriptions/x/providers/a/b/r{i}" for i in range(650)]
+    monkeypatch.setattr(subprocess, "run", _fake_run())
+    serial = AzureResourceGraph(SUBS).query_by_ids(ids)
+    monkeypatch.setattr(subprocess, "run", _fake_run())
+    parallel = AzureResourceGraph(SUBS, workers=8).query_by_ids(ids)
+    assert json.dumps(parallel) == json.dumps(serial)
+    # 4 ID chunks x 3 subscription chunks x 2 pages
+    assert len(parallel) == 24
+
+
+def test_parallel_failure_raises(monkeypatch):
+    def run(cmd, capture_output, text, check):
+        return subprocess.CompletedProcess(cmd, 1, stdout="", stderr="throttled")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    with pytest.raises(AzDiscError) as excinfo:
+        AzureResourceGraph(SUBS, workers=4).query_seed(["rg-test"])
+    assert excinfo.value.stderr == "throttled"
+
+
+def test_multihop_seed_query_stays_within_join_limit_and_dedupes(monkeypatch):
+    calls = []
+
+    def run(cmd, capture_output, text, check):
+        calls.append(cmd[cmd.index("-q") + 1])
+        rows = [{"id": "/subscriptions/s/resourceGroups/rg/providers/a/b/x"},
+                {"id": "/SUBSCRIPTIONS/S/resourcegroups/RG/providers/a/b/x"},
+                {"id": "/subscriptions/s/resourceGroups/rg/providers/a/b/y"}]
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps({"data": rows}), stderr="")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    results = AzureResourceGraph(SUBS[:1]).query_seed_multihop(["rg-app"])
+    assert [r["id"][-1] for r in results] == ["x", "y"]
+    (kql,) = calls
+    assert kql.count("| join ") == 3
+    assert kql.count("| union ") == 1
+    assert kql.count("resourceGroup in~ ('rg-app')") == 3
+
+
+def test_management_group_queries_use_group_scope(monkeypatch):
+    calls = []
+
+    def run(cmd, capture_output, text, check):
+        calls.append(cmd)
+        row = {"subscriptionId": SUBS[0].upper(), "chain": [{"name": "MG-App"}, {"name": "root"}]}
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps({"data": [row]}), stderr="")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    arg = AzureResourceGraph(SUBS[:1])
+    assert arg.query_subscription_ancestry() == {SUBS[0]: ["mg-app", "root"]}
+    arg.query_rbac_management_groups(["mg-app", "root"])
+    assert calls[0][calls[0].index("--subscriptions") + 1] == SUBS[0]
+    assert "--subscriptions" not in calls[1]
+    assert calls[1][calls[1].index("--management-groups") + 1 :][:2] == ["mg-app", "root"]
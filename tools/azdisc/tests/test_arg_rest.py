@@ -0,0 +1,114 @@
+"""Tests for the REST backend in tools.azdisc.arg against a local stand-in server."""
+import json
+import socket
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tools.azdisc.arg import AzDiscError, AzureResourceGraphRest, _retry_delay
+
+SUB = "00000000-0000-0000-0000-000000000001"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        server.connections.add(self.client_address)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server.requests.append((self.headers["Authorization"], body))
+        if server.status != 200:
+            payload = b'{"error": {"code": "BadRequest"}}'
+            self.send_response(server.status)
+        else:
+            page = int(body["options"].get("$skipToken") or 0)
+            data = {"data": [{"id": f"r{page}", "query": body["query"]}]}
+            if page + 1 < server.pages:
+                data["$skipToken"] = str(page + 1)
+            payload = json.dumps(data).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    srv.connections = set()
+    srv.requests = []
+    srv.pages = 3
+    srv.status = 200
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _client(srv, subscriptions=(SUB,), **kwargs):
+    host, port = srv.server_address
+    return AzureResourceGraphRest(
+        list(subscriptions), endpoint=f"http://{host}:{port}", token="tok", **kwargs
+    )
+
+
+def test_rest_follows_skip_tokens_on_one_connection(server):
+    arg = _client(server)
+    results = arg.query_seed(["rg-test"]) + arg.query_seed(["rg-other"])
+    assert [r["id"] for r in results] == ["r0", "r1", "r2"] * 2
+    assert len(server.requests) == 6
+    assert len(server.connections) == 1
+    auth, body = server.requests[1]
+    assert auth == "Bearer tok"
+    assert body["subscriptions"] == [SUB]
+    assert body["options"]["$skipToken"] == "1"
+
+
+def test_rest_workers_reuse_connections_until_close(server):
+    server.pages = 1
+    subs = [f"00000000-0000-0000-0000-{i:012d}" for i in range(60)]
+    with _client(server, subs, workers=3) as arg:
+        for _ in range(4):
+            assert len(arg.query_seed(["rg-test"])) == 3
+        conns = set(arg._conns)
+    # One connection per pool thread, kept across queries
+    assert len(server.requests) == 12
+    assert 1 <= len(server.connections) <= 3
+    assert len(conns) == len(server.connections)
+    assert not arg._conns and all(conn.sock is None for conn in conns)
+
+
+def test_retry_after_date_falls_back_to_backoff():
+    assert _retry_delay("3", 0) == 3.0
+    assert _retry_delay("Wed, 21 Oct 2015 07:28:00 GMT", 2) == 4.0
+    assert _retry_delay(None, 1) == 2.0
+
+
+def test_rest_http_error_raises(server):
+    server.status = 400
+    with pytest.raises(AzDiscError) as excinfo:
+        _client(server).query_seed(["rg-test"])
+    assert "HTTP 400" in str(excinfo.value)
+
+
+def test_rest_falls_back_to_cli(monkeypatch):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    def run(cmd, capture_output, text, check):
+        return subprocess.CompletedProcess(cmd, 0, stdout='{"data": [{"id": "cli"}]}', stderr="")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    arg = AzureResourceGraphRest([SUB], endpoint=f"http://127.0.0.1:{port}", token="tok")
+    assert arg.query_seed(["rg-test"]) == [{"id": "cli"}]
+    assert arg.query_seed(["rg-test"]) == [{"id": "cli"}]
@@ -0,0 +1,94 @@
+"""Tests for tools.azdisc.batch."""
+from collections import Counter
+
+from tools.azdisc.batch import ResourcePool, discover_shared, expand_app, plan, shared_rbac
+from tools.azdisc.bench.synth import SyntheticARG, _sub, generate
+from tools.azdisc.config import AppConfig
+from tools.azdisc.expand import expand
+from tools.azdisc.rbac import collect_rbac
+from tools.azdisc.util import normalize_id
+
+SUBS = [_sub(i) for i in range(4)]
+
+
+class CountingARG(SyntheticARG):
+    """SyntheticARG that records every ID and scope it is asked for."""
+
+    def __init__(self, resources, rbac=()):
+        super().__init__(resources, rbac)
+        self.ids = Counter()
+        self.rbac_calls = 0
+
+    def query_by_ids(self, ids):
+        self.ids.update(normalize_id(i) for i in ids)
+        return super().query_by_ids(ids)
+
+    def query_rbac_all(self):
+        self.rbac_calls += 1
+        return super().query_rbac_all()
+
+
+def _configs(seed_rgs):
+    # Overlapping apps: both share the middle resource groups and the hub VNets
+    return [
+        AppConfig(app="a", subscriptions=SUBS, seedResourceGroups=seed_rgs[:6], outputDir="out-a"),
+        AppConfig(app="b", subscriptions=SUBS, seedResourceGroups=seed_rgs[3:], outputDir="out-b"),
+    ]
+
+
+def _ids(resources):
+    return sorted(normalize_id(r["id"]) for r in resources)
+
+
+def test_plan_unions_case_insensitively():
+    configs = [
+        AppConfig(app="a", subscriptions=["S1"], seedResourceGroups=["rg-A"], outputDir="a"),
+        AppConfig(app="b", subscriptions=["s1", "s2"], seedResourceGroups=["RG-a", "rg-b"], outputDir="b"),
+    ]
+    assert plan(configs) == (["S1", "s2"], ["rg-A", "rg-b"])
+
+
+def test_batch_fetches_each_resource_once_and_matches_single_app_expand():
+    resources, _, seed_rgs = generate(400)
+    configs = _configs(seed_rgs)
+    arg = CountingARG(resources)
+    pool = discover_shared(configs, arg)
+
+    assert arg.ids and max(arg.ids.values()) == 1
+    for config in configs:
+        inventory, unresolved = expand_app(config, pool)
+        expected, expected_unresolved = expand(config, SyntheticARG(resources))
+        assert _ids(inventory) == _ids(expected)
+        assert unresolved == expected_unresolved
+
+
+def test_expand_app_stays_in_app_subscriptions():
+    resources, _, seed_rgs = generate(400)
+    config = AppConfig(app="a", subscriptions=[SUBS[0]], seedResourceGroups=seed_rgs, outputDir="a")
+    pool = discover_shared([config], CountingARG(resources))
+    inventory, _ = expand_app(config, pool)
+    assert inventory
+    assert {r["subscriptionId"] for r in inventory} == {SUBS[0]}
+
+
+def test_pool_remembers_unresolved_ids():
+    arg = CountingARG([])
+    pool = ResourcePool(arg)
+    assert pool.fetch(["/subscriptions/x/resourceGroups/rg/providers/a/b/gone"]) == []
+    assert pool.fetch(["/subscriptions/X/resourcegroups/rg/providers/a/b/gone"]) == []
+    assert sum(arg.ids.values()) == 1
+
+
+def test_shared_rbac_queries_once_and_splits_per_app():
+    resources, rbac, seed_rgs = generate(400)
+    configs = _configs(seed_rgs)
+    arg = CountingARG(resources, rbac)
+    pool = discover_shared(configs, arg)
+    inventories = [expand_app(config, pool)[0] for config in configs]
+
+    split = shared_rbac(arg, inventories)
+    assert arg.rbac_calls == 1
+    for inventory, assignments in zip(inventories, split):
+        single = collect_rbac(SyntheticARG(resources, rbac), [inventory])[0]
+        assert assignments and _ids(assignments) == _ids(single)
+        assert any(ra.get("inherited") for ra in assignments)
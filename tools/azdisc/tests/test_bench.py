@@ -0,0 +1,40 @@
+"""Tests for the synthetic tenant generator and the benchmark helpers."""
+import json
+
+from tools.azdisc.bench.extract_ids import legacy_extract_arm_ids, make_resources
+from tools.azdisc.bench.stages import compare
+from tools.azdisc.bench.synth import SyntheticARG, generate
+from tools.azdisc.config import AppConfig
+from tools.azdisc.expand import expand
+from tools.azdisc.util import extract_arm_ids, resource_arm_ids
+
+
+def test_generate_is_deterministic_and_expandable():
+    resources, rbac, seed_rgs = generate(500)
+    assert len(resources) >= 500
+    assert json.dumps(generate(500)) == json.dumps((resources, rbac, seed_rgs))
+    assert rbac and all(ra["properties"]["scope"] for ra in rbac)
+
+    config = AppConfig(app="t", subscriptions=[], seedResourceGroups=seed_rgs, outputDir="")
+    inventory, _ = expand(config, SyntheticARG(resources))
+    # Hub VNets live outside the seed resource groups and are found through peerings
+    assert len(inventory) == len(resources)
+    assert any(r["resourceGroup"] == "rg-network-hub" for r in inventory)
+
+
+def test_compare_flags_regressions():
+    base = {"1000": {"graph": {"seconds": 1.0, "peak_rss_growth_mib": 100.0}}}
+    ok = {"1000": {"graph": {"seconds": 1.4, "peak_rss_growth_mib": 100.0}}}
+    slow = {"1000": {"graph": {"seconds": 1.6, "peak_rss_growth_mib": 100.0}}}
+    tiny = {"1000": {"graph": {"seconds": 0.07, "peak_rss_growth_mib": 7.0}}}
+    assert compare(ok, base, 1.5) == []
+    assert len(compare(slow, base, 1.5)) == 1
+    tiny_base = {"1000": {"graph": {"seconds": 0.01, "peak_rss_growth_mib": 1.0}}}
+    assert compare(tiny, tiny_base, 1.5) == []
+
+
+def test_extractor_matches_recursive_baseline():
+    resources = make_resources(20, 4, 3)
+    for resource in resources:
+        assert extract_arm_ids(resource) == legacy_extract_arm_ids(resource)
+        assert resource_arm_ids(resource) <= extract_arm_ids(resource)
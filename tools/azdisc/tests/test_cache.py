@@ -0,0 +1,85 @@
+"""Tests for tools.azdisc.cache."""
+import json
+import os
+import subprocess
+import time
+
+from tools.azdisc.arg import AzureResourceGraph
+from tools.azdisc.cache import DiskCache, QueryCache
+
+SUB = "00000000-0000-0000-0000-000000000001"
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=350)
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.put(key, b"x" * 100)
+        os.utime(tmp_path / key, (i, i))
+    assert cache.get("a") == b"x" * 100  # touch "a" so "b" is now the oldest
+    cache.put("d", b"y" * 100)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("d") == b"y" * 100
+    assert sum(p.stat().st_size for p in tmp_path.iterdir()) <= 350
+
+
+def test_query_cache_key_normalizes_whitespace():
+    assert QueryCache.key("resources  |\n where x", ["b", "a"]) == QueryCache.key(
+        "resources | where x", ["a", "b"]
+    )
+    assert QueryCache.key("resources", [SUB]) != QueryCache.key("resources", ["other"])
+
+
+def test_query_cache_ttl_and_refresh(tmp_path, monkeypatch):
+    cache = QueryCache(str(tmp_path), ttl=60, max_bytes=10**6)
+    cache.put("q", [SUB], [1, 2])
+    assert cache.get("q", [SUB]) == [1, 2]
+
+    refreshing = QueryCache(str(tmp_path), ttl=60, max_bytes=10**6, refresh=True)
+    assert refreshing.get("q", [SUB]) is None
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.get("q", [SUB]) is None
+
+
+def test_repeat_query_served_from_cache(tmp_path, monkeypatch):
+    calls = []
+
+    def run(cmd, capture_output, text, check):
+        calls.append(cmd)
+        page = 1 if "--skip-token" in cmd else 0
+        data = {"data": [{"page": page}], "skipToken": None if page else "next"}
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(data), stderr="")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    cache = QueryCache(str(tmp_path), ttl=3600, max_bytes=10**6)
+    first = AzureResourceGraph([SUB], cache=cache).query_seed(["rg-test"])
+    second = AzureResourceGraph([SUB], cache=cache).query_seed(["rg-test"])
+    assert first == second == [{"page": 0}, {"page": 1}]
+    assert len(calls) == 2
+
+
+def test_paged_result_is_cached_whole(tmp_path, monkeypatch):
+    calls = []
+
+    def run(cmd, capture_output, text, check):
+        calls.append(cmd)
+        if "--skip-token" in cmd:
+            # Only the token issued by this live sequence is accepted
+            assert cmd[cmd.index("--skip-token") + 1] == f"next-{len(calls) - 1}"
+            data = {"data": [{"page": 1, "run": len(calls)}]}
+        else:
+            data = {"data": [{"page": 0, "run": len(calls)}], "skipToken": f"next-{len(calls)}"}
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(data), stderr="")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    cache = QueryCache(str(tmp_path), ttl=3600, max_bytes=10**6)
+    first = AzureResourceGraph([SUB], cache=cache).query_seed(["rg-test"])
+    assert len(os.listdir(tmp_path)) == 1
+    # An expired entry is re-queried from the first page, never from a stored token
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 3601)
+    second = AzureResourceGraph([SUB], cache=cache).query_seed(["rg-test"])
+    assert [r["run"] for r in first] == [1, 2]
+    assert [r["run"] for r in second] == [3, 4]
@@ -0,0 +1,138 @@
+"""Tests for tools.azdisc.delta."""
+import copy
+import json
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+
+import tools.azdisc.__main__ as cli
+from tools.azdisc.config import AppConfig
+from tools.azdisc.delta import apply_changes, snapshot_usable, utc_timestamp
+from tools.azdisc.expand import expand
+from tools.azdisc.util import normalize_id
+
+SUB = "00000000-0000-0000-0000-000000000001"
+BASE = f"/subscriptions/{SUB}/resourcegroups"
+VM = f"{BASE}/rg-app/providers/microsoft.compute/virtualmachines/vm1"
+NIC = f"{BASE}/rg-app/providers/microsoft.network/networkinterfaces/nic1"
+DISK = f"{BASE}/rg-app/providers/microsoft.compute/disks/disk1"
+NSG = f"{BASE}/rg-hub/providers/microsoft.network/networksecuritygroups/nsg1"
+RT = f"{BASE}/rg-hub/providers/microsoft.network/routetables/rt1"
+KV = f"{BASE}/rg-app/providers/microsoft.keyvault/vaults/kv1"
+
+
+def _res(rid, props=None):
+    return {
+        "id": rid,
+        "name": rid.split("/")[-1],
+        "type": "/".join(rid.split("/")[6:8]),
+        "location": "eastus",
+        "subscriptionId": SUB,
+        "resourceGroup": rid.split("/")[4],
+        "properties": props or {},
+    }
+
+
+class FakeARG:
+    def __init__(self, resources):
+        self.resources = {normalize_id(r["id"]): r for r in resources}
+        self.changes = []
+        self.fetched = []
+
+    def query_seed(self, seed_rgs):
+        return [copy.deepcopy(r) for r in self.resources.values() if r["resourceGroup"] in seed_rgs]
+
+    def query_by_ids(self, ids):
+        self.fetched.extend(ids)
+        return [copy.deepcopy(self.resources[i]) for i in ids if i in self.resources]
+
+    def query_changes(self, since, seed_rgs, ids):
+        return list(self.changes)
+
+
+def _config():
+    return AppConfig(app="t", subscriptions=[SUB], seedResourceGroups=["rg-app"], outputDir="x")
+
+
+def test_apply_changes_matches_full_sweep():
+    arg = FakeARG([
+        _res(VM, {"nic": {"id": NIC}, "disk": {"id": DISK}}),
+        _res(NIC, {"nsg": {"id": NSG}}),
+        _res(DISK),
+        _res(NSG),
+        _res(RT),
+    ])
+    inventory, unresolved = expand(_config(), arg)
+    assert unresolved == []
+
+    # NIC now points at a route table instead of the NSG, the disk is deleted and a
+    # key vault appears in the seed RG.
+    arg.resources[NIC] = _res(NIC, {"rt": {"id": RT}})
+    del arg.resources[DISK]
+    arg.resources[KV] = _res(KV)
+    arg.changes = [
+        {"targetResourceId": NIC, "changeType": "Update", "changeTime": "2026-01-02T00:00:00Z"},
+        {"targetResourceId": DISK, "changeType": "Delete", "changeTime": "2026-01-02T00:00:00Z"},
+        {"targetResourceId": KV, "changeType": "Create", "changeTime": "2026-01-02T00:00:00Z"},
+    ]
+    arg.fetched = []
+    patched, patched_unresolved, changed = apply_changes(_config(), arg, inventory, unresolved, "t")
+
+    full_inventory, full_unresolved = expand(_config(), FakeARG(list(arg.resources.values())))
+    assert changed == 3
+    assert sorted(r["id"] for r in patched) == sorted(r["id"] for r in full_inventory)
+    assert patched_unresolved == full_unresolved == [DISK]
+    assert NSG not in {r["id"] for r in patched}
+    assert sorted(arg.fetched) == sorted([KV, NIC, RT])
+
+
+def test_apply_changes_without_changes_is_noop():
+    arg = FakeARG([_res(VM)])
+    inventory, unresolved = expand(_config(), arg)
+    assert apply_changes(_config(), arg, inventory, unresolved, "t") == (inventory, unresolved, 0)
+
+
+def test_snapshot_usable():
+    now = datetime(2026, 10, 16, tzinfo=timezone.utc)
+    assert snapshot_usable(utc_timestamp(now - timedelta(days=1)), now)
+    assert not snapshot_usable(utc_timestamp(now - timedelta(days=20)), now)
+    assert not snapshot_usable(None, now)
+    assert not snapshot_usable("garbage", now)
+
+
+def test_snapshot_time_covers_cached_results(tmp_path, monkeypatch):
+    out_dir = str(tmp_path)
+    config = AppConfig(
+        app="a", subscriptions=[SUB], seedResourceGroups=["rg-app"], outputDir=out_dir
+    )
+    vm = _res(VM, {"networkProfile": {"networkInterfaces": [{"id": NIC}]}})
+    live = []
+
+    def run(cmd, capture_output, text, check):
+        live.append(cmd)
+        query = " ".join(cmd)
+        rows = [_res(NIC)] if "where id in~" in query else [vm]
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps({"data": rows}), stderr="")
+
+    def stamp():
+        return json.loads((tmp_path / "snapshot.json").read_text())["timestamp"]
+
+    monkeypatch.setattr(subprocess, "run", run)
+    cached_at = time.time() - 600
+    with monkeypatch.context() as m:
+        m.setattr(time, "time", lambda: cached_at)
+        cli.cmd_discover(config, out_dir)
+        cli.cmd_expand(config, out_dir)
+    assert len(live) == 2
+    cached = utc_timestamp(datetime.fromtimestamp(cached_at, timezone.utc))
+
+    cli.cmd_discover(config, out_dir)
+    assert len(live) == 2
+    assert stamp() == cached
+
+    # A live seed is stamped now, but the expansion came from the cache
+    cli.cmd_discover(config, out_dir, refresh=True)
+    assert stamp() > cached
+    cli.cmd_expand(config, out_dir)
+    assert len(live) == 3
+    assert stamp() == cached
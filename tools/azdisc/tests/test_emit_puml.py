@@ -0,0 +1,119 @@
+"""Tests for tools.azdisc.emit_puml."""
+import os
+
+from tools.azdisc.emit_puml import (
+    build_aliases,
+    emit,
+    emit_diagrams,
+    list_diagrams,
+    partition_file,
+    partition_nodes,
+)
+
+SUB = "00000000-0000-0000-0000-000000000001"
+RG_A = f"/subscriptions/{SUB}/resourcegroups/rg-a/providers"
+RG_B = f"/subscriptions/{SUB}/resourcegroups/rg-b/providers"
+VNET_A = f"{RG_A}/microsoft.network/virtualnetworks/vnet-a"
+SUBNET_A = VNET_A + "/subnets/default"
+VNET_B = f"{RG_B}/microsoft.network/virtualnetworks/vnet-b"
+NIC_A = f"{RG_A}/microsoft.network/networkinterfaces/nic-a"
+KV_B = f"{RG_B}/microsoft.keyvault/vaults/kv-b"
+
+
+def _node(nid, ntype, rg):
+    return {
+        "id": nid, "name": nid.split("/")[-1], "type": ntype, "location": "eastus",
+        "resourceGroup": rg, "subscriptionId": SUB, "isExternal": False,
+    }
+
+
+def _graph():
+    nodes = [
+        _node(KV_B, "microsoft.keyvault/vaults", "rg-b"),
+        _node(NIC_A, "microsoft.network/networkinterfaces", "rg-a"),
+        _node(VNET_A, "microsoft.network/virtualnetworks", "rg-a"),
+        _node(SUBNET_A, "", ""),
+        _node(VNET_B, "microsoft.network/virtualnetworks", "rg-b"),
+    ]
+    edges = [
+        {"src": NIC_A, "dst": KV_B, "kind": "dependency"},
+        {"src": NIC_A, "dst": SUBNET_A, "kind": "dependency"},
+        {"src": SUBNET_A, "dst": VNET_A, "kind": "dependency"},
+        {"src": VNET_A, "dst": VNET_B, "kind": "dependency"},
+    ]
+    return {"nodes": sorted(nodes, key=lambda n: n["id"]), "edges": edges}
+
+
+def test_partition_modes():
+    graph = _graph()
+    by_rg = partition_nodes(graph, "resourceGroup")
+    # Subnet has no resourceGroup field; it is taken from the id
+    assert by_rg[SUBNET_A] == by_rg[NIC_A] == "rg-a (00000000)"
+    assert by_rg[KV_B] == "rg-b (00000000)"
+    assert set(partition_nodes(graph, "subscription").values()) == {SUB}
+
+    by_vnet = partition_nodes(graph, "vnet")
+    # Peering does not merge VNets; the key vault is reached through the NIC
+    assert by_vnet[NIC_A] == by_vnet[KV_B] == by_vnet[SUBNET_A] == "vnet-a"
+    assert by_vnet[VNET_B] == "vnet-b"
+
+
+def test_emit_diagrams_partitioned(tmp_path):
+    out = str(tmp_path)
+    paths = emit_diagrams(_graph(), out, "resourceGroup")
+    assert paths == list_diagrams(out)
+    assert len(paths) == 3
+
+    overview = open(paths[0], encoding="utf-8").read()
+    a, b = "p_" + partition_file("rg-a (00000000)"), "p_" + partition_file("rg-b (00000000)")
+    assert f'"rg-a (00000000)\\n3 resources" as {a}' in overview
+    assert f"{a} --> {b} : 2" in overview
+
+    alias = build_aliases(n["id"] for n in _graph()["nodes"])
+    part_a = open(os.path.join(out, "diagrams", partition_file("rg-a (00000000)") + ".puml"),
+                  encoding="utf-8").read()
+    assert '<<stub>>' in part_a and f'"kv-b" as {alias[KV_B]} #line.dashed' in part_a
+    assert f"{alias[NIC_A]} ..> {alias[KV_B]}" in part_a
+    assert f"{alias[NIC_A]} --> {alias[SUBNET_A]}" in part_a
+
+    # Switching back to a single diagram removes the partition files
+    assert emit_diagrams(_graph(), out, "none") == [paths[0]]
+    assert list_diagrams(out) == [paths[0]]
+    emit(_graph(), str(tmp_path / "single.puml"))
+    assert open(paths[0]).read() == open(tmp_path / "single.puml").read()
+
+
+def test_aliases_unique_and_stable():
+    long_rg = "rg-" + "x" * 80
+    ids = [
+        f"/subscriptions/{SUB}/resourcegroups/{long_rg}/providers/microsoft.compute/virtualmachines/vm",
+        f"/subscriptions/{SUB}/resourcegroups/{long_rg}2/providers/microsoft.compute/virtualmachines/vm",
+        f"/subscriptions/{SUB}/resourcegroups/rg/providers/microsoft.compute/virtualmachines/vm-1",
+        f"/subscriptions/{SUB}/resourcegroups/rg/providers/microsoft.compute/virtualmachines/vm.1",
+        KV_B,
+    ]
+    aliases = build_aliases(ids)
+    assert len(set(aliases.values())) == len(ids)
+    assert aliases[KV_B] == "vaults_kv_b"
+    assert aliases == build_aliases(reversed(ids))
+
+
+def test_emit_streams_edges(tmp_path):
+    graph = _graph()
+    graph["edges"] = iter(graph["edges"])
+    path = tmp_path / "diagram.puml"
+    emit(graph, str(path))
+    text = path.read_text()
+    assert text.startswith("@startuml\n") and text.endswith("\n\n@enduml\n")
+    assert "networkinterfaces_nic_a --> vaults_kv_b" in text
+
+
+def test_edges_to_unknown_ids_are_skipped(tmp_path):
+    graph = _graph()
+    graph["edges"].append({"src": NIC_A, "dst": "", "kind": "dependency"})
+    graph["edges"].append({"src": "/subscriptions/x/gone", "dst": VNET_B, "kind": "dependency"})
+    emit(graph, str(tmp_path / "dangling.puml"))
+    emit(_graph(), str(tmp_path / "clean.puml"))
+    assert (tmp_path / "dangling.puml").read_text() == (tmp_path / "clean.puml").read_text()
+    for mode in ("resourceGroup", "subscription", "vnet"):
+        assert emit_diagrams(graph, str(tmp_path / mode), mode)
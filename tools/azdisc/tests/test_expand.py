@@ -0,0 +1,145 @@
+"""Tests for tools.azdisc.expand."""
+import json
+import os
+
+from tools.azdisc.bench.synth import SyntheticARG, generate
+from tools.azdisc.config import AppConfig
+from tools.azdisc.expand import MAX_ITERATIONS, expand
+from tools.azdisc.util import extract_arm_ids, normalize_id, resource_arm_ids
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+SUB = "00000000-0000-0000-0000-000000000001"
+MISSING_ID = (
+    f"/subscriptions/{SUB}/resourcegroups/rg-gone/providers/"
+    "microsoft.network/routetables/rt-deleted"
+)
+
+
+def load_resources():
+    with open(os.path.join(FIXTURES_DIR, "sample_resources.json"), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+class FakeARG:
+    """In-memory stand-in for AzureResourceGraph serving a fixed resource pool."""
+
+    def __init__(self, resources, seed_types):
+        self.resources = {normalize_id(r["id"]): r for r in resources}
+        self.seed_types = seed_types
+
+    def query_seed(self, seed_rgs):
+        return [
+            json.loads(json.dumps(r))
+            for r in self.resources.values()
+            if r["type"] in self.seed_types
+        ]
+
+    def query_by_ids(self, ids):
+        return [
+            json.loads(json.dumps(self.resources[normalize_id(i)]))
+            for i in sorted(ids)
+            if normalize_id(i) in self.resources
+        ]
+
+
+def _legacy_expand(config, arg):
+    """The original full-rescan expansion loop, kept as an oracle."""
+    inventory = arg.query_seed(config.seedResourceGroups)
+    collected_ids = {normalize_id(r["id"]) for r in inventory}
+    unresolved = set()
+    for _ in range(MAX_ITERATIONS):
+        all_referenced = set()
+        for resource in inventory:
+            all_referenced |= extract_arm_ids(resource)
+        missing = all_referenced - collected_ids - unresolved
+        if not missing:
+            break
+        fetched = arg.query_by_ids(sorted(missing))
+        fetched_ids = {normalize_id(r["id"]) for r in fetched}
+        unresolved |= missing - fetched_ids
+        inventory.extend(fetched)
+        collected_ids |= fetched_ids
+    return inventory, sorted(unresolved)
+
+
+def _pool():
+    resources = load_resources()
+    # Reference an ID that ARG cannot resolve
+    resources[1]["properties"]["routeTable"] = {"id": MISSING_ID}
+    return resources
+
+
+def _config():
+    return AppConfig(
+        app="test",
+        subscriptions=[SUB],
+        seedResourceGroups=["rg-test"],
+        outputDir="unused",
+    )
+
+
+def _dump(data):
+    return json.dumps(data, indent=2, sort_keys=True)
+
+
+def test_expand_matches_full_rescan():
+    seed_types = {"microsoft.compute/virtualmachines"}
+    inventory, unresolved = expand(_config(), FakeARG(_pool(), seed_types))
+    legacy_inventory, legacy_unresolved = _legacy_expand(_config(), FakeARG(_pool(), seed_types))
+
+    assert _dump(inventory) == _dump(legacy_inventory)
+    assert _dump(unresolved) == _dump(legacy_unresolved)
+    assert MISSING_ID in unresolved
+    assert len(inventory) == 4
+
+
+def test_expand_scans_each_resource_once():
+    seed_types = {"microsoft.compute/virtualmachines"}
+    stats = {}
+    ref_index = {}
+    inventory, _ = expand(_config(), FakeARG(_pool(), seed_types), ref_index=ref_index, stats=stats)
+
+    per_resource = []
+    for resource in inventory:
+        counter = [0]
+        resource_arm_ids(resource, counter)
+        per_resource.append(counter[0])
+
+    visited = stats["nodes_visited"]
+    assert visited[0] == per_resource[0]
+    assert sum(visited) == sum(per_resource)
+    assert set(ref_index) == {normalize_id(r["id"]) for r in inventory}
+
+
+def test_expand_converges_without_references():
+    seed_types = {"microsoft.compute/disks"}
+    stats = {}
+    inventory, unresolved = expand(_config(), FakeARG(_pool(), seed_types), stats=stats)
+    assert len(inventory) == 1
+    assert unresolved == []
+    assert len(stats["nodes_visited"]) == 1
+
+
+def test_multihop_seed_saves_id_rounds():
+    resources, _, seed_rgs = generate(300)
+    calls = []
+
+    class CountingARG(SyntheticARG):
+        def query_by_ids(self, ids):
+            calls.append(ids)
+            return super().query_by_ids(ids)
+
+    plain = AppConfig(app="t", subscriptions=[], seedResourceGroups=seed_rgs, outputDir="o")
+    multihop = AppConfig(
+        app="t", subscriptions=[], seedResourceGroups=seed_rgs, outputDir="o", multiHopSeed=True
+    )
+    expected, expected_unresolved = expand(plain, CountingARG(resources))
+    plain_rounds = len(calls)
+    del calls[:]
+    inventory, unresolved = expand(multihop, CountingARG(resources))
+    # Only the round asking for (unresolvable) subnet IDs is left
+    assert len(calls) == 1 < plain_rounds
+    assert sorted(normalize_id(r["id"]) for r in inventory) == sorted(
+        normalize_id(r["id"]) for r in expected
+    )
+    assert unresolved == expected_unresolved
@@ -3,7 +3,7 @@ import json
 import os
 import pytest
 
-from tools.azdisc.graph import build_graph
+from tools.azdisc.graph import build_compact_graph, build_compact_graph_parallel, build_graph
 from tools.azdisc.util import normalize_id
 
 FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
@@ -77,3 +77,134 @@ def test_external_nodes_created(graph):
     for edge in graph["edges"]:
         assert edge["src"] in node_ids, f"src not in nodes: {edge['src']}"
         assert edge["dst"] in node_ids, f"dst not in nodes: {edge['dst']}"
+
+
+def _res(rid, rtype, props):
+    return {
+        "id": rid,
+        "name": rid.split("/")[-1],
+        "type": rtype,
+        "location": "eastus",
+        "subscriptionId": SUB,
+        "resourceGroup": "rg-test",
+        "properties": props,
+    }
+
+
+RG = f"/subscriptions/{SUB}/resourcegroups/rg-test/providers"
+PIP_ID = f"{RG}/microsoft.network/publicipaddresses/pip"
+LB_ID = f"{RG}/microsoft.network/loadbalancers/lb"
+PE_ID = f"{RG}/microsoft.network/privateendpoints/pe"
+KV_ID = f"{RG}/microsoft.keyvault/vaults/kv"
+RT_ID = f"{RG}/microsoft.network/routetables/rt"
+PEER_ID = f"{RG}/microsoft.network/virtualnetworks/vnet-peer"
+AKS_ID = f"{RG}/microsoft.containerservice/managedclusters/aks"
+APPGW_ID = f"{RG}/microsoft.network/applicationgateways/agw"
+SITE_ID = f"{RG}/microsoft.web/sites/app"
+PLAN_ID = f"{RG}/microsoft.web/serverfarms/plan"
+NIC_CFG = NIC_ID + "/ipconfigurations/ipconfig1"
+
+
+def _rule_inventory():
+    return [
+        _res(PIP_ID, "microsoft.network/publicipaddresses", {"ipConfiguration": {"id": NIC_CFG}}),
+        _res(LB_ID, "microsoft.network/loadbalancers", {
+            "backendAddressPools": [
+                {"properties": {"backendIPConfigurations": [{"id": NIC_CFG}]}},
+                {"properties": None},
+            ]
+        }),
+        _res(PE_ID, "microsoft.network/privateendpoints", {
+            "subnet": {"id": SUBNET_ID},
+            "privateLinkServiceConnections": [{"properties": {"privateLinkServiceId": KV_ID}}],
+        }),
+        _res(SUBNET_ID, "microsoft.network/virtualnetworks/subnets", {"routeTable": {"id": RT_ID}}),
+        _res(VNET_ID, "microsoft.network/virtualnetworks", {
+            "virtualNetworkPeerings": [{"properties": {"remoteVirtualNetwork": {"id": PEER_ID}}}],
+            "subnets": [{"id": SUBNET_ID + "2", "properties": {"networkSecurityGroup": {"id": NSG_ID}}}],
+        }),
+        _res(AKS_ID, "microsoft.containerservice/managedclusters", {
+            "agentPoolProfiles": [{"vnetSubnetID": SUBNET_ID}, {"name": "no-subnet"}],
+        }),
+        _res(APPGW_ID, "microsoft.network/applicationgateways", {
+            "gatewayIPConfigurations": [{"properties": {"subnet": {"id": SUBNET_ID}}}],
+            "frontendIPConfigurations": [{"properties": {"publicIPAddress": {"id": PIP_ID}}}],
+        }),
+        _res(SITE_ID, "microsoft.web/sites", {
+            "serverFarmId": PLAN_ID,
+            "virtualNetworkSubnetId": SUBNET_ID,
+        }),
+    ]
+
+
+def test_edge_rules():
+    graph = build_graph(_rule_inventory(), [])
+    edges = {(e["src"], e["dst"]) for e in graph["edges"]}
+    assert edges == {
+        (PIP_ID, NIC_ID),
+        (LB_ID, NIC_ID),
+        (PE_ID, SUBNET_ID),
+        (PE_ID, KV_ID),
+        (SUBNET_ID, VNET_ID),
+        (SUBNET_ID, RT_ID),
+        (VNET_ID, PEER_ID),
+        (SUBNET_ID + "2", VNET_ID),
+        (SUBNET_ID + "2", NSG_ID),
+        (AKS_ID, SUBNET_ID),
+        (APPGW_ID, SUBNET_ID),
+        (APPGW_ID, PIP_ID),
+        (SITE_ID, PLAN_ID),
+        (SITE_ID, SUBNET_ID),
+    }
+    nodes = {n["id"]: n for n in graph["nodes"]}
+    assert nodes[SUBNET_ID + "2"]["type"] == "microsoft.network/virtualnetworks/subnets"
+    assert nodes[KV_ID]["isExternal"] is True
+
+
+def test_compact_graph_interning():
+    resources = load_resources()
+    rbac = [{
+        "id": "/providers/microsoft.authorization/roleassignments/ra1",
+        "name": "ra1",
+        "type": "microsoft.authorization/roleassignments",
+        "properties": {"scope": VM_ID},
+    }]
+    compact = build_compact_graph(resources + resources, rbac)
+    assert len(compact.ids) == len(set(compact.ids))
+    assert compact.kinds == ["dependency", "rbac_assignment"]
+    assert compact.src.typecode == "I" and compact.kind.typecode == "B"
+
+    graph = compact.to_dict()
+    assert graph == build_graph(resources, rbac)
+    assert graph["nodes"] == list(compact.iter_node_dicts())
+    assert graph["nodes"] == sorted(graph["nodes"], key=lambda n: n["id"])
+    assert compact.node_count() == len(graph["nodes"])
+    keys = [(e["src"], e["dst"], e["kind"]) for e in graph["edges"]]
+    assert keys == sorted(set(keys))
+    assert (VM_ID, "/providers/microsoft.authorization/roleassignments/ra1", "rbac_assignment") in keys
+
+
+def test_parallel_build_matches_serial():
+    # Placeholders and embedded subnets seen before the real resource, plus a
+    # duplicate, spread over several shards.
+    inventory = list(reversed(_rule_inventory())) + load_resources() + _rule_inventory()[:2]
+    inventory.insert(3, json.dumps(inventory[0]))  # NDJSON lines are accepted too
+    rbac = [{
+        "id": "/providers/microsoft.authorization/roleassignments/ra1",
+        "name": "ra1",
+        "type": "microsoft.authorization/roleassignments",
+        "properties": {"scope": SUBNET_ID},
+    }]
+    serial = build_compact_graph([r if isinstance(r, dict) else json.loads(r) for r in inventory], rbac)
+    parallel = build_compact_graph_parallel(inventory, rbac, workers=2, shard_size=2)
+    assert json.dumps(parallel.to_dict(), sort_keys=True) == json.dumps(serial.to_dict(), sort_keys=True)
+
+
+def test_blank_and_self_references_add_no_edges():
+    resources = load_resources()
+    nic = next(r for r in resources if normalize_id(r["id"]) == NIC_ID)
+    nic["properties"]["ipConfigurations"][0]["properties"]["subnet"]["id"] = "  "
+    nic["properties"]["networkSecurityGroup"] = {"id": "  " + nic["id"].upper()}
+    graph = build_graph(resources, [])
+    assert "" not in {n["id"] for n in graph["nodes"]}
+    assert not [e for e in graph["edges"] if e["src"] == NIC_ID]
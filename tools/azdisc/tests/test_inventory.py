@@ -0,0 +1,70 @@
+"""Tests for tools.azdisc.inventory."""
+import io
+import json
+import os
+
+import pytest
+
+import tools.azdisc.inventory as inventory_mod
+from tools.azdisc.docs import write_catalog
+from tools.azdisc.graph import build_graph
+from tools.azdisc.inventory import (
+    INVENTORY_JSON,
+    INVENTORY_NDJSON,
+    iter_inventory,
+    iter_json_array,
+    load_inventory,
+    write_inventory,
+)
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_resources():
+    with open(os.path.join(FIXTURES_DIR, "sample_resources.json"), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+@pytest.mark.parametrize("read_size", [1, 7, 1 << 20])
+def test_iter_json_array_matches_json_load(monkeypatch, read_size):
+    monkeypatch.setattr(inventory_mod, "_READ_SIZE", read_size)
+    text = json.dumps(load_resources() + [123, "x", [1, 2], None], indent=2)
+    assert list(iter_json_array(io.StringIO(text))) == json.loads(text)
+    assert list(iter_json_array(io.StringIO("[]"))) == []
+
+
+def test_iter_json_array_rejects_truncated():
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"a": 1}, {"b"')))
+
+
+@pytest.mark.parametrize("fmt", ["json", "ndjson"])
+def test_inventory_round_trip(tmp_path, fmt):
+    resources = load_resources()
+    write_inventory(str(tmp_path), resources, fmt)
+    assert load_inventory(str(tmp_path)) == resources
+
+
+def test_switching_format_removes_stale_file(tmp_path):
+    resources = load_resources()
+    write_inventory(str(tmp_path), resources, "ndjson")
+    lines = (tmp_path / INVENTORY_NDJSON).read_text().splitlines()
+    assert len(lines) == len(resources)
+    assert json.loads(lines[0]) == resources[0]
+
+    write_inventory(str(tmp_path), resources[:2], "json")
+    assert not (tmp_path / INVENTORY_NDJSON).exists()
+    assert len(load_inventory(str(tmp_path))) == 2
+
+
+def test_graph_and_catalog_consume_stream(tmp_path):
+    resources = load_resources()
+    write_inventory(str(tmp_path), resources, "ndjson")
+    assert build_graph(iter_inventory(str(tmp_path)), []) == build_graph(resources, [])
+
+    write_catalog(resources, str(tmp_path / "list"))
+    write_catalog(iter_inventory(str(tmp_path)), str(tmp_path / "stream"))
+    assert (tmp_path / "list" / "catalog.md").read_text() == (
+        tmp_path / "stream" / "catalog.md"
+    ).read_text()
+    assert f"**{len(resources)}**" in (tmp_path / "stream" / "catalog.md").read_text()
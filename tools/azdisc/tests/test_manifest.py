@@ -0,0 +1,126 @@
+"""Tests for tools.azdisc.manifest and incremental `run`."""
+import os
+
+import tools.azdisc.__main__ as cli
+from tools.azdisc.config import AppConfig
+from tools.azdisc.manifest import Manifest
+
+STAGE_OUTPUTS = {
+    "discover": ["seed.json"],
+    "expand": ["inventory.json", "unresolved.json", "rbac.json"],
+    "graph": ["graph.json"],
+    "puml": ["diagram.puml"],
+    "render": ["diagram.svg"],
+    "docs": ["catalog.md", "edges.md"],
+}
+
+
+def test_manifest_freshness(tmp_path):
+    out = tmp_path / "a.json"
+    out.write_text("1")
+    manifest = Manifest(str(tmp_path))
+    fp = manifest.fingerprint({"x": 1})
+    assert not manifest.is_fresh("s", fp, [str(out)])
+    manifest.record("s", fp, [str(out)])
+
+    reloaded = Manifest(str(tmp_path))
+    assert reloaded.is_fresh("s", fp, [str(out)])
+    assert not reloaded.is_fresh("s", reloaded.fingerprint({"x": 2}), [str(out)])
+    out.write_text("2")
+    assert not Manifest(str(tmp_path)).is_fresh("s", fp, [str(out)])
+
+
+def _stub_stages(monkeypatch, out_dir, calls, contents):
+    def stub(stage):
+        def run(*args, **kwargs):
+            calls.append(stage)
+            for name in STAGE_OUTPUTS[stage]:
+                with open(os.path.join(out_dir, name), "w", encoding="utf-8") as fh:
+                    fh.write(contents.get(name, stage))
+        return run
+
+    for stage in STAGE_OUTPUTS:
+        monkeypatch.setattr(cli, f"cmd_{stage}", stub(stage))
+
+
+def test_run_skips_unchanged_stages(tmp_path, monkeypatch):
+    out_dir = str(tmp_path)
+    config = AppConfig(app="t", subscriptions=["s"], seedResourceGroups=["rg"], outputDir=out_dir)
+    calls, contents = [], {}
+    _stub_stages(monkeypatch, out_dir, calls, contents)
+
+    cli.cmd_run(config, out_dir)
+    assert calls == list(STAGE_OUTPUTS)
+
+    calls.clear()
+    cli.cmd_run(config, out_dir, offline=True)
+    cli.cmd_run(config, out_dir, offline=True)
+    assert calls == ["discover", "expand"]
+
+    # A stale graph.json is rebuilt; consumers re-run only if its content changed
+    calls.clear()
+    (tmp_path / "graph.json").write_text("edited")
+    cli.cmd_run(config, out_dir, offline=True)
+    assert calls == ["graph"]
+
+    calls.clear()
+    contents["graph.json"] = "graph v2"
+    (tmp_path / "graph.json").write_text("edited")
+    cli.cmd_run(config, out_dir, offline=True)
+    # diagram.puml came out identical, so the JVM is not touched
+    assert calls == ["graph", "puml", "docs"]
+
+    calls.clear()
+    cli.cmd_run(config, out_dir, force=True)
+    assert calls == list(STAGE_OUTPUTS)
+
+
+def test_run_requeries_azure_by_default(tmp_path, monkeypatch):
+    out_dir = str(tmp_path)
+    config = AppConfig(app="t", subscriptions=["s"], seedResourceGroups=["rg"], outputDir=out_dir)
+    calls, contents = [], {}
+    _stub_stages(monkeypatch, out_dir, calls, contents)
+    cli.cmd_run(config, out_dir)
+
+    calls.clear()
+    cli.cmd_run(config, out_dir)
+    # Azure did not change, so the local stages are still skipped
+    assert calls == ["discover", "expand"]
+
+    calls.clear()
+    contents["inventory.json"] = "inventory v2"
+    cli.cmd_run(config, out_dir)
+    assert calls == ["discover", "expand", "graph", "docs"]
+
+
+def test_run_reruns_diagram_stages_for_missing_partition_files(tmp_path, monkeypatch):
+    out_dir = str(tmp_path)
+    config = AppConfig(app="t", subscriptions=["s"], seedResourceGroups=["rg"], outputDir=out_dir)
+    calls = []
+    _stub_stages(monkeypatch, out_dir, calls, {})
+    part = tmp_path / "diagrams" / "part.puml"
+
+    def puml(*args, **kwargs):
+        calls.append("puml")
+        (tmp_path / "diagram.puml").write_text("overview")
+        part.parent.mkdir(exist_ok=True)
+        part.write_text("part")
+
+    def render(*args, **kwargs):
+        calls.append("render")
+        for p in (tmp_path / "diagram.puml", part):
+            p.with_suffix(".svg").write_text("svg")
+
+    monkeypatch.setattr(cli, "cmd_puml", puml)
+    monkeypatch.setattr(cli, "cmd_render", render)
+    cli.cmd_run(config, out_dir, offline=True)
+    calls.clear()
+    part.with_suffix(".svg").unlink()
+    cli.cmd_run(config, out_dir, offline=True)
+    assert calls == ["render"]
+
+    calls.clear()
+    part.unlink()
+    cli.cmd_run(config, out_dir, offline=True)
+    # The rewritten partition is identical, so its SVG is still current
+    assert calls == ["puml"]
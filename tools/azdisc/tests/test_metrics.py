@@ -0,0 +1,59 @@
+"""Tests for tools.azdisc.metrics."""
+import json
+import os
+import pstats
+import subprocess
+
+from tools.azdisc import metrics
+from tools.azdisc.arg import AzureResourceGraph
+from tools.azdisc.bench.synth import SyntheticARG, generate
+from tools.azdisc.config import AppConfig
+from tools.azdisc.expand import expand
+
+
+def test_inactive_is_noop(monkeypatch):
+    monkeypatch.setattr(metrics, "_active", None)
+    metrics.incr("pages")
+    with metrics.stage("graph") as record:
+        assert record is None
+
+
+def test_stage_records_counters_and_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "_active", None)
+    collector = metrics.Metrics(profile_dir=str(tmp_path / "profile")).activate()
+    resources, _, seed_rgs = generate(300)
+    config = AppConfig(app="t", subscriptions=[], seedResourceGroups=seed_rgs, outputDir="")
+
+    metrics.skip("discover")
+    with metrics.stage("expand"):
+        expand(config, SyntheticARG(resources))
+    metrics.incr("outside a stage")
+
+    skipped, record = collector.to_dict()["stages"]
+    assert skipped == {"stage": "discover", "skipped": True}
+    assert record["stage"] == "expand"
+    counters = record["counters"]
+    assert counters["expand_iterations"] == len(counters["frontier_sizes"]) >= 1
+    assert all(n > 0 for n in counters["frontier_sizes"])
+    for key in ("wall_seconds", "cpu_seconds", "child_cpu_seconds", "peak_rss_mib"):
+        assert record[key] >= 0
+    stats = pstats.Stats(str(tmp_path / "profile" / "expand.pstats"))
+    assert any(func[2] == "follow_references" for func in stats.stats)
+    assert not os.path.exists(tmp_path / "profile" / "discover.pstats")
+
+
+def test_arg_counters(monkeypatch):
+    def run(cmd, capture_output, text, check):
+        page = {"data": [{"id": "/subscriptions/s/x"}]}
+        if "--skip-token" not in cmd:
+            page["skipToken"] = "t1"
+        return subprocess.CompletedProcess(cmd, 0, stdout=json.dumps(page), stderr="")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    monkeypatch.setattr(metrics, "_active", None)
+    collector = metrics.Metrics().activate()
+    with metrics.stage("discover"):
+        AzureResourceGraph(["s"]).query_seed(["rg"])
+    counters = collector.stages[0]["counters"]
+    assert counters["az_graph_query_calls"] == counters["pages"] == 2
+    assert counters["bytes_received"] > 0
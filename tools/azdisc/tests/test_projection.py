@@ -0,0 +1,191 @@
+"""Tests for tools.azdisc.projection."""
+import json
+import os
+import subprocess
+
+from tools.azdisc.arg import AzureResourceGraph
+from tools.azdisc.bench.synth import generate
+from tools.azdisc.graph import build_graph
+from tools.azdisc.projection import PROJECTED_TYPES, project_properties, properties_kql
+from tools.azdisc.util import extract_arm_ids
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+SUB = "00000000-0000-0000-0000-000000000001"
+RG = f"/subscriptions/{SUB}/resourceGroups/rg"
+NET = f"{RG}/providers/Microsoft.Network"
+
+
+def load_resources():
+    with open(os.path.join(FIXTURES_DIR, "sample_resources.json"), encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _bulky_vm():
+    vm = next(r for r in load_resources() if r["type"] == "microsoft.compute/virtualmachines")
+    vm = json.loads(json.dumps(vm))
+    vm["properties"].update({
+        "osProfile": {"customData": "x" * 4096, "linuxConfiguration": {"ssh": {"publicKeys": []}}},
+        "instanceView": {"statuses": [{"code": f"PowerState/{i}"} for i in range(50)]},
+        "availabilitySet": {"id": f"/subscriptions/{SUB}/resourceGroups/rg/providers/"
+                                  "Microsoft.Compute/availabilitySets/avset"},
+    })
+    return vm
+
+
+def _ref(path):
+    return {"id": f"{RG}/providers/{path}"}
+
+
+def _pec():
+    return [{"id": f"{RG}/providers/Microsoft.Web/sites/app/privateEndpointConnections/pec",
+             "properties": {"privateEndpoint": {"id": f"{NET}/privateEndpoints/pe"}}}]
+
+
+def _realistic():
+    """Documents shaped like real ARG rows, with references outside the edge rule paths."""
+    lb = f"{NET}/loadBalancers/lb"
+    gw = f"{NET}/applicationGateways/gw"
+    subnet = f"{NET}/virtualNetworks/vnet/subnets/default"
+    docs = {
+        "microsoft.compute/virtualmachines": {
+            "hardwareProfile": {"vmSize": "Standard_D2s_v3"},
+            "storageProfile": {
+                "imageReference": _ref("Microsoft.Compute/galleries/g/images/img/versions/1.0.0"),
+                "osDisk": {"managedDisk": {
+                    "id": f"{RG}/providers/Microsoft.Compute/disks/os",
+                    "diskEncryptionSet": _ref("Microsoft.Compute/diskEncryptionSets/des"),
+                }},
+                "dataDisks": [{"lun": 0, "managedDisk": _ref("Microsoft.Compute/disks/data0")}],
+            },
+            "osProfile": {
+                "customData": "x" * 2048,
+                "secrets": [{"sourceVault": _ref("Microsoft.KeyVault/vaults/kv"),
+                             "vaultCertificates": [{"certificateUrl": "https://kv/x"}]}],
+            },
+            "networkProfile": {"networkInterfaces": [_ref("Microsoft.Network/networkInterfaces/nic")]},
+            "applicationProfile": {"galleryApplications": [{
+                "packageReferenceId": f"{RG}/providers/Microsoft.Compute/galleries/g/applications/a/versions/1",
+            }]},
+            "availabilitySet": _ref("Microsoft.Compute/availabilitySets/avset"),
+            "diagnosticsProfile": {"bootDiagnostics": {"enabled": True}},
+        },
+        "microsoft.containerservice/managedclusters": {
+            "agentPoolProfiles": [{"name": "sys", "vnetSubnetID": subnet}],
+            "addonProfiles": {
+                "omsagent": {"config": {"logAnalyticsWorkspaceResourceID":
+                    f"{RG}/providers/Microsoft.OperationalInsights/workspaces/law"}},
+                "azureKeyvaultSecretsProvider": {"identity": {"resourceId":
+                    f"{RG}/providers/Microsoft.ManagedIdentity/userAssignedIdentities/kvp"}},
+            },
+            "networkProfile": {"loadBalancerProfile": {
+                "outboundIPs": {"publicIPs": [_ref("Microsoft.Network/publicIPAddresses/out")]},
+                "effectiveOutboundIPs": [_ref("Microsoft.Network/publicIPAddresses/out")],
+            }},
+            "identityProfile": {"kubeletidentity": {"resourceId":
+                f"{RG}/providers/Microsoft.ManagedIdentity/userAssignedIdentities/kubelet"}},
+            "diskEncryptionSetID": f"{RG}/providers/Microsoft.Compute/diskEncryptionSets/des",
+            "privateEndpointConnections": _pec(),
+            "kubernetesVersion": "1.29.0",
+        },
+        "microsoft.web/sites": {
+            "serverFarmId": f"{RG}/providers/Microsoft.Web/serverfarms/plan",
+            "virtualNetworkSubnetId": subnet,
+            "keyVaultReferenceIdentity":
+                f"{RG}/providers/Microsoft.ManagedIdentity/userAssignedIdentities/kvref",
+            "privateEndpointConnections": _pec(),
+            "hostNames": ["app.azurewebsites.net"],
+        },
+        "microsoft.network/loadbalancers": {
+            "frontendIPConfigurations": [{"id": f"{lb}/frontendIPConfigurations/fe", "properties": {
+                "publicIPAddress": _ref("Microsoft.Network/publicIPAddresses/lb-pip")}}],
+            "backendAddressPools": [{"id": f"{lb}/backendAddressPools/be"}],
+            "loadBalancingRules": [{"properties": {
+                "frontendIPConfiguration": {"id": f"{lb}/frontendIPConfigurations/fe"},
+                "probe": {"id": f"{lb}/probes/p"}}}],
+            "outboundRules": [{"properties": {"backendAddressPool": {"id": f"{lb}/backendAddressPools/be"}}}],
+        },
+        "microsoft.network/applicationgateways": {
+            "gatewayIPConfigurations": [{"properties": {"subnet": {"id": subnet}}}],
+            "httpListeners": [{"properties": {
+                "frontendPort": {"id": f"{gw}/frontendPorts/443"},
+                "sslCertificate": {"id": f"{gw}/sslCertificates/cert"}}}],
+            "webApplicationFirewallConfiguration": {"enabled": True},
+            "firewallPolicy": _ref("Microsoft.Network/ApplicationGatewayWebApplicationFirewallPolicies/waf"),
+        },
+        "microsoft.network/privateendpoints": {
+            "subnet": {"id": subnet},
+            "manualPrivateLinkServiceConnections": [{"properties": {
+                "privateLinkServiceId": f"{RG}/providers/Microsoft.Storage/storageAccounts/st"}}],
+            "applicationSecurityGroups": [_ref("Microsoft.Network/applicationSecurityGroups/asg")],
+        },
+        "microsoft.network/publicipaddresses": {
+            "ipConfiguration": {"id": f"{NET}/networkInterfaces/nic/ipConfigurations/ip"},
+            "natGateway": _ref("Microsoft.Network/natGateways/nat"),
+            "ddosSettings": {"ddosProtectionPlan": _ref("Microsoft.Network/ddosProtectionPlans/ddos")},
+        },
+        "microsoft.network/virtualnetworks": {
+            "addressSpace": {"addressPrefixes": ["10.0.0.0/16"]},
+            "subnets": [{"id": subnet, "properties": {
+                "networkSecurityGroup": _ref("Microsoft.Network/networkSecurityGroups/nsg"),
+                "natGateway": _ref("Microsoft.Network/natGateways/nat")}}],
+            "virtualNetworkPeerings": [{"properties": {
+                "remoteVirtualNetwork": _ref("Microsoft.Network/virtualNetworks/hub")}}],
+            "ddosProtectionPlan": _ref("Microsoft.Network/ddosProtectionPlans/ddos"),
+        },
+        "microsoft.network/networkinterfaces": {
+            "ipConfigurations": [{"properties": {"subnet": {"id": subnet}}}],
+            "virtualMachine": _ref("Microsoft.Compute/virtualMachines/vm"),
+            "privateEndpoint": {"id": f"{NET}/privateEndpoints/pe"},
+        },
+    }
+    return [
+        {"id": f"{RG}/providers/{t}/r{i}", "type": t, "properties": props}
+        for i, (t, props) in enumerate(sorted(docs.items()))
+    ]
+
+
+def test_projection_keeps_graph_edges():
+    resources = load_resources()
+    projected = [project_properties(r) for r in resources]
+    assert json.dumps(build_graph(projected, []), sort_keys=True) == json.dumps(
+        build_graph(resources, []), sort_keys=True
+    )
+
+
+def test_projection_keeps_references_and_drops_bulk():
+    vm = _bulky_vm()
+    projected = project_properties(vm)
+    assert extract_arm_ids(projected) == extract_arm_ids(vm)
+    assert projected["properties"]["osProfile"] == {"secrets": None}
+    assert len(json.dumps(projected)) * 4 < len(json.dumps(vm))
+    # Unprojected types pass through untouched
+    disk = {"id": "d", "type": "microsoft.compute/disks", "properties": {"diskSizeGB": 1}}
+    assert project_properties(disk) is disk
+
+
+def test_projection_keeps_references_of_realistic_documents():
+    resources = _realistic() + generate(300)[0]
+    assert {r["type"] for r in _realistic()} == set(PROJECTED_TYPES)
+    for resource in resources:
+        assert extract_arm_ids(project_properties(resource)) == extract_arm_ids(resource), (
+            resource["type"]
+        )
+
+
+def test_queries_project_only_when_enabled(monkeypatch):
+    queries = []
+
+    def run(cmd, capture_output, text, check):
+        queries.append(cmd[cmd.index("-q") + 1])
+        return subprocess.CompletedProcess(cmd, 0, stdout='{"data": []}', stderr="")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    AzureResourceGraph([SUB], project_properties=True).query_by_ids(["/subscriptions/x/providers/a/b/c"])
+    AzureResourceGraph([SUB]).query_by_ids(["/subscriptions/x/providers/a/b/c"])
+    AzureResourceGraph([SUB], project_properties=True).query_all()
+    projected, full, sweep = queries
+    assert properties_kql() in projected
+    assert all(f"type =~ '{t}'" in projected for t in PROJECTED_TYPES)
+    assert "case(" not in full
+    assert projected.endswith(full[full.index("| project"):])
+    assert "case(" not in sweep
@@ -0,0 +1,74 @@
+"""Tests for tools.azdisc.rbac."""
+from tools.azdisc.graph import build_compact_graph
+from tools.azdisc.rbac import ScopeTrie, candidate_scopes, match_assignments
+
+SUB = "00000000-0000-0000-0000-000000000001"
+RG = f"/subscriptions/{SUB}/resourceGroups/rg-app"
+VM_ID = f"{RG}/providers/Microsoft.Compute/virtualMachines/vm1"
+MG = "/providers/Microsoft.Management/managementGroups/mg-app"
+
+
+def _vm():
+    return {
+        "id": VM_ID,
+        "name": "vm1",
+        "type": "microsoft.compute/virtualmachines",
+        "subscriptionId": SUB,
+        "resourceGroup": "rg-app",
+        "properties": {},
+    }
+
+
+def _ra(scope, name):
+    return {
+        "id": f"{scope}/providers/Microsoft.Authorization/roleAssignments/{name}",
+        "name": name,
+        "type": "microsoft.authorization/roleassignments",
+        "properties": {"scope": scope},
+    }
+
+
+def test_trie_direct_inherited_and_unrelated():
+    trie = ScopeTrie([VM_ID, RG])
+    assert trie.match(VM_ID.upper()) == "direct"
+    assert trie.match(RG) == "direct"
+    assert trie.match(f"/subscriptions/{SUB}") == "inherited"
+    assert trie.match(f"/subscriptions/{SUB}/resourceGroups/rg-other") == ""
+    assert trie.match(f"{VM_ID}/extensions/ext") == ""
+    assert trie.match("") == trie.match("  ") == ""
+
+
+def test_match_assignments_tags_inherited():
+    assignments = [
+        _ra(VM_ID, "direct"),
+        _ra(f"/subscriptions/{SUB}", "sub"),
+        _ra(MG, "mg"),
+        _ra("/providers/Microsoft.Management/managementGroups/mg-other", "other"),
+        _ra(f"/subscriptions/{SUB}/resourceGroups/rg-other", "elsewhere"),
+        _ra(VM_ID, "direct"),
+        {"id": "/providers/Microsoft.Authorization/roleAssignments/noscope", "properties": {}},
+    ]
+    matched = match_assignments(assignments, [_vm()], {SUB: ["mg-app"]})
+    by_name = {ra["name"]: ra.get("inherited", False) for ra in matched}
+    assert by_name == {"direct": False, "sub": True, "mg": True}
+    assert "inherited" not in assignments[1]
+    # Without ancestry management group assignments cannot be placed
+    assert "mg" not in {ra["name"] for ra in match_assignments(assignments, [_vm()])}
+
+
+def test_graph_edge_kinds():
+    rbac = match_assignments(
+        [_ra(VM_ID, "direct"), _ra(f"/subscriptions/{SUB}", "sub")], [_vm()]
+    )
+    graph = build_compact_graph([_vm()], rbac).to_dict()
+    kinds = {(e["src"], e["kind"]) for e in graph["edges"]}
+    assert kinds == {
+        (VM_ID.lower(), "rbac_assignment"),
+        (f"/subscriptions/{SUB}", "rbac_assignment_inherited"),
+    }
+
+
+def test_candidate_scopes_cover_every_match():
+    scopes = candidate_scopes([_vm()], {SUB: ["mg-app"]})
+    assert {"/", f"/subscriptions/{SUB}", RG.lower(), VM_ID.lower(), MG.lower()} <= set(scopes)
+    assert f"/subscriptions/{SUB}/resourcegroups/rg-other" not in scopes
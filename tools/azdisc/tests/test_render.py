@@ -0,0 +1,156 @@
+"""Tests for tools.azdisc.render."""
+import os
+import stat
+import subprocess
+import sys
+
+import pytest
+
+from tools.azdisc import render
+from tools.azdisc.arg import AzDiscError
+from tools.azdisc.cache import RenderCache
+
+# Stands in for `java -jar plantuml.jar -pipe -pipedelimitor X`
+FAKE_PLANTUML = f"""#!{sys.executable}
+import os, sys
+delimiter = sys.argv[sys.argv.index("-pipedelimitor") + 1]
+source = []
+for line in sys.stdin:
+    source.append(line)
+    if line.startswith("@enduml"):
+        text = "".join(source)
+        source = []
+        if "CRASH" in text:
+            sys.exit(1)
+        if "BROKEN" in text:
+            sys.stderr.write("ERROR\\n2\\nSyntax Error?\\n")
+            sys.stderr.flush()
+        sys.stdout.write(f"<svg pid='{{os.getpid()}}'>{{len(text)}}</svg>\\n{{delimiter}}\\n")
+        sys.stdout.flush()
+"""
+
+
+@pytest.fixture
+def fake_java(tmp_path, monkeypatch):
+    path = tmp_path / "java"
+    path.write_text(FAKE_PLANTUML)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(render, "JAVA", str(path))
+    return path
+
+
+def _puml(tmp_path, name, body="A --> B"):
+    path = tmp_path / f"{name}.puml"
+    path.write_text(f"@startuml\n{body}\n@enduml\n")
+    return str(path)
+
+
+def _one_shot(monkeypatch):
+    calls = []
+
+    def run(cmd, capture_output, text, check, timeout=None):
+        calls.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    return calls
+
+
+def test_daemon_renders_many_with_one_jvm(tmp_path, fake_java, monkeypatch):
+    calls = _one_shot(monkeypatch)
+    out = tmp_path / "out"
+    with render.PlantUmlDaemon("plantuml.jar") as daemon:
+        svgs = [daemon.render(_puml(tmp_path, f"d{i}"), str(out)) for i in range(3)]
+        with pytest.raises(AzDiscError) as exc:
+            daemon.render(_puml(tmp_path, "bad", "BROKEN"), str(out))
+        assert "Syntax Error?" in exc.value.stderr
+        svgs.append(daemon.render(_puml(tmp_path, "after"), str(out)))
+
+    assert svgs[0] == str(out / "d0.svg")
+    pids = {open(p).read().split("'")[1] for p in svgs}
+    assert len(pids) == 1
+    assert calls == []
+
+
+def test_daemon_falls_back_to_one_shot(tmp_path, fake_java, monkeypatch):
+    calls = _one_shot(monkeypatch)
+    with render.PlantUmlDaemon() as daemon:
+        daemon.render(_puml(tmp_path, "ok"), str(tmp_path))
+        # The JVM exits mid-batch: this and later diagrams use one-shot renders
+        daemon.render(_puml(tmp_path, "crash", "CRASH"), str(tmp_path))
+        daemon.render(_puml(tmp_path, "later"), str(tmp_path))
+    assert [c[-1] for c in calls] == [_puml(tmp_path, "crash", "CRASH"), _puml(tmp_path, "later")]
+
+    monkeypatch.setattr(render, "JAVA", str(tmp_path / "missing-java"))
+    calls.clear()
+    with render.PlantUmlDaemon() as daemon:
+        assert daemon.render(_puml(tmp_path, "x"), str(tmp_path)) == os.path.join(str(tmp_path), "x.svg")
+    assert len(calls) == 1
+
+
+def test_render_many_reports_failures(tmp_path, fake_java, monkeypatch):
+    calls = _one_shot(monkeypatch)
+    paths = [_puml(tmp_path, f"d{i}", "A --> B\n" * i) for i in range(6)]
+    paths.insert(2, _puml(tmp_path, "bad", "BROKEN"))
+    rendered, failed = render.render_many(paths, workers=3, heap="512m")
+    assert rendered == [p[:-5] + ".svg" for p in paths if "bad" not in p]
+    assert [p for p, _ in failed] == [paths[2]]
+    # Never more daemons than workers
+    pids = {open(p).read().split("'")[1] for p in rendered}
+    assert 1 <= len(pids) <= 3
+    assert calls == []
+
+
+def test_render_many_one_shot_heap_and_timeout(tmp_path, monkeypatch):
+    calls = []
+
+    def run(cmd, capture_output, text, check, timeout=None):
+        calls.append((cmd, timeout))
+        if cmd[-1].endswith("slow.puml"):
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    paths = [_puml(tmp_path, "fast"), _puml(tmp_path, "slow")]
+    rendered, failed = render.render_many(
+        paths, "p.jar", workers=2, heap="1g", timeout=5, backend="oneshot"
+    )
+    assert rendered == [str(tmp_path / "fast.svg")]
+    assert failed == [(paths[1], f"plantuml render timed out after 5s for {paths[1]}")]
+    assert all(cmd[:2] == ["java", "-Xmx1g"] and t == 5 for cmd, t in calls)
+
+
+def test_render_cache_skips_unchanged(tmp_path, monkeypatch):
+    calls = []
+
+    def run(cmd, capture_output, text, check, timeout=None):
+        calls.append(cmd[-1])
+        with open(cmd[-1][:-5] + ".svg", "w") as fh:
+            fh.write(f"<svg>{os.path.basename(cmd[-1])}</svg>")
+        return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+
+    monkeypatch.setattr(subprocess, "run", run)
+    dist = tmp_path / "dist"
+    dist.mkdir()
+    (dist / "Common.puml").write_text("' v1")
+    body = f"!define AzurePuml {dist}\n!include AzurePuml/Common.puml\nA --> B"
+    paths = [_puml(tmp_path, "a", body), _puml(tmp_path, "b", body + "\nB --> C")]
+    cache = RenderCache(str(tmp_path / "cache"), 1 << 20)
+
+    def run_all():
+        return render.render_many(paths, backend="oneshot", cache=cache)
+
+    run_all()
+    assert len(calls) == 2
+    rendered, _ = run_all()
+    assert len(calls) == 2 and cache.hits == 2
+    assert open(rendered[1]).read() == "<svg>b.puml</svg>"
+
+    # A changed diagram or a changed include re-renders
+    _puml(tmp_path, "b", body + "\nB --> D")
+    run_all()
+    assert calls[2:] == [paths[1]]
+    (dist / "Common.puml").write_text("' v2")
+    cache = RenderCache(str(tmp_path / "cache"), 1 << 20)
+    run_all()
+    assert len(calls) == 5
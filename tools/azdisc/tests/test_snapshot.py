@@ -0,0 +1,115 @@
+"""Tests for tools.azdisc.snapshot."""
+import os
+
+import pytest
+
+from tools.azdisc.arg import AzDiscError
+from tools.azdisc.bench.synth import SyntheticARG, _sub, generate
+from tools.azdisc.config import AppConfig
+from tools.azdisc.expand import expand
+from tools.azdisc.rbac import collect_rbac
+from tools.azdisc.snapshot import TenantStore, expand_offline, write_store
+from tools.azdisc.util import normalize_id
+
+SUBS = [_sub(i) for i in range(4)]
+TIMESTAMP = "2026-01-01T00:00:00Z"
+
+
+@pytest.fixture(scope="module")
+def tenant(tmp_path_factory):
+    resources, rbac, seed_rgs = generate(400)
+    path = str(tmp_path_factory.mktemp("snapshot") / "tenant.db")
+    ancestry = SyntheticARG(resources).query_subscription_ancestry()
+    write_store(path, resources, SUBS, TIMESTAMP, rbac, ancestry)
+    return resources, rbac, seed_rgs, path
+
+
+def _ids(resources):
+    return sorted(normalize_id(r["id"]) for r in resources)
+
+
+def test_offline_expand_matches_live_expand(tenant):
+    resources, _, seed_rgs, path = tenant
+    config = AppConfig(app="a", subscriptions=SUBS, seedResourceGroups=seed_rgs[:3], outputDir="a")
+    with TenantStore(path) as store:
+        inventory, unresolved = expand_offline(config, store)
+    expected, expected_unresolved = expand(config, SyntheticARG(resources))
+    assert _ids(inventory) == _ids(expected)
+    assert unresolved == expected_unresolved
+
+
+def test_offline_expand_is_deterministic_and_limited_to_app_subscriptions(tenant):
+    _, _, seed_rgs, path = tenant
+    config = AppConfig(app="a", subscriptions=[SUBS[0]], seedResourceGroups=seed_rgs, outputDir="a")
+    with TenantStore(path) as store:
+        first = expand_offline(config, store)
+        assert expand_offline(config, store) == first
+    inventory, _ = first
+    assert inventory and {r["subscriptionId"] for r in inventory} == {SUBS[0]}
+
+
+def test_reverse_references(tenant):
+    resources, _, _, path = tenant
+    hub = next(r for r in resources if r["name"] == "vnet-hub" and r["subscriptionId"] == SUBS[0])
+    with TenantStore(path) as store:
+        peers = store.get(store.referrers([hub["id"]]))
+    assert peers
+    assert {r["type"] for r in peers} == {"microsoft.network/virtualnetworks"}
+
+
+def test_role_assignments_match_live_collection(tenant):
+    resources, rbac, seed_rgs, path = tenant
+    config = AppConfig(app="a", subscriptions=SUBS, seedResourceGroups=seed_rgs[:2], outputDir="a")
+    with TenantStore(path) as store:
+        inventory, _ = expand_offline(config, store)
+        assignments = store.role_assignments(inventory)
+    expected = collect_rbac(SyntheticARG(resources, rbac), [inventory])[0]
+    assert assignments == expected
+    assert any(ra.get("inherited") for ra in assignments)
+
+
+def test_uncovered_subscription_and_missing_rbac_raise(tmp_path):
+    path = str(tmp_path / "tenant.db")
+    write_store(path, [], SUBS[:1], TIMESTAMP)
+    config = AppConfig(app="a", subscriptions=SUBS[:2], seedResourceGroups=["rg"], outputDir="a")
+    with TenantStore(path) as store:
+        assert store.timestamp == TIMESTAMP
+        with pytest.raises(AzDiscError, match=SUBS[1]):
+            expand_offline(config, store)
+        with pytest.raises(AzDiscError, match="no role assignments"):
+            store.role_assignments([])
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_missing_store_raises(tmp_path):
+    with pytest.raises(AzDiscError, match="snapshot command"):
+        TenantStore(str(tmp_path / "absent.db"))
+
+
+
+def test_snapshot_command_bypasses_query_cache(tmp_path, monkeypatch):
+    import tools.azdisc.__main__ as cli
+
+    resources, _, _ = generate(50)
+    built = []
+
+    class SweepARG(SyntheticARG):
+        subscriptions = SUBS
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def query_all(self):
+            return resources
+
+    def make_arg(config, use_cache=True, refresh=False):
+        built.append(refresh)
+        return SweepARG(resources)
+
+    monkeypatch.setattr(cli, "make_arg", make_arg)
+    config = AppConfig(app="a", subscriptions=SUBS, seedResourceGroups=[], outputDir=str(tmp_path))
+    assert cli.cmd_snapshot(config)["resources"] == len(resources)
+    assert built == [True]
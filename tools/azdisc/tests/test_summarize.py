@@ -0,0 +1,88 @@
+"""Tests for tools.azdisc.summarize."""
+import copy
+
+from tools.azdisc.summarize import summarize
+
+RG = "/subscriptions/s/resourcegroups/rg/providers"
+SUBNET = f"{RG}/microsoft.network/virtualnetworks/vnet/subnets/default"
+VNET = f"{RG}/microsoft.network/virtualnetworks/vnet"
+ORPHAN = f"{RG}/microsoft.compute/disks/orphan"
+RA = "/providers/microsoft.authorization/roleassignments/ra1"
+
+
+def _node(nid, ntype):
+    return {"id": nid, "name": nid.split("/")[-1], "type": ntype}
+
+
+def _edge(src, dst, kind="dependency"):
+    return {"src": src, "dst": dst, "kind": kind}
+
+
+def _graph(vms=4):
+    nodes = [
+        _node(SUBNET, "microsoft.network/virtualnetworks/subnets"),
+        _node(VNET, "microsoft.network/virtualnetworks"),
+        _node(ORPHAN, "microsoft.compute/disks"),
+        _node(RA, "microsoft.authorization/roleassignments"),
+    ]
+    edges = [_edge(SUBNET, VNET), _edge(VNET, RA, "rbac_assignment")]
+    for i in range(vms):
+        vm = f"{RG}/microsoft.compute/virtualmachines/vm{i}"
+        nic = f"{RG}/microsoft.network/networkinterfaces/nic{i}"
+        nodes.append(_node(vm, "microsoft.compute/virtualmachines"))
+        nodes.append(_node(nic, "microsoft.network/networkinterfaces"))
+        edges += [_edge(vm, nic), _edge(nic, SUBNET)]
+        for d in range(2):
+            disk = f"{RG}/microsoft.compute/disks/vm{i}-d{d}"
+            nodes.append(_node(disk, "microsoft.compute/disks"))
+            edges.append(_edge(vm, disk))
+    return {"nodes": sorted(nodes, key=lambda n: n["id"]), "edges": edges}
+
+
+def test_fold_leaves_into_parent():
+    graph = _graph(vms=2)
+    original = copy.deepcopy(graph)
+    reduced = summarize(graph)
+    assert graph == original
+
+    nodes = {n["id"]: n for n in reduced["nodes"]}
+    vm0 = f"{RG}/microsoft.compute/virtualmachines/vm0"
+    assert set(nodes) == {SUBNET, VNET, ORPHAN, vm0, f"{RG}/microsoft.compute/virtualmachines/vm1"}
+    assert nodes[vm0]["summary"] == "2 disks, 1 networkinterfaces"
+    assert nodes[VNET]["summary"] == "1 roleassignments"
+    # The NIC's subnet edge moves to the VM
+    assert {(e["src"], e["dst"]) for e in reduced["edges"]} == {
+        (SUBNET, VNET),
+        (vm0, SUBNET),
+        (f"{RG}/microsoft.compute/virtualmachines/vm1", SUBNET),
+    }
+
+
+def test_collapse_identical_siblings():
+    reduced = summarize(_graph(vms=4))
+    vms = [n for n in reduced["nodes"] if n["type"] == "microsoft.compute/virtualmachines"]
+    assert len(vms) == 1
+    assert vms[0]["name"] == "vm0 +3" and vms[0]["count"] == 4
+    assert vms[0]["summary"] == "8 disks, 4 networkinterfaces"
+    assert len(reduced["edges"]) == 2
+
+    # Below the threshold or disabled, siblings stay separate
+    assert len(summarize(_graph(vms=2))["nodes"]) == 5
+    assert len(summarize(_graph(vms=4), collapse_min=0)["nodes"]) == 7
+    assert summarize(_graph(vms=4), leaf_types=[], collapse_min=0)["nodes"] == _graph(vms=4)["nodes"]
+
+
+def test_collapse_needs_shared_neighbours_and_scope():
+    graph = _graph(vms=0)
+    for i in range(3):
+        graph["nodes"].append(_node(f"{RG}/microsoft.keyvault/vaults/kv{i}", "microsoft.keyvault/vaults"))
+    for rg in ("rg-a", "rg-b", "rg-c"):
+        vm = f"/subscriptions/s/resourcegroups/{rg}/providers/microsoft.compute/virtualmachines/vm"
+        graph["nodes"].append(
+            dict(_node(vm, "microsoft.compute/virtualmachines"), resourceGroup=rg, subscriptionId="s")
+        )
+        graph["edges"].append(_edge(vm, SUBNET))
+    reduced = summarize(graph)
+    # Unconnected vaults and same-neighbour VMs in different resource groups stay apart
+    assert not any(n.get("count") for n in reduced["nodes"])
+    assert len(reduced["nodes"]) == len(summarize(graph, collapse_min=0)["nodes"])
@@ -1,15 +1,24 @@
 """Tests for tools.azdisc.util."""
+import io
+import json
+import os
 import re
 import pytest
 
 from tools.azdisc.util import (
+    compile_skip_paths,
+    dump_json,
     extract_arm_ids,
     normalize_id,
     slug,
     chunk,
     parent_id,
+    resource_arm_ids,
+    sort_keys,
 )
 
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
 SUB = "00000000-0000-0000-0000-000000000001"
 NIC_ID = f"/subscriptions/{SUB}/resourceGroups/rg-test/providers/Microsoft.Network/networkInterfaces/nic-test"
 VNET_ID = f"/subscriptions/{SUB}/resourceGroups/rg-test/providers/Microsoft.Network/virtualNetworks/vnet-test"
@@ -36,6 +45,54 @@ def test_extract_arm_ids_list():
     assert len([x for x in result if "random" in x]) == 0
 
 
+def test_extract_arm_ids_case_whitespace_and_accumulator():
+    found = {"/subscriptions/already/providers/x/y/z"}
+    obj = {"a": f"  {NIC_ID.upper()}\n", "b": "/SubScriptions/x", "c": "/tmp/file", "d": None}
+    result = extract_arm_ids(obj, found=found)
+    assert result is found
+    assert result == {"/subscriptions/already/providers/x/y/z", NIC_ID.lower()}
+
+
+def test_extract_arm_ids_counts_nodes_and_handles_deep_documents():
+    counter = [0]
+    extract_arm_ids({"a": [NIC_ID, {"b": 1}], "c": "x"}, counter)
+    assert counter[0] == 6
+
+    deep = NIC_ID
+    for i in range(5000):
+        deep = {"k": [deep]} if i % 2 else [deep]
+    assert extract_arm_ids(deep) == {NIC_ID.lower()}
+
+
+def test_extract_arm_ids_skip_paths():
+    skip = compile_skip_paths(["properties.settings.script", "properties.definition"])
+    obj = {
+        "id": NIC_ID,
+        "properties": {
+            "settings": {"script": VNET_ID, "workspace": SUBNET_ID},
+            "definition": {"actions": [VNET_ID]},
+        },
+    }
+    assert extract_arm_ids(obj, skip=skip) == {NIC_ID.lower(), SUBNET_ID.lower()}
+    assert VNET_ID.lower() in extract_arm_ids(obj)
+
+
+def test_resource_arm_ids_uses_type_skip_list():
+    vm = {
+        "id": NIC_ID,
+        "type": "Microsoft.Compute/virtualMachines",
+        "properties": {"osProfile": {"customData": VNET_ID}, "availabilitySet": {"id": SUBNET_ID}},
+    }
+    assert resource_arm_ids(vm) == {NIC_ID.lower(), SUBNET_ID.lower()}
+    # Workflow definitions reference Functions and nested workflows by ID
+    workflow = {
+        "id": NIC_ID,
+        "type": "Microsoft.Logic/workflows",
+        "properties": {"definition": {"actions": {"fn": {"inputs": {"function": {"id": VNET_ID}}}}}},
+    }
+    assert resource_arm_ids(workflow) == {NIC_ID.lower(), VNET_ID.lower()}
+
+
 def test_normalize_id():
     assert normalize_id("  /Subscriptions/ABC  ") == "/subscriptions/abc"
     assert normalize_id("/subscriptions/abc") == "/subscriptions/abc"
@@ -73,3 +130,45 @@ def test_parent_id_subnets():
 def test_parent_id_missing_segment():
     result = parent_id(VNET_ID, "subnets")
     assert result == VNET_ID
+
+
+def _legacy_dump(data):
+    return json.dumps(sort_keys(data), indent=2, sort_keys=True)
+
+
+def _stream_dump(data, **kwargs):
+    buf = io.StringIO()
+    dump_json(data, buf, **kwargs)
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize("name", ["sample_resources.json", "sample_graph.json"])
+def test_dump_json_matches_sorted_copy(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as fh:
+        data = json.load(fh)
+    assert _stream_dump(data) == _legacy_dump(data)
+    assert _stream_dump(data, stream_depth=5) == _legacy_dump(data)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        [],
+        {},
+        [[], {}, None, 1.5, "multi\nline \u00e9"],
+        {"b": [{"z": 1, "a": [1, {"y": {}, "x": []}]}], "a": {"k": "v"}},
+        "scalar",
+        [{"s": "q\"uote\\ \u00e9\t", "t": True, "f": False, "n": None, "i": -3, "x": 1.25}],
+        [{"b": 1, "a": "flat"}, {"z": {}}, {"big": 10**20}],
+        {10: "b", 1: {2: "x"}, 2: []},
+        [{1.5: "f"}, {None: 1}, {True: 1, False: 0}],
+    ],
+)
+def test_dump_json_edge_cases(data):
+    assert _stream_dump(data) == _legacy_dump(data)
+
+
+def test_dump_json_streams_iterators():
+    data = {"nodes": [{"id": "a"}, {"id": "b"}], "edges": [], "empty": []}
+    streamed = {"nodes": iter(data["nodes"]), "edges": iter([]), "empty": []}
+    assert _stream_dump(streamed) == _legacy_dump(data)
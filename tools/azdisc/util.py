@@ -1,23 +1,126 @@
 """Utility helpers for azdisc."""
+import json
 import re
+from collections.abc import Iterator
 
 
-def extract_arm_ids(obj):
-    """Recursively walk any dict/list/str and return set of ARM IDs (lowercase)."""
-    found = set()
-    if isinstance(obj, str):
-        s = obj.lower().strip()
-        if s.startswith("/subscriptions/") and "/providers/" in s:
-            found.add(s)
-    elif isinstance(obj, dict):
-        for v in obj.values():
-            found |= extract_arm_ids(v)
-    elif isinstance(obj, list):
-        for item in obj:
-            found |= extract_arm_ids(item)
+_ARM_PREFIX = "/subscriptions/"
+_PREFIX_LEN = len(_ARM_PREFIX)
+
+# Property subtrees that never hold ARM references, by resource type: scripts and custom
+# data can be large and only contain text. Logic App workflow definitions are not
+# listed: Function and nested workflow actions reference resources by ARM ID.
+SKIP_PROPERTY_PATHS = {
+    "microsoft.compute/virtualmachines": [
+        "properties.osProfile.customData",
+        "properties.userData",
+    ],
+    "microsoft.compute/virtualmachinescalesets": [
+        "properties.virtualMachineProfile.osProfile.customData",
+        "properties.virtualMachineProfile.userData",
+    ],
+    "microsoft.compute/virtualmachines/extensions": [
+        "properties.settings.script",
+        "properties.settings.commandToExecute",
+    ],
+}
+
+
+def compile_skip_paths(paths):
+    """
+    Turn dotted paths ("properties.settings.script") into the nested-dict form
+    extract_arm_ids takes: each key maps to its child paths, or to None for a subtree
+    to skip entirely.
+    """
+    trie = {}
+    for path in paths:
+        node = trie
+        keys = path.split(".")
+        for key in keys[:-1]:
+            child = node.setdefault(key, {})
+            if child is None:
+                break
+            node = child
+        else:
+            node[keys[-1]] = None
+    return trie
+
+
+_COMPILED_SKIPS = {t: compile_skip_paths(p) for t, p in SKIP_PROPERTY_PATHS.items()}
+
+
+# First characters that can begin an ARM ID once leading whitespace is stripped (plus
+# non-ASCII whitespace, checked separately)
+_ID_LEADS = frozenset("/ \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f")
+
+
+def _apply_skip(obj, skip, stack) -> int:
+    """Push the parts of `obj` outside the `skip` tree onto `stack`; returns nodes visited."""
+    if not isinstance(obj, dict):
+        stack.append(obj)
+        return 0
+    visited = 1
+    for key, child in obj.items():
+        if key not in skip:
+            stack.append(child)
+        elif skip[key] is not None:
+            visited += _apply_skip(child, skip[key], stack)
+    return visited
+
+
+def extract_arm_ids(obj, counter=None, found=None, skip=None):
+    """Walk any dict/list/str and return the set of ARM IDs (lowercase) in it.
+
+    If `counter` is a one-element list, its value is incremented once per visited node.
+    IDs are added to `found` if given, which is also returned. `skip` is a tree from
+    compile_skip_paths(); matching dict subtrees are not visited.
+
+    The walk is iterative, and strings are only lowercased once they start with
+    "/subscriptions/" (case-insensitive, leading whitespace ignored).
+    """
+    if found is None:
+        found = set()
+    add = found.add
+    stack = []
+    visited = _apply_skip(obj, skip, stack) if skip else 0
+    if not skip:
+        stack.append(obj)
+    pop = stack.pop
+    extend = stack.extend
+    while stack:
+        value = pop()
+        visited += 1
+        kind = type(value)
+        if kind is str:
+            lead = value[:1]
+            if lead in _ID_LEADS or (lead > "\x7f" and lead.isspace()):
+                s = value.strip()
+                if s[:_PREFIX_LEN].lower() == _ARM_PREFIX:
+                    s = s.lower()
+                    if "/providers/" in s:
+                        add(s)
+        elif kind is dict:
+            extend(value.values())
+        elif kind is list:
+            extend(value)
+        elif isinstance(value, dict):
+            extend(value.values())
+        elif isinstance(value, list):
+            extend(value)
+        elif isinstance(value, str):
+            visited -= 1
+            stack.append(str(value))
+    if counter is not None:
+        counter[0] += visited
     return found
 
 
+def resource_arm_ids(resource, counter=None, found=None):
+    """extract_arm_ids for one resource, skipping its type's SKIP_PROPERTY_PATHS."""
+    skip = _COMPILED_SKIPS.get(str(resource.get("type", "")).lower())
+    return extract_arm_ids(resource, counter, found, skip)
+
+
 def normalize_id(id_str):
     """Lowercase and strip an ARM ID."""
     return id_str.lower().strip()
@@ -45,6 +148,82 @@ def sort_keys(d):
     return d
 
 
+_INDENT_ENCODER = json.JSONEncoder(indent=2, sort_keys=True)
+
+
+_encode_str = json.encoder.encode_basestring_ascii
+_SCALAR_TYPES = (str, int, bool, type(None))
+_CONSTANTS = {True: "true", False: "false", None: "null"}
+
+
+def _is_flat(d):
+    return all(type(k) is str for k in d) and all(type(v) in _SCALAR_TYPES for v in d.values())
+
+
+def _encode_key(key):
+    """Encode a dict key the way json does, turning non-string scalars into strings."""
+    if isinstance(key, str):
+        return _encode_str(key)
+    if key is None or isinstance(key, (bool, int, float)):
+        return _encode_str(json.dumps(key))
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def _encode_scalar(v):
+    if type(v) is str:
+        return _encode_str(v)
+    if type(v) is int:
+        return int.__repr__(v)
+    return _CONSTANTS[v]
+
+
+def dump_json(data, fh, stream_depth=2):
+    """
+    Write `data` to `fh` exactly as json.dump(sort_keys(data), indent=2, sort_keys=True).
+
+    No sorted copy is built: the outer `stream_depth` levels of lists/dicts are written
+    one element at a time, and each element is encoded on its own with sorted keys.
+    Iterators (e.g. generators) at those levels are written as JSON arrays.
+    """
+    _dump_value(data, fh, 0, stream_depth)
+
+
+def _dump_value(value, fh, level, stream_depth):
+    pad = "\n" + "  " * (level + 1)
+    if stream_depth > 0 and (isinstance(value, list) or isinstance(value, Iterator)):
+        fh.write("[")
+        empty = True
+        for item in value:
+            fh.write(pad if empty else "," + pad)
+            empty = False
+            _dump_value(item, fh, level + 1, stream_depth - 1)
+        fh.write("]" if empty else "\n" + "  " * level + "]")
+    elif stream_depth > 0 and isinstance(value, dict) and value:
+        fh.write("{")
+        for i, key in enumerate(sorted(value)):
+            fh.write(pad if i == 0 else "," + pad)
+            fh.write(_encode_key(key) + ": ")
+            _dump_value(value[key], fh, level + 1, stream_depth - 1)
+        fh.write("\n" + "  " * level + "}")
+    elif type(value) is dict and value and _is_flat(value):
+        # Fast path for records of plain scalars (graph nodes/edges, small resources)
+        inner = "\n" + "  " * (level + 1)
+        fh.write(
+            "{"
+            + inner
+            + ("," + inner).join(
+                _encode_str(key) + ": " + _encode_scalar(value[key]) for key in sorted(value)
+            )
+            + "\n"
+            + "  " * level
+            + "}"
+        )
+    else:
+        text = _INDENT_ENCODER.encode(value)
+        # Encoded strings escape newlines, so every raw newline is indentation.
+        fh.write(text.replace("\n", "\n" + "  " * level) if level else text)
+
+
 def parent_id(arm_id, segment):
     """Given an ARM id like '.../subnets/foo', return the part before '/{segment}/...'."""
     lower = arm_id.lower()